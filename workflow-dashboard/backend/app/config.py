@@ -4,6 +4,10 @@
 環境変数の設定:
 - DATABASE_URL: データベース接続URL (default: sqlite:///./data/workflow.db)
 - SUPABASE_DB_URL: Supabase PostgreSQL接続URL (設定された場合、DATABASE_URLより優先)
+- DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_RECYCLE / DB_POOL_PRE_PING: PostgreSQL接続プール設定
+- DB_POOLER_MODE: 接続先プーラーのモード (auto / session / transaction / none)
+- DATABASE_READ_REPLICA_URL: 読み取り専用レプリカの接続URL (設定された場合、参照系のGETをレプリカへ振り分け)
+- SQLITE_WAL_ENABLED / SQLITE_SYNCHRONOUS / SQLITE_MMAP_SIZE_MB / SQLITE_CACHE_SIZE_MB: SQLiteのプラグマ設定
 - ENCRYPTION_KEY: 認証情報暗号化キー (python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())" で生成)
 - IN_DOCKER: Docker環境フラグ (default: False)
 """
@@ -28,6 +32,25 @@ class Settings(BaseSettings):
             return url
         return self.database_url
     
+    # PostgreSQL接続プール（SQLiteでは使用しない）
+    db_pool_size: int = 5  # 常時保持する接続数
+    db_max_overflow: int = 10  # 混雑時に一時的に追加する接続数
+    db_pool_timeout: int = 30  # 空き接続を待つ最大秒数
+    db_pool_recycle: int = 1800  # この秒数を超えた接続は作り直す
+    db_pool_pre_ping: bool = True  # 貸し出し前に接続の生存を確認
+    db_pooler_mode: str = "auto"  # auto: URLから判定 / session / transaction / none: プールしない(NullPool)
+    
+    # 読み取り専用レプリカ（空ならすべてプライマリ）
+    database_read_replica_url: str = ""
+    read_replica_sticky_seconds: int = 5  # 自分の更新後、この秒数は参照もプライマリから読む（レプリカの遅延対策）
+    
+    # SQLite（本番プロファイル: WALで読み込みが書き込みを待たない）
+    sqlite_wal_enabled: bool = True
+    sqlite_synchronous: str = "NORMAL"  # WALではNORMALでもコミット済みデータは失われない（電源断時の直近のみ）
+    sqlite_mmap_size_mb: int = 256
+    sqlite_cache_size_mb: int = 64
+    sqlite_busy_timeout_ms: int = 5000  # ロック待ちの上限（超えると database is locked）
+    
     # Encryption
     encryption_key: str = "default-key-change-in-production"
     
@@ -56,10 +79,58 @@ class Settings(BaseSettings):
     github_repo_name: str = ""  # リポジトリ名
     app_url: str = "http://localhost:8000"  # Webhook用のアプリURL
     
+    # 外部APIへのHTTPクライアント（サービスごとに接続プールを共有）
+    http_max_connections: int = 20  # 1サービスあたりの最大同時接続数
+    http_max_keepalive_connections: int = 10  # 再利用のために保持するアイドル接続数
+    http_keepalive_expiry_seconds: float = 30.0  # アイドル接続を閉じるまでの秒数
+    http_timeout_seconds: float = 30.0  # 既定のタイムアウト（リクエストごとに上書き可能）
+    http_connect_timeout_seconds: float = 10.0
+    http2_enabled: bool = False  # HTTP/2 を使う（h2 パッケージが必要）
+
+    # LLM ゲートウェイ（Anthropic / OpenAI 呼び出しのリトライ・同時実行数・サーキットブレーカー）
+    llm_max_concurrency_per_key: int = 4  # APIキーごとの最大同時リクエスト数
+    llm_max_retries: int = 3  # 429・5xx・接続エラー時の再試行回数
+    llm_retry_base_delay_seconds: float = 1.0  # retry-after がない場合の指数バックオフの初期値
+    llm_retry_max_delay_seconds: float = 30.0
+    llm_request_deadline_seconds: float = 300.0  # リトライ・フェイルオーバーを含めた1リクエスト全体の上限（秒）
+    llm_circuit_failure_threshold: int = 5  # 連続してこの回数失敗したらプロバイダーを一時停止
+    llm_circuit_reset_seconds: float = 60.0  # 一時停止してから再度試すまでの秒数
+    
     # 実行タイムアウト設定
     execution_timeout_seconds: int = 600  # デフォルト10分
     execution_step_timeout_seconds: int = 120  # 各ステップのタイムアウト（2分）
     
+    # ライブビューのイベントブローカー（memory: 単一プロセス, postgres: LISTEN/NOTIFYで複数ワーカー間共有）
+    live_view_broker: str = "memory"
+    live_view_broker_url: str = ""  # LISTEN/NOTIFY用のURL（空ならデータベースURLを使用）
+    live_view_log_batch_ms: int = 200  # ライブビューのログをまとめて送る間隔（0で即時）
+    
+    # 実行ステップのまとめ書き込み（いずれかに達したら1トランザクションで書き込む）
+    step_writer_flush_ms: int = 250
+    step_writer_max_rows: int = 50
+    step_writer_max_retries: int = 5  # 書き込みに失敗した変更を再試行する回数（超えたら破棄）
+    
+    # 実行統計の日別集計を実行履歴から作り直す間隔（分、0で無効）と対象の直近日数（0で全期間）
+    stats_reconcile_interval_minutes: int = 60
+    stats_reconcile_days: int = 7
+    
+    # 実行履歴のアーカイブ（この日数より古い終了済みの実行をステップごと圧縮して移動、0で無効）
+    execution_archive_after_days: int = 0
+    execution_archive_batch_size: int = 200  # 1トランザクションで移動する実行数
+    execution_archive_max_batches: int = 50  # 1回のジョブで処理するバッチ数の上限
+    
+    # マイグレーションのバックフィル（大きなテーブルを一定件数ずつ更新し、バッチ間で待機）
+    migration_batch_size: int = 1000
+    migration_batch_pause_ms: int = 50
+    
+    # セッション録画（スクリーンキャストとステップのスクリーンショットをMJPEGに記録）
+    screencast_recording_enabled: bool = False
+    screencast_recording_fps: int = 5  # 録画する最大フレームレート
+    screencast_recording_quality: int = 70  # PNGスクリーンショットをJPEGに変換する際の品質
+    
+    # 参照されなくなったスクリーンショット（screenshots/blobs/）を保存・再利用からこの時間経過後に削除（0で無効）
+    screenshot_blob_retention_hours: int = 24
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
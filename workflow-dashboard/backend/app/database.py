@@ -1,7 +1,12 @@
 """データベース接続とセッション管理"""
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from uuid import uuid4
 from pathlib import Path
 import json
 
@@ -46,14 +51,89 @@ connect_args = {}
 if effective_db_url.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """SQLite接続ごとのプラグマ設定（WAL・同期レベル・mmap・キャッシュ）"""
+    cursor = dbapi_connection.cursor()
+    try:
+        if settings.sqlite_wal_enabled:
+            # WALはデータベースファイルに永続化されるが、接続ごとに指定しても害はない
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_mb) * 1024 * 1024}")
+        # 負の値はKiB単位
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_mb) * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+# トランザクションモードのプーラー（Supabase の 6543 番ポート / PgBouncer）
+TRANSACTION_POOLER_PORTS = {6543}
+
+# トランザクションモードでは接続がプーラー側で使い回されるため、長く保持しすぎない
+TRANSACTION_POOLER_RECYCLE_SECONDS = 300
+
+
+def detect_pooler_mode(url: str) -> str:
+    """接続先プーラーのモードを判定（session / transaction / none）"""
+    mode = settings.db_pooler_mode.lower()
+    if mode != "auto":
+        return mode
+
+    parsed = make_url(url)
+    if parsed.port in TRANSACTION_POOLER_PORTS:
+        return "transaction"
+    if "pgbouncer" in (parsed.host or "") or parsed.query.get("pgbouncer") in ("true", "1"):
+        return "transaction"
+    return "session"
+
+
+def build_pool_settings(url: str) -> tuple:
+    """PostgreSQL用の (URL, プール設定, 接続引数) を組み立てる"""
+    parsed = make_url(url)
+    mode = detect_pooler_mode(url)
+    if mode == "none":
+        # サーバーレス環境向け（リクエストごとに接続）
+        return url, {"poolclass": NullPool}, {}
+
+    pool = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    args = {
+        "connect_timeout": 10,
+        # アイドル中の接続がNATやプーラーに切られないようにする
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 3,
+    }
+
+    if mode == "transaction":
+        # プーラーがアイドル接続を切るため生存確認は必須、再利用期間も短くする
+        pool["pool_pre_ping"] = True
+        pool["pool_recycle"] = min(settings.db_pool_recycle, TRANSACTION_POOLER_RECYCLE_SECONDS)
+        # pgbouncer=true はlibpqが解釈できないため取り除く
+        if "pgbouncer" in parsed.query:
+            parsed = parsed.difference_update_query(["pgbouncer"])
+
+    return parsed.render_as_string(hide_password=False), pool, args
+
+
 # PostgreSQLの場合の接続プール設定
 pool_settings = {}
+pooler_mode = "none"
 if effective_db_url.startswith("postgresql"):
-    from sqlalchemy.pool import NullPool
-    pool_settings = {"poolclass": NullPool}  # サーバーレス環境向け
+    pooler_mode = detect_pooler_mode(effective_db_url)
+    effective_db_url, pool_settings, connect_args = build_pool_settings(effective_db_url)
 
 # #region agent log
-debug_log("database.py", "Before engine creation", {"database_url": effective_db_url[:50] + "...", "connect_args": connect_args}, "C")
+debug_log("database.py", "Before engine creation", {"database_url": effective_db_url[:50] + "...", "pooler_mode": pooler_mode}, "C")
 # #endregion
 
 try:
@@ -72,8 +152,93 @@ except Exception as e:
     # #endregion
     raise
 
+if effective_db_url.startswith("sqlite"):
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def build_async_engine_settings(url: str) -> tuple:
+    """非同期エンジン用の (URL, プール設定, 接続引数) を組み立てる"""
+    if url.startswith("sqlite"):
+        # aiosqlite は既定で毎回接続（スレッド）を作るため、接続を使い回す
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1), {"poolclass": AsyncAdaptedQueuePool}, {}
+
+    mode = detect_pooler_mode(url)
+    sync_url, pool, _ = build_pool_settings(url)
+    parsed = make_url(sync_url).set(drivername="postgresql+asyncpg")
+    args = {"timeout": 10}
+
+    # asyncpg は sslmode を解釈しないため ssl 引数に置き換える
+    if "sslmode" in parsed.query:
+        args["ssl"] = parsed.query["sslmode"]
+        parsed = parsed.difference_update_query(["sslmode"])
+
+    if mode == "transaction":
+        # 接続がトランザクションごとに別のサーバー接続へ割り当てられるため、
+        # 名前付きのプリペアドステートメントを使い回さない
+        args["statement_cache_size"] = 0
+        args["prepared_statement_cache_size"] = 0
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+
+    if mode == "none":
+        pool = {"poolclass": NullPool}
+    return parsed.render_as_string(hide_password=False), pool, args
+
+
+# 非同期エンジン（async def のルーターからイベントループを止めずにクエリする）
+async_db_url, async_pool_settings, async_connect_args = build_async_engine_settings(
+    settings.effective_database_url
+)
+async_engine = create_async_engine(
+    async_db_url,
+    connect_args=async_connect_args,
+    echo=False,
+    **async_pool_settings
+)
+if async_db_url.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+# コミット後に属性を再読み込みしない（非同期セッションでは暗黙の遅延ロードができないため）
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def build_replica_sessions(url: str) -> tuple:
+    """読み取り専用レプリカの (同期セッション, 非同期セッション) を作成"""
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    if url.startswith("postgresql"):
+        sync_url, pool, args = build_pool_settings(url)
+    else:
+        sync_url, pool, args = url, {}, {"check_same_thread": False}
+    replica = create_engine(sync_url, connect_args=args, echo=False, **pool)
+
+    replica_async_url, replica_async_pool, replica_async_args = build_async_engine_settings(url)
+    replica_async = create_async_engine(
+        replica_async_url,
+        connect_args=replica_async_args,
+        echo=False,
+        **replica_async_pool
+    )
+    if url.startswith("sqlite"):
+        event.listen(replica, "connect", apply_sqlite_pragmas)
+        event.listen(replica_async.sync_engine, "connect", apply_sqlite_pragmas)
+    return (
+        sessionmaker(autocommit=False, autoflush=False, bind=replica),
+        async_sessionmaker(replica_async, class_=AsyncSession, autoflush=False, expire_on_commit=False),
+    )
+
+
+# 読み取り専用レプリカ（未設定ならプライマリのセッションをそのまま使う）
+replica_enabled = bool(settings.database_read_replica_url)
+if replica_enabled:
+    ReplicaSessionLocal, AsyncReplicaSessionLocal = build_replica_sessions(settings.database_read_replica_url)
+else:
+    ReplicaSessionLocal, AsyncReplicaSessionLocal = SessionLocal, AsyncSessionLocal
+
+# 更新後しばらくプライマリから読ませるクッキー（自分の変更がレプリカに届く前に古いデータを返さない）
+PRIMARY_STICKY_COOKIE = "db_primary_sticky"
+
 Base = declarative_base()
 
 
@@ -86,8 +251,35 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """非同期データベースセッションを取得"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def reads_from_primary(request: Request) -> bool:
+    """レプリカ未設定、または直近に更新したクライアントならプライマリから読む"""
+    return not replica_enabled or PRIMARY_STICKY_COOKIE in request.cookies
+
+
+def get_read_db(request: Request):
+    """参照専用のデータベースセッションを取得（レプリカがあればレプリカ）"""
+    db = SessionLocal() if reads_from_primary(request) else ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    """参照専用の非同期データベースセッションを取得（レプリカがあればレプリカ）"""
+    session_factory = AsyncSessionLocal if reads_from_primary(request) else AsyncReplicaSessionLocal
+    async with session_factory() as db:
+        yield db
+
+
 def init_db():
-    """データベースを初期化（テーブル作成）"""
+    """データベースを初期化（マイグレーションの適用）"""
     # #region agent log
     debug_log("database.py:init_db", "init_db function called", {}, "C")
     # #endregion
@@ -108,15 +300,17 @@ def init_db():
     
     try:
         # #region agent log
-        debug_log("database.py:init_db", "Before create_all", {}, "C")
+        debug_log("database.py:init_db", "Before migrations", {}, "C")
         # #endregion
-        Base.metadata.create_all(bind=engine)
+        # 未適用のマイグレーションのみ適用（最新なら schema_migrations を1回読むだけ）
+        from app.migrations import run_migrations
+        run_migrations(engine)
         # #region agent log
-        debug_log("database.py:init_db", "create_all completed successfully", {}, "C")
+        debug_log("database.py:init_db", "Migrations completed successfully", {}, "C")
         # #endregion
     except Exception as e:
         # #region agent log
-        debug_log("database.py:init_db", "create_all failed", {"error": str(e)}, "C")
+        debug_log("database.py:init_db", "Migrations failed", {"error": str(e)}, "C")
         # #endregion
         raise
 
@@ -104,6 +104,52 @@ class AIModelError(WorkflowException):
         )
 
 
+# リトライすれば成功する可能性がある LLM API のステータス（529 は Anthropic の過負荷）
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class LLMProviderError(WorkflowException):
+    """LLM API の呼び出しエラー（retryable ならリトライ・フェイルオーバーの対象）"""
+    
+    def __init__(
+        self,
+        message: str,
+        provider: str,
+        status_code: Optional[int] = None,
+        retryable: bool = False,
+        retry_after: Optional[float] = None
+    ):
+        super().__init__(
+            message=message,
+            code="RATE_LIMIT_EXCEEDED" if status_code == 429 else "AI_MODEL_ERROR",
+            details={"provider": provider, "status_code": status_code},
+            suggestion="APIキーが正しく設定されているか確認してください。また、モデルの利用制限を確認してください。"
+        )
+        self.provider = provider
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+    
+    @classmethod
+    def from_status(cls, message: str, provider: str, status_code: int, headers=None) -> "LLMProviderError":
+        """HTTPステータスとレスポンスヘッダー（retry-after）から作成"""
+        retry_after = None
+        value = (headers or {}).get("retry-after")
+        if value:
+            try:
+                retry_after = max(0.0, float(value))
+            except ValueError:
+                # HTTP日付形式は扱わず、指数バックオフに任せる
+                retry_after = None
+        return cls(
+            message,
+            provider,
+            status_code=status_code,
+            retryable=status_code in RETRYABLE_STATUS_CODES,
+            retry_after=retry_after
+        )
+
+
 class ValidationError(WorkflowException):
     """バリデーションエラー"""
     
@@ -1,5 +1,5 @@
 """Workflow Dashboard - FastAPI メインアプリケーション"""
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse
@@ -9,8 +9,8 @@ import json
 import os
 
 from app.config import settings
-from app.database import init_db
-from app.routers import tasks, credentials, executions, live_view, websocket, scheduler, wizard, auth, system, trial_run, projects, github_webhook, webhook_triggers
+from app.database import init_db, async_engine, replica_enabled, PRIMARY_STICKY_COOKIE
+from app.routers import tasks, credentials, executions, live_view, websocket, scheduler, wizard, auth, system, trial_run, projects, github_webhook, webhook_triggers, screenshots
 from app.routers import settings as settings_router
 from app.utils.logger import logger
 
@@ -28,6 +28,12 @@ def debug_log(location, message, data=None, hypothesis_id=None):
 async def lifespan(app: FastAPI):
     """アプリケーションのライフサイクル管理"""
     from app.services.scheduler import scheduler_service
+    from app.services.live_view_broker import live_view_broker
+    from app.services.execution_events import execution_events
+    from app.services.db_writer import db_writer
+    from app.services.http_clients import http_clients
+    from app.services.session_recorder import session_recorder
+    from app.services import run_summary  # noqa: F401（実行終了時にタスクの要約を更新するセッションイベントを登録）
     
     # #region agent log
     debug_log("main.py:lifespan", "Lifespan function started", {"step": "start"}, "A")
@@ -78,6 +84,10 @@ async def lifespan(app: FastAPI):
         # #endregion
         raise
     
+    # ライブビューのイベントブローカーを開始
+    await live_view_broker.start()
+    execution_events.start()
+    
     # #region agent log
     debug_log("main.py:lifespan", "Application startup complete, yielding", {}, "A")
     # #endregion
@@ -87,6 +97,11 @@ async def lifespan(app: FastAPI):
     # 終了時
     logger.info("アプリケーションを終了中...")
     scheduler_service.stop()
+    await live_view_broker.stop()
+    db_writer.shutdown()
+    session_recorder.shutdown()
+    await http_clients.close()
+    await async_engine.dispose()
 
 
 # #region agent log
@@ -113,6 +128,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+class ReadReplicaStickinessMiddleware:
+    """
+    更新リクエストの成功後、一定時間そのクライアントの参照をプライマリに向ける
+
+    レスポンス本体には触れず http.response.start に Cookie を追加するだけの ASGI ミドルウェアなので、
+    SSE などのストリーミングレスポンスもそのまま流れます。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        cookie = Response()
+        cookie.set_cookie(
+            PRIMARY_STICKY_COOKIE,
+            "1",
+            max_age=settings.read_replica_sticky_seconds,
+            httponly=True,
+            samesite="lax"
+        )
+        self.cookie_headers = [(name, value) for name, value in cookie.raw_headers if name == b"set-cookie"]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message = {**message, "headers": [*message.get("headers", []), *self.cookie_headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+# 参照レプリカがある場合のみ（ない場合は全リクエストがプライマリを読む）
+if replica_enabled:
+    app.add_middleware(ReadReplicaStickinessMiddleware)
+
+
 # 静的ファイル（スクリーンショット）
 screenshots_dir = Path("screenshots")
 screenshots_dir.mkdir(exist_ok=True)
@@ -124,6 +178,7 @@ app.include_router(tasks.router, prefix=settings.api_prefix)
 app.include_router(credentials.router, prefix=settings.api_prefix)
 app.include_router(executions.router, prefix=settings.api_prefix)
 app.include_router(live_view.router, prefix=settings.api_prefix)
+app.include_router(screenshots.router, prefix=settings.api_prefix)
 app.include_router(scheduler.router, prefix=settings.api_prefix)
 app.include_router(wizard.router, prefix=settings.api_prefix)
 app.include_router(settings_router.router, prefix=settings.api_prefix)
@@ -136,6 +191,19 @@ app.include_router(websocket.router)  # WebSocketはプレフィックスなし
 app.include_router(websocket.router, prefix=settings.api_prefix, tags=["screencast"])  # API用
 
 
+# SPA のキャッチオールルートより前に登録する（後だと /api/stats がキャッチオールに一致する）
+@app.get(f"{settings.api_prefix}/stats")
+async def get_stats():
+    """
+    ダッシュボード統計情報
+    
+    ワーカーごとのインメモリスナップショットを返すため、リクエストごとのDB集計は行いません。
+    """
+    from app.services.dashboard_state import dashboard_state
+    
+    return await dashboard_state.get_snapshot()
+
+
 @app.get("/health")
 async def health_check():
     """ヘルスチェック"""
@@ -192,59 +260,6 @@ async def serve_spa_or_404(request: Request, full_path: str):
     return {"detail": "Not Found"}
 
 
-@app.get(f"{settings.api_prefix}/stats")
-async def get_stats():
-    """ダッシュボード統計情報"""
-    from sqlalchemy import func
-    from app.database import SessionLocal
-    from app.models import Task, Execution
-    
-    db = SessionLocal()
-    try:
-        total_tasks = db.query(func.count(Task.id)).scalar()
-        active_tasks = db.query(func.count(Task.id)).filter(Task.is_active == True).scalar()
-        total_executions = db.query(func.count(Execution.id)).scalar()
-        running_executions = db.query(func.count(Execution.id)).filter(
-            Execution.status.in_(["running", "pending"])
-        ).scalar()
-        completed_executions = db.query(func.count(Execution.id)).filter(
-            Execution.status == "completed"
-        ).scalar()
-        failed_executions = db.query(func.count(Execution.id)).filter(
-            Execution.status == "failed"
-        ).scalar()
-        
-        # 最近の実行
-        recent_executions = db.query(Execution).order_by(
-            Execution.started_at.desc()
-        ).limit(5).all()
-        
-        return {
-            "tasks": {
-                "total": total_tasks,
-                "active": active_tasks,
-                "inactive": total_tasks - active_tasks
-            },
-            "executions": {
-                "total": total_executions,
-                "running": running_executions,
-                "completed": completed_executions,
-                "failed": failed_executions
-            },
-            "recent_executions": [
-                {
-                    "id": e.id,
-                    "task_id": e.task_id,
-                    "status": e.status,
-                    "started_at": e.started_at.isoformat() if e.started_at else None
-                }
-                for e in recent_executions
-            ]
-        }
-    finally:
-        db.close()
-
-
 if __name__ == "__main__":
     import uvicorn
     import socket
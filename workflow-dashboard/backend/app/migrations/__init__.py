@@ -0,0 +1,205 @@
+"""
+バージョン管理されたスキーママイグレーション
+
+適用済みのバージョンを schema_migrations テーブルに記録し、起動時は最新バージョンかどうかを
+1回の SELECT で確認するだけで済ませます（最新ならテーブルの調査や create_all は行いません）。
+未適用のマイグレーションがある場合のみ、番号順に適用して記録します。
+
+スキーマを変更する場合は models.py を変更したうえで、versions.py の MIGRATIONS の末尾に
+新しいバージョンを追加してください。大きなテーブルへの変更には次のヘルパーを使います。
+- create_index_online() / drop_index_online(): PostgreSQL では CONCURRENTLY（書き込みをブロックしない）
+- backfill_in_batches(): 一定件数ずつコミットし、バッチ間で待機してロックを長時間保持しない
+
+    python migrate.py            # 未適用のマイグレーションを適用
+    python migrate.py --status   # 適用状況を表示
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Index, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+from app.config import settings
+from app.models import SchemaMigration
+from app.utils.logger import logger
+
+# 複数ワーカーの同時起動時にマイグレーションを1つに絞るためのアドバイザリーロックのキー
+MIGRATION_LOCK_KEY = 7460431
+
+
+class Migration:
+    """1つのスキーマバージョン
+
+    transactional=False のマイグレーションは upgrade 内で自分で接続・コミットを管理します
+    （CREATE INDEX CONCURRENTLY やバッチごとにコミットするバックフィル）。
+    """
+
+    def __init__(self, version: int, name: str, upgrade: Callable[[Engine], None], transactional: bool = True):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.transactional = transactional
+
+
+def get_current_version(engine: Engine) -> int:
+    """適用済みの最新バージョン（schema_migrations がなければ 0）"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(SchemaMigration.version))).scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """PostgreSQL ではトランザクション単位のアドバイザリーロックで他のワーカーを待たせる"""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    # トランザクションモードのプーラー経由でも同じサーバー接続で保持されるよう、トランザクションを開いたままにする
+    with engine.begin() as lock_conn:
+        lock_conn.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK_KEY)))
+        yield
+
+
+def _record(engine: Engine, migration: Migration):
+    with engine.begin() as conn:
+        conn.execute(SchemaMigration.__table__.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.utcnow()
+        ))
+
+
+def run_migrations(engine: Engine, migrations: Optional[List[Migration]] = None) -> int:
+    """
+    未適用のマイグレーションを適用
+
+    Returns:
+        適用したマイグレーションの数
+    """
+    if migrations is None:
+        from app.migrations.versions import MIGRATIONS
+        migrations = MIGRATIONS
+    latest = max(migration.version for migration in migrations)
+
+    # 最新なら何もしない（起動時はこの SELECT 1回のみ）
+    if get_current_version(engine) >= latest:
+        return 0
+
+    with _migration_lock(engine):
+        # ロック待ちの間に他のワーカーが適用した分を除く
+        current = get_current_version(engine)
+        SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+        pending = [migration for migration in sorted(migrations, key=lambda m: m.version) if migration.version > current]
+
+        for migration in pending:
+            logger.info(f"マイグレーションを適用中: {migration.version} {migration.name}")
+            started = time.perf_counter()
+            if migration.transactional:
+                with engine.begin() as conn:
+                    migration.upgrade(conn)
+            else:
+                migration.upgrade(engine)
+            _record(engine, migration)
+            logger.info(
+                f"マイグレーションを適用しました: {migration.version} {migration.name} "
+                f"({time.perf_counter() - started:.1f}秒)"
+            )
+        return len(pending)
+
+
+def get_status(engine: Engine, migrations: Optional[List[Migration]] = None) -> List[Tuple[int, str, Optional[datetime]]]:
+    """各バージョンの (version, name, 適用日時 または None)"""
+    if migrations is None:
+        from app.migrations.versions import MIGRATIONS
+        migrations = MIGRATIONS
+    applied = {}
+    if get_current_version(engine):
+        with engine.connect() as conn:
+            applied = dict(conn.execute(select(SchemaMigration.version, SchemaMigration.applied_at)).all())
+    return [(m.version, m.name, applied.get(m.version)) for m in sorted(migrations, key=lambda m: m.version)]
+
+
+# ==================== マイグレーション用ヘルパー ====================
+
+def add_column(conn: Connection, table: str, column: str, ddl: str):
+    """カラムがなければ追加（ddl は型とデフォルト、例: "INTEGER DEFAULT 0"）"""
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        logger.info(f"カラムを追加しました: {table}.{column}")
+
+
+def create_index_online(engine: Engine, index: Index):
+    """
+    インデックスがなければ作成
+
+    PostgreSQL では CREATE INDEX CONCURRENTLY で作成するため、作成中もテーブルへの書き込みは止まりません。
+    失敗すると無効なインデックスが残るため、削除してからエラーにします。
+    """
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(ddl))
+        return
+
+    ddl = ddl.replace("CREATE INDEX ", "CREATE INDEX CONCURRENTLY ", 1)
+    ddl = ddl.replace("CREATE UNIQUE INDEX ", "CREATE UNIQUE INDEX CONCURRENTLY ", 1)
+    # CONCURRENTLY はトランザクション内では実行できない
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            conn.execute(text(ddl))
+        except DBAPIError:
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+            raise
+
+
+def drop_index_online(engine: Engine, name: str):
+    """インデックスがあれば削除（PostgreSQL では DROP INDEX CONCURRENTLY）"""
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def backfill_in_batches(
+    engine: Engine,
+    fetch_batch: Callable[[Connection, Optional[int], int], List[tuple]],
+    apply_batch: Callable[[Connection, List[tuple]], None],
+    batch_size: Optional[int] = None,
+    pause_ms: Optional[int] = None
+) -> int:
+    """
+    キー順に一定件数ずつ読み込んで更新し、バッチごとにコミット
+
+    fetch_batch(conn, last_key, batch_size) は先頭要素がキーの行をキー順に返し、
+    apply_batch(conn, rows) がその行を更新します。バッチ間で pause_ms 待機して
+    他のクエリにロックとI/Oを譲ります。
+
+    Returns:
+        処理した行数
+    """
+    batch_size = batch_size or settings.migration_batch_size
+    pause = (settings.migration_batch_pause_ms if pause_ms is None else pause_ms) / 1000
+    last_key = None
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            rows = fetch_batch(conn, last_key, batch_size)
+            if rows:
+                apply_batch(conn, rows)
+        if not rows:
+            return total
+        total += len(rows)
+        last_key = rows[-1][0]
+        if len(rows) < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
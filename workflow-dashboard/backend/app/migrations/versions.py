@@ -0,0 +1,198 @@
+"""
+マイグレーション一覧（バージョン番号順、適用済みのものは変更しないこと）
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, func, inspect, select, union, union_all, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.migrations import Migration, add_column, backfill_in_batches, create_index_online, drop_index_online
+from app.utils.logger import logger
+
+
+def _create_tables(conn: Connection):
+    """存在しないテーブルを作成（新規データベースではここで全テーブルとインデックスが揃う）"""
+    from app import models  # noqa: F401
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_legacy_columns(conn: Connection):
+    """migrate_lux.py / migrate_supabase.py で追加していたカラム"""
+    add_column(conn, "tasks", "execution_type", "VARCHAR(20) DEFAULT 'web'")
+    add_column(conn, "tasks", "max_steps", "INTEGER DEFAULT 20")
+    add_column(conn, "tasks", "lux_credential_id", "INTEGER REFERENCES credentials(id)")
+    add_column(conn, "tasks", "execution_location", "VARCHAR(20) DEFAULT 'server'")
+    add_column(conn, "tasks", "project_id", "INTEGER REFERENCES projects(id)")
+    add_column(conn, "tasks", "role_group_id", "INTEGER")
+    add_column(conn, "tasks", "order_index", "INTEGER DEFAULT 0")
+    add_column(conn, "tasks", "role_group", "VARCHAR(100) DEFAULT 'General'")
+    add_column(conn, "tasks", "dependencies", "TEXT DEFAULT '[]'")
+    add_column(conn, "projects", "color", "VARCHAR(20) DEFAULT '#6366f1'")
+    add_column(conn, "projects", "icon", "VARCHAR(50) DEFAULT 'folder'")
+
+
+def _create_model_indexes(engine: Engine):
+    """既存テーブルに後から追加したインデックスを作成（PostgreSQL では CONCURRENTLY）"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            missing = [column.name for column in index.columns if column.name not in existing]
+            if missing:
+                logger.warning(f"カラムがないためインデックスを作成しません: {index.name} ({', '.join(missing)})")
+                continue
+            create_index_online(engine, index)
+
+
+def _backfill_task_dependencies(engine: Engine):
+    """tasks.dependencies（JSON）から task_dependencies の辺を作成"""
+    from app.models import Task
+    from app.services.task_dependencies import parse_dependencies, replace_edges
+
+    def fetch_batch(conn, last_id, batch_size):
+        query = select(Task.id, Task.dependencies).order_by(Task.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(Task.id > last_id)
+        return conn.execute(query).all()
+
+    def apply_batch(conn, rows):
+        replace_edges(conn, {task_id: parse_dependencies(value) for task_id, value in rows})
+
+    backfill_in_batches(engine, fetch_batch, apply_batch)
+
+
+def _board_order_indexes(engine: Engine):
+    """ボードのタスク・役割グループを表示順のまま読めるインデックス（project_id 単独のものは置き換え）"""
+    from app.models import RoleGroup, Task
+
+    for table in (Task.__table__, RoleGroup.__table__):
+        for index in table.indexes:
+            if index.name.endswith("_order_index_id"):
+                create_index_online(engine, index)
+    drop_index_online(engine, "idx_role_groups_project_id")
+
+
+def _add_task_run_summary_columns(conn: Connection):
+    """タスクの実行結果の要約カラム"""
+    add_column(conn, "tasks", "last_run_status", "VARCHAR(20)")
+    add_column(conn, "tasks", "last_run_at", "TIMESTAMP")
+    add_column(conn, "tasks", "success_rate", "FLOAT")
+    add_column(conn, "tasks", "p50_duration_seconds", "FLOAT")
+    add_column(conn, "tasks", "recent_runs", "TEXT")
+
+
+def _backfill_task_run_summary(engine: Engine):
+    """実行履歴（アーカイブを含む）の直近の終了した実行からタスクの要約を作成"""
+    from app.models import Execution, ExecutionArchive, Task
+    from app.services.run_summary import FINISHED_STATUSES, RUN_SUMMARY_WINDOW, apply_runs
+
+    def fetch_batch(conn, last_id, batch_size):
+        query = select(Task.id).order_by(Task.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(Task.id > last_id)
+        return conn.execute(query).all()
+
+    def apply_batch(conn, rows):
+        task_ids = [row[0] for row in rows]
+        finished = union_all(*(
+            select(
+                model.task_id, model.status, model.started_at, model.completed_at,
+                func.coalesce(model.completed_at, model.started_at).label("finished_at")
+            ).where(model.task_id.in_(task_ids), model.status.in_(FINISHED_STATUSES))
+            for model in (Execution, ExecutionArchive)
+        )).subquery()
+        ranked = select(
+            finished,
+            func.row_number().over(
+                partition_by=finished.c.task_id,
+                order_by=finished.c.finished_at.desc()
+            ).label("position")
+        ).subquery()
+        runs = [
+            (
+                run.task_id, run.status, run.finished_at,
+                max(0.0, (run.completed_at - run.started_at).total_seconds())
+                if run.started_at and run.completed_at else None
+            )
+            for run in conn.execute(select(ranked).where(ranked.c.position <= RUN_SUMMARY_WINDOW))
+        ]
+        apply_runs(conn, runs, replace=True)
+
+    backfill_in_batches(engine, fetch_batch, apply_batch)
+
+
+# 全体で1つだったボードのバージョンのカウンター（11 で所有者ごとの board_versions に置き換え）
+_LEGACY_BOARD_VERSION = Table(
+    "board_version",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+_LEGACY_BOARD_VERSION_ROW_ID = 1
+
+
+def _add_board_version(conn: Connection):
+    """コミット順に採番するボードのバージョン（既存の履歴は ID をそのままバージョンとする）"""
+    from app.models import BoardChange
+
+    _LEGACY_BOARD_VERSION.create(bind=conn, checkfirst=True)
+    add_column(conn, "board_changes", "version", "INTEGER")
+    conn.execute(update(BoardChange.__table__).where(BoardChange.version.is_(None)).values(version=BoardChange.id))
+    legacy = _LEGACY_BOARD_VERSION.c
+    if conn.execute(select(legacy.id).where(legacy.id == _LEGACY_BOARD_VERSION_ROW_ID)).first() is None:
+        # クライアントが保持しているバージョン（これまでの最大ID）から続ける
+        current = conn.execute(select(func.max(BoardChange.id))).scalar() or 0
+        conn.execute(_LEGACY_BOARD_VERSION.insert(), {"id": _LEGACY_BOARD_VERSION_ROW_ID, "version": current})
+
+
+def _board_change_version_index(engine: Engine):
+    """差分同期でバージョン順に読むインデックス（ID順のものは置き換え）"""
+    from app.models import BoardChange
+
+    for index in BoardChange.__table__.indexes:
+        if index.name == "idx_board_changes_user_id_version":
+            create_index_online(engine, index)
+    drop_index_online(engine, "idx_board_changes_user_id_id")
+
+
+def _backfill_execution_stats(conn: Connection):
+    """日別集計が空なら既存の実行履歴（アーカイブを含む）の全期間から作成"""
+    from app.models import ExecutionStatsDaily
+    from app.services.stats_rollup import reconcile_stats
+
+    if conn.execute(select(ExecutionStatsDaily.id).limit(1)).first() is None:
+        with Session(bind=conn) as session:
+            reconcile_stats(session)
+
+
+def _per_user_board_versions(conn: Connection):
+    """ボードのバージョンを所有者ごとのカウンターに分ける（各所有者はこれまでのバージョンから続ける）"""
+    from app.models import BoardChange, BoardVersion, Project, RoleGroup, Task
+
+    BoardVersion.__table__.create(bind=conn, checkfirst=True)
+    current = conn.execute(select(func.max(BoardChange.version))).scalar() or 0
+    if inspect(conn).has_table(_LEGACY_BOARD_VERSION.name):
+        legacy = _LEGACY_BOARD_VERSION.c
+        current = max(current, conn.execute(select(func.max(legacy.version))).scalar() or 0)
+
+    owners = union(*(select(model.user_id) for model in (BoardChange, Project, Task, RoleGroup))).subquery()
+    keys = {user_id or "" for user_id in conn.execute(select(owners.c.user_id)).scalars()} | {""}
+    keys -= set(conn.execute(select(BoardVersion.user_key)).scalars())
+    if keys:
+        conn.execute(BoardVersion.__table__.insert(), [{"user_key": key, "version": current} for key in sorted(keys)])
+    _LEGACY_BOARD_VERSION.drop(bind=conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    Migration(1, "create_tables", _create_tables),
+    Migration(2, "add_legacy_columns", _add_legacy_columns),
+    Migration(3, "create_model_indexes", _create_model_indexes, transactional=False),
+    Migration(4, "backfill_task_dependencies", _backfill_task_dependencies, transactional=False),
+    Migration(5, "board_order_indexes", _board_order_indexes, transactional=False),
+    Migration(6, "add_task_run_summary_columns", _add_task_run_summary_columns),
+    Migration(7, "backfill_task_run_summary", _backfill_task_run_summary, transactional=False),
+    Migration(8, "add_board_version", _add_board_version),
+    Migration(9, "board_change_version_index", _board_change_version_index, transactional=False),
+    Migration(10, "backfill_execution_stats", _backfill_execution_stats),
+    Migration(11, "per_user_board_versions", _per_user_board_versions),
+]
@@ -1,7 +1,7 @@
 """SQLAlchemy データベースモデル"""
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
+    Column, Integer, String, Text, Boolean, Date, DateTime, Float, ForeignKey, Index, LargeBinary
 )
 from sqlalchemy.orm import relationship
 
@@ -44,8 +44,9 @@ class Project(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    tasks = relationship("Task", back_populates="project", cascade="all, delete-orphan")
-    role_groups = relationship("RoleGroup", back_populates="project", cascade="all, delete-orphan")
+    # ボードの表示順で読み込む（インデックスの順に読むだけで並べ替えが不要）
+    tasks = relationship("Task", back_populates="project", cascade="all, delete-orphan", order_by="Task.order_index, Task.id")
+    role_groups = relationship("RoleGroup", back_populates="project", cascade="all, delete-orphan", order_by="RoleGroup.order_index, RoleGroup.id")
 
 
 class Task(Base):
@@ -77,7 +78,7 @@ class Task(Base):
     role_group = Column(String(100), default="General")
     role_group_id = Column(Integer, ForeignKey("role_groups.id"), nullable=True)
     
-    # 依存関係（前のタスクIDのリストをJSON文字列で保存）
+    # 依存関係（前のタスクIDのリストをJSON文字列で保存、検索用に task_dependencies へ同期）
     dependencies = Column(Text, default="[]")
     
     # 順序（カンバンボードでの表示順）
@@ -89,6 +90,13 @@ class Task(Base):
     notification_credential_id = Column(Integer, ForeignKey("credentials.id"))
     lux_credential_id = Column(Integer, ForeignKey("credentials.id"))  # Lux (OAGI) API Key
     
+    # 実行結果の要約（実行の終了時に更新、ボードで executions を集計せずに表示する）
+    last_run_status = Column(String(20))  # completed, failed, stopped
+    last_run_at = Column(DateTime)
+    success_rate = Column(Float)  # 直近の実行（完了・失敗）の成功率 0〜1
+    p50_duration_seconds = Column(Float)  # 直近の完了した実行の所要時間の中央値
+    recent_runs = Column(Text)  # 要約の計算用: 直近の [成功=1/失敗=0, 所要秒数] のJSON配列
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -101,6 +109,10 @@ class Task(Base):
     executions = relationship("Execution", back_populates="task", cascade="all, delete-orphan")
     triggers = relationship("TaskTrigger", back_populates="task", foreign_keys="TaskTrigger.task_id", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("idx_tasks_project_id_order_index_id", "project_id", "order_index", "id"),
+    )
+
 
 class Execution(Base):
     """実行履歴テーブル"""
@@ -126,6 +138,14 @@ class Execution(Base):
     task = relationship("Task", back_populates="executions")
     steps = relationship("ExecutionStep", back_populates="execution", foreign_keys="ExecutionStep.execution_id", cascade="all, delete-orphan")
 
+    # 実行履歴一覧の絞り込み（なし / task_id / status / 両方）と started_at, id 順のカーソル用
+    __table_args__ = (
+        Index("idx_executions_started_at_id", "started_at", "id"),
+        Index("idx_executions_task_id_started_at_id", "task_id", "started_at", "id"),
+        Index("idx_executions_status_started_at_id", "status", "started_at", "id"),
+        Index("idx_executions_task_id_status_started_at_id", "task_id", "status", "started_at", "id"),
+    )
+
 
 class ExecutionStep(Base):
     """実行ステップテーブル（ライブビュー用）"""
@@ -235,5 +255,90 @@ class RoleGroup(Base):
     project = relationship("Project", back_populates="role_groups")
 
     __table_args__ = (
-        Index("idx_role_groups_project_id", "project_id"),
+        Index("idx_role_groups_project_id_order_index_id", "project_id", "order_index", "id"),
+    )
+
+
+class BoardChange(Base):
+    """カンバンボードの変更履歴（差分同期用、version がボードのバージョンになる）"""
+    __tablename__ = "board_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(36))
+    entity_type = Column(String(20), nullable=False)  # project, task, role_group
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)  # upsert, delete
+    version = Column(Integer)  # 記録したトランザクションで採番した所有者の board_versions.version
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_board_changes_user_id_version", "user_id", "version"),
     )
+
+
+class BoardVersion(Base):
+    """ボードのバージョンのカウンター（所有者ごとに1行、変更を記録するトランザクション内でその所有者の行だけを加算）"""
+    __tablename__ = "board_versions"
+
+    user_key = Column(String(36), primary_key=True)  # user_id（所有者なしは空文字）
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ExecutionStatsDaily(Base):
+    """実行件数の日別集計（started_at の日付・タスク単位、実行の状態遷移で増減）"""
+    __tablename__ = "execution_stats_daily"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False)
+    task_id = Column(Integer, nullable=False)
+    user_id = Column(String(36))
+    total = Column(Integer, nullable=False, default=0)
+    running = Column(Integer, nullable=False, default=0)  # running + pending
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("idx_execution_stats_daily_day_task_id", "day", "task_id", unique=True),
+        Index("idx_execution_stats_daily_user_id_day", "user_id", "day"),
+        Index("idx_execution_stats_daily_task_id_day", "task_id", "day"),
+    )
+
+
+class ExecutionArchive(Base):
+    """アーカイブ済みの実行履歴（実行とステップをまとめてgzip圧縮したJSON、IDは元の実行ID）"""
+    __tablename__ = "execution_archives"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    task_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    step_count = Column(Integer, default=0)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_execution_archives_task_id_started_at", "task_id", "started_at"),
+    )
+
+
+class TaskDependency(Base):
+    """タスクの依存関係（task_id は depends_on_task_id の後に実行、Task.dependencies から同期）"""
+    __tablename__ = "task_dependencies"
+
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    depends_on_task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+
+    # 主キー (task_id, depends_on_task_id) が上流方向、こちらが下流方向の検索用
+    __table_args__ = (
+        Index("idx_task_dependencies_depends_on_task_id", "depends_on_task_id", "task_id"),
+    )
+
+
+class SchemaMigration(Base):
+    """適用済みのスキーママイグレーション（app.migrations が管理）"""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
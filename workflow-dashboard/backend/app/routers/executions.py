@@ -1,17 +1,58 @@
 """実行履歴 API"""
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import json
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
+from sqlalchemy import func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pathlib import Path
 
-from app.database import get_db
-from app.models import Execution, ExecutionStep
-from app.schemas import ExecutionResponse, ExecutionWithTask, ExecutionWithSteps, MessageResponse
+from app.database import get_db, get_read_db, get_async_read_db
+from app.models import Execution, ExecutionArchive, Task
+from app.schemas import (
+    ExecutionResponse, ExecutionWithTask, ExecutionWithSteps, MessageResponse,
+    ExecutionListItem, ExecutionPage
+)
+from app.services.auth import get_current_user, UserInfo
+from app.services.dashboard_state import dashboard_state
+from app.services.execution_archive import load_archived_execution
+from app.services.stats_rollup import COUNTERS, daily_stats_query
+from app.services.task_deletion import remove_screenshot_dirs
 
 router = APIRouter(prefix="/executions", tags=["executions"])
 
 
+def get_user_filter(user: Optional[UserInfo]):
+    """ユーザーIDフィルターを取得（開発モード対応）"""
+    if user and user.id != "local-dev":
+        return user.id
+    return None
+
+
+# 一覧のエラーメッセージは先頭のみ返す
+ERROR_SUMMARY_LENGTH = 200
+
+
+def encode_cursor(started_at: Optional[datetime], execution_id: int) -> str:
+    """一覧の最後の行からカーソルを作成"""
+    payload = {"s": started_at.isoformat() if started_at else None, "i": execution_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """カーソルを (started_at, id) に戻す"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        started_at = datetime.fromisoformat(payload["s"]) if payload["s"] else None
+        return started_at, int(payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="カーソルが不正です")
+
+
 @router.get("")
 def get_executions(
     skip: int = 0,
@@ -19,51 +60,104 @@ def get_executions(
     task_id: Optional[int] = None,
     status: Optional[str] = None,
     with_total: bool = False,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: Session = Depends(get_read_db)
 ):
-    """実行履歴一覧を取得（ページネーション対応）"""
-    query = db.query(Execution)
+    """実行履歴一覧を取得（ページネーション対応）
     
+    started_at, id の降順。cursor に前のページの next_cursor を渡すと続きを取得します
+    （offset と違い、何ページ目でもインデックスの位置から読むだけで済みます）。
+    cursor または summary=true の場合は一覧用の軽量な項目（ExecutionListItem）を返し、
+    with_total / cursor を指定すると ExecutionPage を返します。
+    どちらも指定しない場合は従来通り skip / limit で実行の全項目を返します。
+    """
+    filters = []
     if task_id:
-        query = query.filter(Execution.task_id == task_id)
-    
+        filters.append(Execution.task_id == task_id)
     if status:
-        query = query.filter(Execution.status == status)
+        filters.append(Execution.status == status)
     
     # トータルカウント（オプション）
     total = None
     if with_total:
-        total = query.count()
+        total = db.query(func.count(Execution.id)).filter(*filters).scalar()
     
-    executions = query.order_by(Execution.started_at.desc()).offset(skip).limit(limit).all()
+    if not cursor and not summary:
+        executions = db.query(Execution).filter(*filters).order_by(
+            Execution.started_at.desc(), Execution.id.desc()
+        ).offset(skip).limit(limit).all()
+        if with_total:
+            return {
+                "items": executions,
+                "total": total,
+                "skip": skip,
+                "limit": limit,
+                "has_more": (skip + limit) < total
+            }
+        return executions
     
-    if with_total:
-        return {
-            "items": executions,
-            "total": total,
-            "skip": skip,
-            "limit": limit,
-            "has_more": (skip + limit) < total
-        }
+    query = db.query(
+        Execution.id,
+        Execution.task_id,
+        Task.name.label("task_name"),
+        Execution.status,
+        Execution.started_at,
+        Execution.completed_at,
+        Execution.triggered_by,
+        Execution.total_steps,
+        Execution.completed_steps,
+        Execution.result.isnot(None).label("has_result"),
+        func.substr(Execution.error_message, 1, ERROR_SUMMARY_LENGTH).label("error_summary")
+    ).outerjoin(Task, Task.id == Execution.task_id).filter(*filters)
+    
+    if cursor:
+        # started_at は作成時に必ず設定される
+        cursor_started_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(Execution.started_at, Execution.id) < tuple_(cursor_started_at, cursor_id)
+        )
+    elif skip:
+        query = query.offset(skip)
+    
+    # 次のページがあるか判定するため1件多く取得
+    rows = query.order_by(Execution.started_at.desc(), Execution.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    items = [ExecutionListItem(**row._asdict()) for row in rows[:limit]]
+    
+    if not with_total and not cursor:
+        return items
     
-    return executions
+    last = items[-1] if items and has_more else None
+    return ExecutionPage(
+        items=items,
+        next_cursor=encode_cursor(last.started_at, last.id) if last else None,
+        has_more=has_more,
+        limit=limit,
+        total=total
+    )
 
 
-@router.get("/{execution_id}", response_model=ExecutionWithSteps)
-def get_execution(execution_id: int, db: Session = Depends(get_db)):
-    """実行詳細を取得"""
+def _get_execution(db: Session, execution_id: int) -> Execution:
+    """実行を取得（保持期間を過ぎてアーカイブ済みならアーカイブから復元）"""
     execution = db.query(Execution).filter(Execution.id == execution_id).first()
+    if not execution:
+        execution = load_archived_execution(db, execution_id)
     if not execution:
         raise HTTPException(status_code=404, detail="実行履歴が見つかりません")
     return execution
 
 
+@router.get("/{execution_id}", response_model=ExecutionWithSteps)
+def get_execution(execution_id: int, db: Session = Depends(get_db)):
+    """実行詳細を取得（アーカイブ済みの実行も参照可能）"""
+    return _get_execution(db, execution_id)
+
+
 @router.get("/{execution_id}/logs")
 def get_execution_logs(execution_id: int, db: Session = Depends(get_db)):
     """実行ログを取得（詳細版：execution_stepsとライブビューログも含む）"""
-    execution = db.query(Execution).filter(Execution.id == execution_id).first()
-    if not execution:
-        raise HTTPException(status_code=404, detail="実行履歴が見つかりません")
+    execution = _get_execution(db, execution_id)
     
     logs = []
     
@@ -79,7 +173,7 @@ def get_execution_logs(execution_id: int, db: Session = Depends(get_db)):
                 logs.append({"source": "file", "level": "ERROR", "message": f"ログファイル読み込みエラー: {e}"})
     
     # 2. execution_stepsのエラーメッセージを取得
-    steps = db.query(ExecutionStep).filter(ExecutionStep.execution_id == execution_id).order_by(ExecutionStep.step_number).all()
+    steps = sorted(execution.steps, key=lambda step: step.step_number)
     for step in steps:
         if step.error_message:
             logs.append({
@@ -131,9 +225,7 @@ def get_execution_logs(execution_id: int, db: Session = Depends(get_db)):
 @router.get("/{execution_id}/result/download")
 def download_execution_result(execution_id: int, db: Session = Depends(get_db)):
     """実行結果をダウンロード"""
-    execution = db.query(Execution).filter(Execution.id == execution_id).first()
-    if not execution:
-        raise HTTPException(status_code=404, detail="実行履歴が見つかりません")
+    execution = _get_execution(db, execution_id)
     
     if not execution.result:
         raise HTTPException(status_code=404, detail="結果データがありません")
@@ -165,36 +257,53 @@ def download_execution_result(execution_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/{execution_id}", response_model=MessageResponse)
-def delete_execution(execution_id: int, db: Session = Depends(get_db)):
+def delete_execution(execution_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """実行履歴を削除"""
     execution = db.query(Execution).filter(Execution.id == execution_id).first()
-    if not execution:
+    # アーカイブ済みの場合はアーカイブの行を削除
+    archive = db.get(ExecutionArchive, execution_id) if not execution else None
+    if not execution and not archive:
         raise HTTPException(status_code=404, detail="実行履歴が見つかりません")
     
     # current_step_idをNULLに設定（外部キー制約を回避）
-    if execution.current_step_id is not None:
+    if execution and execution.current_step_id is not None:
         execution.current_step_id = None
         db.commit()
     
-    # スクリーンショットファイルを削除
-    screenshot_dir = Path("screenshots") / str(execution_id)
-    if screenshot_dir.exists():
-        import shutil
-        shutil.rmtree(screenshot_dir)
-    
     # executionを削除（cascadeでexecution_stepsも削除される）
-    db.delete(execution)
+    db.delete(execution or archive)
     db.commit()
+    
+    # スクリーンショットファイルの削除はレスポンス後に行う
+    background_tasks.add_task(remove_screenshot_dirs, [execution_id])
     return {"message": "実行履歴を削除しました"}
 
 
 @router.get("/running/count")
-def get_running_count(db: Session = Depends(get_db)):
-    """実行中のタスク数を取得"""
-    count = db.query(Execution).filter(
-        Execution.status.in_(["running", "pending"])
-    ).count()
-    return {"count": count}
+async def get_running_count():
+    """実行中のタスク数を取得（ダッシュボード統計のスナップショットから返す）"""
+    snapshot = await dashboard_state.get_snapshot()
+    return {"count": snapshot["executions"]["running"]}
+
+
+@router.get("/stats/daily")
+async def get_daily_stats(
+    days: int = Query(30, ge=1, le=366),
+    task_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """日ごとの実行件数（ユーザー・タスク単位、日別集計から取得）"""
+    since = date.today() - timedelta(days=days - 1)
+    query = daily_stats_query(get_user_filter(current_user), task_id, since)
+    rows = (await db.execute(query)).all()
+    return [
+        {
+            "day": row.day.isoformat(),
+            **{column: max(0, int(getattr(row, column) or 0)) for column in COUNTERS}
+        }
+        for row in rows
+    ]
 
 
 
@@ -10,8 +10,11 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+from sqlalchemy.orm import Session
+
 from app.database import SessionLocal
 from app.models import Execution
+from app.services.db_writer import db_writer
 from app.services.live_view_manager import live_view_manager
 from app.utils.logger import logger
 
@@ -28,6 +31,48 @@ class GitHubWebhookPayload(BaseModel):
     run_url: Optional[str] = None
 
 
+def _apply_result(db: Session, payload: GitHubWebhookPayload) -> Optional[Dict[str, Any]]:
+    """実行結果を実行履歴に反映して、通知用の値を返す（実行が見つからなければ None）"""
+    execution = db.query(Execution).filter(
+        Execution.id == payload.execution_id
+    ).first()
+    if not execution:
+        return None
+    
+    # 結果を解析
+    result_data = payload.result or {}
+    success = result_data.get("success", False)
+    result_text = result_data.get("result", "")
+    error_text = result_data.get("error", "")
+    steps_completed = result_data.get("steps_completed", 0)
+    
+    # 実行履歴を更新
+    if success:
+        execution.status = "completed"
+        execution.result = result_text
+    else:
+        execution.status = "failed"
+        execution.error_message = error_text or f"GitHub Actions: {payload.status}"
+    
+    execution.completed_at = datetime.utcnow()
+    execution.total_steps = steps_completed
+    execution.completed_steps = steps_completed
+    
+    # GitHub Actions 実行情報を結果に追加
+    if payload.run_url:
+        extra_info = f"\n\n[GitHub Actions 実行ログ]({payload.run_url})"
+        if execution.result:
+            execution.result += extra_info
+        else:
+            execution.result = extra_info
+    
+    return {
+        "status": execution.status,
+        "result": execution.result,
+        "error_message": execution.error_message
+    }
+
+
 @router.post("/result")
 async def receive_github_result(
     payload: GitHubWebhookPayload,
@@ -45,58 +90,25 @@ async def receive_github_result(
         f"status={payload.status}"
     )
     
-    db = SessionLocal()
     try:
-        # 実行履歴を取得
-        execution = db.query(Execution).filter(
-            Execution.id == payload.execution_id
-        ).first()
-        
-        if not execution:
+        # 実行履歴を更新（書き込みは db_writer 経由）
+        updated = await db_writer.run(_apply_result, payload)
+        if updated is None:
             logger.warning(f"Execution not found: {payload.execution_id}")
             raise HTTPException(status_code=404, detail="Execution not found")
         
-        # 結果を解析
-        result_data = payload.result or {}
-        success = result_data.get("success", False)
-        result_text = result_data.get("result", "")
-        error_text = result_data.get("error", "")
-        steps_completed = result_data.get("steps_completed", 0)
-        
-        # 実行履歴を更新
-        if success:
-            execution.status = "completed"
-            execution.result = result_text
-        else:
-            execution.status = "failed"
-            execution.error_message = error_text or f"GitHub Actions: {payload.status}"
-        
-        execution.completed_at = datetime.utcnow()
-        execution.total_steps = steps_completed
-        execution.completed_steps = steps_completed
-        
-        # GitHub Actions 実行情報を結果に追加
-        if payload.run_url:
-            extra_info = f"\n\n[GitHub Actions 実行ログ]({payload.run_url})"
-            if execution.result:
-                execution.result += extra_info
-            else:
-                execution.result = extra_info
-        
-        db.commit()
-        
         logger.info(
             f"Execution updated: id={payload.execution_id}, "
-            f"status={execution.status}"
+            f"status={updated['status']}"
         )
         
         # WebSocketで完了通知（接続があれば）
         try:
             await live_view_manager.send_execution_complete(
                 execution_id=payload.execution_id,
-                status=execution.status,
-                result=execution.result,
-                error=execution.error_message
+                status=updated["status"],
+                result=updated["result"],
+                error=updated["error_message"]
             )
         except Exception as e:
             logger.warning(f"WebSocket notification failed: {e}")
@@ -105,7 +117,7 @@ async def receive_github_result(
             "success": True,
             "message": "Result received and processed",
             "execution_id": payload.execution_id,
-            "status": execution.status
+            "status": updated["status"]
         }
         
     except HTTPException:
@@ -113,8 +125,6 @@ async def receive_github_result(
     except Exception as e:
         logger.error(f"GitHub webhook error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 
 @router.get("/status/{execution_id}")
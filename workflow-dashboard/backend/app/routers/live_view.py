@@ -1,13 +1,17 @@
 """ライブビュー API"""
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.orm import Session
 from pathlib import Path
+from typing import Optional
 
 from app.database import get_db
 from app.models import Execution, ExecutionStep
 from app.services.browser_controller import browser_controller
 from app.services.live_view_manager import live_view_manager
+from app.services.screenshot_store import screenshot_store
+from app.services.session_recorder import session_recorder
 
 router = APIRouter(tags=["live_view"])
 
@@ -58,7 +62,7 @@ async def get_live_view_data(execution_id: int, db: Session = Depends(get_db)):
             "is_stopping": state.is_stopping if state else False,
             "is_running": state is not None and not state.is_stopping
         },
-        "screenshot": live_view_manager.get_cached_screenshot(execution_id),
+        **screenshot_store.ref(live_view_manager.get_cached_screenshot(execution_id)),
         "logs": live_view_manager.get_cached_logs(execution_id)
     }
 
@@ -89,12 +93,12 @@ async def get_execution_steps(execution_id: int, db: Session = Depends(get_db)):
 
 @router.get("/executions/{execution_id}/screenshot")
 async def get_latest_screenshot(execution_id: int):
-    """最新のスクリーンショットを取得"""
-    screenshot = live_view_manager.get_cached_screenshot(execution_id)
-    if not screenshot:
+    """最新のスクリーンショットの参照を取得"""
+    screenshot_id = live_view_manager.get_cached_screenshot(execution_id)
+    if not screenshot_id:
         raise HTTPException(status_code=404, detail="スクリーンショットがありません")
     
-    return {"screenshot": screenshot}
+    return screenshot_store.ref(screenshot_id)
 
 
 @router.get("/executions/{execution_id}/screenshots/{step_number}")
@@ -108,6 +112,51 @@ async def get_step_screenshot(execution_id: int, step_number: int):
     return FileResponse(screenshot_path, media_type="image/png")
 
 
+@router.get("/executions/{execution_id}/recording")
+async def get_recording(execution_id: int):
+    """セッション録画のインデックス（再生時間とステップマーカー）を取得"""
+    index = await asyncio.to_thread(session_recorder.load_index, execution_id)
+    if not index or not index["frames"]:
+        raise HTTPException(status_code=404, detail="録画が見つかりません")
+    
+    return {
+        "execution_id": execution_id,
+        "frame_count": len(index["frames"]),
+        "duration_ms": index["duration_ms"],
+        "recording": session_recorder.is_recording(execution_id),
+        "steps": index["steps"]
+    }
+
+
+@router.get("/executions/{execution_id}/recording/frame")
+async def get_recording_frame(execution_id: int, t: Optional[int] = None, n: Optional[int] = None):
+    """
+    録画のフレームを取得
+    
+    t: 再生位置（ミリ秒）、n: フレーム番号（どちらか一方を指定）
+    """
+    index = await asyncio.to_thread(session_recorder.load_index, execution_id)
+    if not index or not index["frames"]:
+        raise HTTPException(status_code=404, detail="録画が見つかりません")
+    
+    frame_number = n if n is not None else session_recorder.find_frame(index, t or 0)
+    jpeg = await asyncio.to_thread(session_recorder.read_frame, execution_id, index, frame_number)
+    if jpeg is None:
+        raise HTTPException(status_code=404, detail="フレームが見つかりません")
+    
+    # フレームは追記のみで書き換わらない（録画中の時刻指定は末尾が伸びるため除く）
+    cacheable = n is not None or not session_recorder.is_recording(execution_id)
+    return Response(
+        content=jpeg,
+        media_type="image/jpeg",
+        headers={
+            "X-Frame-Number": str(frame_number),
+            "X-Frame-Time": str(index["frames"][frame_number]["t"]),
+            "Cache-Control": "private, max-age=86400" if cacheable else "no-cache"
+        }
+    )
+
+
 @router.post("/executions/{execution_id}/pause")
 async def pause_execution(execution_id: int, db: Session = Depends(get_db)):
     """実行を一時停止"""
@@ -1,16 +1,22 @@
 """プロジェクト管理 API"""
 from typing import List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Request, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from app.database import get_db
+from app.database import get_db, get_async_db, get_async_read_db
 from app.models import Project, Task, RoleGroup
 from app.schemas import (
     ProjectCreate, ProjectUpdate, ProjectResponse, MessageResponse,
-    ProjectWithTasks, ProjectBoardData, TaskResponse,
+    ProjectWithTasks, ProjectBoardData, ProjectBoardDelta, TaskResponse,
     RoleGroupCreate, RoleGroupUpdate, RoleGroupResponse
 )
 from app.services.auth import get_current_user, UserInfo
+from app.services.board_cache import board_cache, board_etag
+from app.services.board_sync import get_board_changes, get_board_state, record_board_changes
+from app.services.execution_events import execution_events
+from app.services.task_deletion import delete_project as delete_project_rows, remove_screenshot_dirs
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -25,24 +31,24 @@ def get_user_filter(user: Optional[UserInfo]):
 async def get_projects(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """プロジェクト一覧を取得"""
-    query = db.query(Project)
+    query = select(Project)
     
     user_id = get_user_filter(current_user)
     if user_id:
-        query = query.filter(Project.user_id == user_id)
+        query = query.where(Project.user_id == user_id)
     
-    projects = query.order_by(Project.updated_at.desc()).offset(skip).limit(limit).all()
-    return projects
+    result = await db.execute(query.order_by(Project.updated_at.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
 
 
 @router.post("", response_model=ProjectResponse)
 async def create_project(
     project: ProjectCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """プロジェクトを作成"""
@@ -53,25 +59,27 @@ async def create_project(
     
     db_project = Project(**project_data)
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     return db_project
 
 
+async def _get_owned_project(db: AsyncSession, project_id: int, user_id: Optional[str], *options) -> Optional[Project]:
+    """ユーザーが所有するプロジェクトを取得"""
+    query = select(Project).options(*options).where(Project.id == project_id)
+    if user_id:
+        query = query.where(Project.user_id == user_id)
+    return (await db.execute(query)).scalar_one_or_none()
+
+
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """プロジェクト詳細を取得"""
-    query = db.query(Project).filter(Project.id == project_id)
-    
-    user_id = get_user_filter(current_user)
-    if user_id:
-        query = query.filter(Project.user_id == user_id)
-    
-    project = query.first()
+    project = await _get_owned_project(db, project_id, get_user_filter(current_user))
     if not project:
         raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
     return project
@@ -81,17 +89,11 @@ async def get_project(
 async def update_project(
     project_id: int,
     project_update: ProjectUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """プロジェクトを更新"""
-    query = db.query(Project).filter(Project.id == project_id)
-    
-    user_id = get_user_filter(current_user)
-    if user_id:
-        query = query.filter(Project.user_id == user_id)
-    
-    project = query.first()
+    project = await _get_owned_project(db, project_id, get_user_filter(current_user))
     if not project:
         raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
     
@@ -99,116 +101,136 @@ async def update_project(
     for key, value in update_data.items():
         setattr(project, key, value)
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     return project
 
 
 @router.delete("/{project_id}", response_model=MessageResponse)
 async def delete_project(
     project_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
-    """プロジェクトを削除（含まれるタスクも削除）"""
-    query = db.query(Project).filter(Project.id == project_id)
-    
-    user_id = get_user_filter(current_user)
-    if user_id:
-        query = query.filter(Project.user_id == user_id)
-    
-    project = query.first()
+    """プロジェクトを削除（含まれるタスク・実行履歴もまとめて削除）"""
+    project = await _get_owned_project(db, project_id, get_user_filter(current_user))
     if not project:
         raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
     
-    db.delete(project)
-    db.commit()
+    result = await db.run_sync(delete_project_rows, project_id)
+    await db.commit()
+    await execution_events.emit(result["events"])
+    
+    # スクリーンショットの削除はレスポンス後に行う
+    background_tasks.add_task(remove_screenshot_dirs, result["execution_ids"])
     return {"message": "プロジェクトを削除しました"}
 
 
 # ==================== カンバンボード用API ====================
 
-@router.get("/board/data", response_model=ProjectBoardData)
-async def get_board_data(
-    db: Session = Depends(get_db),
-    current_user: Optional[UserInfo] = Depends(get_current_user)
-):
-    """カンバンボード用のデータを一括取得"""
-    user_id = get_user_filter(current_user)
-    
-    # プロジェクトを取得（タスクと役割グループを含む）
-    project_query = db.query(Project).options(
-        joinedload(Project.tasks),
-        joinedload(Project.role_groups)
+def _project_board_entry(project: Project) -> dict:
+    """ボード用のプロジェクト（タスクと役割グループはリレーションの order_by で表示順に読み込み済み）"""
+    return {
+        "id": project.id,
+        "name": project.name,
+        "description": project.description,
+        "color": project.color or "#6366f1",
+        "icon": project.icon or "folder",
+        "created_at": project.created_at,
+        "updated_at": project.updated_at,
+        "tasks": project.tasks,
+        "role_groups": project.role_groups
+    }
+
+
+async def _load_board_data(db: AsyncSession, user_id: Optional[str], version: int) -> dict:
+    """ボードのデータを読み込む（タスク・役割グループはプロジェクトIDごとに別クエリでまとめて読み込む）"""
+    project_query = select(Project).options(
+        selectinload(Project.tasks),
+        selectinload(Project.role_groups)
     )
     if user_id:
-        project_query = project_query.filter(Project.user_id == user_id)
+        project_query = project_query.where(Project.user_id == user_id)
     
-    projects = project_query.order_by(Project.created_at.desc()).all()
+    projects = (await db.execute(project_query.order_by(Project.created_at.desc()))).scalars().all()
     
     # 未割り当てタスク（プロジェクトIDがnull）
-    unassigned_query = db.query(Task).filter(Task.project_id == None)
+    unassigned_query = select(Task).where(Task.project_id.is_(None))
     if user_id:
-        unassigned_query = unassigned_query.filter(Task.user_id == user_id)
-    unassigned_tasks = unassigned_query.order_by(Task.order_index, Task.created_at.desc()).all()
-    
-    # レスポンス作成
-    project_data = []
-    for project in projects:
-        sorted_tasks = sorted(project.tasks, key=lambda t: (t.order_index, t.id))
-        sorted_groups = sorted(project.role_groups, key=lambda g: (g.order_index, g.id))
-        project_data.append({
-            "id": project.id,
-            "name": project.name,
-            "description": project.description,
-            "color": project.color or "#6366f1",
-            "icon": project.icon or "folder",
-            "created_at": project.created_at,
-            "updated_at": project.updated_at,
-            "tasks": sorted_tasks,
-            "role_groups": sorted_groups
-        })
+        unassigned_query = unassigned_query.where(Task.user_id == user_id)
+    unassigned_tasks = (await db.execute(
+        unassigned_query.order_by(Task.order_index, Task.created_at.desc())
+    )).scalars().all()
     
     return {
-        "projects": project_data,
-        "unassigned_tasks": unassigned_tasks
+        "projects": [_project_board_entry(project) for project in projects],
+        "unassigned_tasks": unassigned_tasks,
+        "version": version
     }
 
 
+@router.get("/board/data", response_model=ProjectBoardData)
+async def get_board_data(
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """
+    カンバンボード用のデータを一括取得
+    
+    ボードのバージョンが変わっていなければキャッシュ済みのJSONを返し、
+    If-None-Match が一致すれば 304 を返します。
+    """
+    user_id = get_user_filter(current_user)
+    
+    # 読み込み中の変更を取りこぼさないよう、先にバージョンを確定する
+    # （このバージョン以下の変更はコミット済みなので、後に読むデータは少なくともこの時点より新しい）
+    version, revision = await db.run_sync(get_board_state, user_id)
+    etag = board_etag(user_id, revision)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    cached = board_cache.get(user_id, revision)
+    if cached is None:
+        data = await _load_board_data(db, user_id, version)
+        body = ProjectBoardData.model_validate(data, from_attributes=True).model_dump_json().encode("utf-8")
+        board_cache.put(user_id, revision, body)
+    else:
+        body = cached[1]
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/board/changes", response_model=ProjectBoardDelta)
+async def get_board_delta(
+    since: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """バージョン since 以降に変更されたプロジェクト・タスク・役割グループのみを取得"""
+    user_id = get_user_filter(current_user)
+    return await db.run_sync(get_board_changes, user_id, since)
+
+
 @router.get("/{project_id}/with-tasks", response_model=ProjectWithTasks)
 async def get_project_with_tasks(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """プロジェクトとそのタスク、役割グループを取得"""
-    query = db.query(Project).options(
-        joinedload(Project.tasks),
-        joinedload(Project.role_groups)
-    ).filter(Project.id == project_id)
-    
-    user_id = get_user_filter(current_user)
-    if user_id:
-        query = query.filter(Project.user_id == user_id)
-    
-    project = query.first()
+    project = await _get_owned_project(
+        db,
+        project_id,
+        get_user_filter(current_user),
+        selectinload(Project.tasks),
+        selectinload(Project.role_groups)
+    )
     if not project:
         raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
     
-    sorted_tasks = sorted(project.tasks, key=lambda t: (t.order_index, t.id))
-    sorted_groups = sorted(project.role_groups, key=lambda g: (g.order_index, g.id))
-    
-    return {
-        "id": project.id,
-        "name": project.name,
-        "description": project.description,
-        "color": project.color or "#6366f1",
-        "icon": project.icon or "folder",
-        "created_at": project.created_at,
-        "updated_at": project.updated_at,
-        "tasks": sorted_tasks,
-        "role_groups": sorted_groups
-    }
+    return _project_board_entry(project)
 
 
 # ==================== 役割グループAPI ====================
@@ -217,24 +239,20 @@ async def get_project_with_tasks(
 async def create_role_group(
     project_id: int,
     role_group: RoleGroupCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """役割グループを作成"""
     # プロジェクトの存在確認
-    project_query = db.query(Project).filter(Project.id == project_id)
     user_id = get_user_filter(current_user)
-    if user_id:
-        project_query = project_query.filter(Project.user_id == user_id)
-    
-    project = project_query.first()
+    project = await _get_owned_project(db, project_id, user_id)
     if not project:
         raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
     
     # 最大order_indexを取得
-    max_order = db.query(RoleGroup).filter(
-        RoleGroup.project_id == project_id
-    ).count()
+    max_order = (await db.execute(
+        select(func.count(RoleGroup.id)).where(RoleGroup.project_id == project_id)
+    )).scalar()
     
     group_data = role_group.model_dump()
     group_data["project_id"] = project_id
@@ -244,43 +262,45 @@ async def create_role_group(
     
     db_group = RoleGroup(**group_data)
     db.add(db_group)
-    db.commit()
-    db.refresh(db_group)
+    await db.commit()
+    await db.refresh(db_group)
     return db_group
 
 
 @router.get("/{project_id}/role-groups", response_model=List[RoleGroupResponse])
 async def get_role_groups(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """プロジェクトの役割グループ一覧を取得"""
     user_id = get_user_filter(current_user)
     
-    query = db.query(RoleGroup).filter(RoleGroup.project_id == project_id)
+    query = select(RoleGroup).where(RoleGroup.project_id == project_id)
     if user_id:
-        query = query.filter(RoleGroup.user_id == user_id)
+        query = query.where(RoleGroup.user_id == user_id)
     
-    groups = query.order_by(RoleGroup.order_index).all()
-    return groups
+    result = await db.execute(query.order_by(RoleGroup.order_index))
+    return result.scalars().all()
+
+
+async def _get_owned_role_group(db: AsyncSession, group_id: int, user_id: Optional[str]) -> Optional[RoleGroup]:
+    """ユーザーが所有する役割グループを取得"""
+    query = select(RoleGroup).where(RoleGroup.id == group_id)
+    if user_id:
+        query = query.where(RoleGroup.user_id == user_id)
+    return (await db.execute(query)).scalar_one_or_none()
 
 
 @router.put("/role-groups/{group_id}", response_model=RoleGroupResponse)
 async def update_role_group(
     group_id: int,
     group_update: RoleGroupUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """役割グループを更新"""
-    query = db.query(RoleGroup).filter(RoleGroup.id == group_id)
-    
-    user_id = get_user_filter(current_user)
-    if user_id:
-        query = query.filter(RoleGroup.user_id == user_id)
-    
-    group = query.first()
+    group = await _get_owned_role_group(db, group_id, get_user_filter(current_user))
     if not group:
         raise HTTPException(status_code=404, detail="役割グループが見つかりません")
     
@@ -288,42 +308,40 @@ async def update_role_group(
     for key, value in update_data.items():
         setattr(group, key, value)
     
-    db.commit()
-    db.refresh(group)
+    await db.commit()
+    await db.refresh(group)
     return group
 
 
 @router.delete("/role-groups/{group_id}", response_model=MessageResponse)
 async def delete_role_group(
     group_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """役割グループを削除"""
-    query = db.query(RoleGroup).filter(RoleGroup.id == group_id)
-    
     user_id = get_user_filter(current_user)
-    if user_id:
-        query = query.filter(RoleGroup.user_id == user_id)
-    
-    group = query.first()
+    group = await _get_owned_role_group(db, group_id, user_id)
     if not group:
         raise HTTPException(status_code=404, detail="役割グループが見つかりません")
     
-    # グループに属するタスクのrole_group_idをnullに更新
-    db.query(Task).filter(Task.role_group_id == group_id).update(
-        {"role_group_id": None},
-        synchronize_session=False
+    # グループに属するタスクのrole_group_idをnullに更新（一括更新のため差分同期用に明示的に記録）
+    task_ids = (await db.execute(select(Task.id).where(Task.role_group_id == group_id))).scalars().all()
+    await db.execute(
+        update(Task).where(Task.role_group_id == group_id).values(role_group_id=None),
+        execution_options={"synchronize_session": False}
     )
+    await db.run_sync(record_board_changes, "task", task_ids, "upsert", group.user_id)
     
-    db.delete(group)
-    db.commit()
+    await db.delete(group)
+    await db.commit()
     return {"message": "役割グループを削除しました"}
 
 
 # ==================== プロジェクトチャットAPI ====================
 
 from pydantic import BaseModel
+from app.services.chat_stream import chat_event_stream
 from app.services.project_chat import project_chat_service
 
 
@@ -339,6 +357,16 @@ class ProjectChatActionsRequest(BaseModel):
     actions: List[dict]
 
 
+def _ensure_chat_project(db: Session, project_id: int, user_id: Optional[str]):
+    """チャット対象のプロジェクトの存在確認"""
+    project_query = db.query(Project.id).filter(Project.id == project_id)
+    if user_id:
+        project_query = project_query.filter(Project.user_id == user_id)
+    
+    if not project_query.first():
+        raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
+
+
 @router.post("/{project_id}/chat")
 async def chat_with_project(
     project_id: int,
@@ -347,15 +375,8 @@ async def chat_with_project(
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """プロジェクトのAIチャット（全体管理）"""
-    # プロジェクトの存在確認
     user_id = get_user_filter(current_user)
-    project_query = db.query(Project).filter(Project.id == project_id)
-    if user_id:
-        project_query = project_query.filter(Project.user_id == user_id)
-    
-    project = project_query.first()
-    if not project:
-        raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
+    _ensure_chat_project(db, project_id, user_id)
     
     # チャットを実行（user_idを渡してAPIキー保存時に使用）
     result = await project_chat_service.chat(
@@ -370,6 +391,28 @@ async def chat_with_project(
     return result
 
 
+@router.post("/{project_id}/chat/stream")
+def chat_with_project_stream(
+    project_id: int,
+    request: ProjectChatRequest,
+    db: Session = Depends(get_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """プロジェクトのAIチャット（応答を SSE でストリーミング）"""
+    user_id = get_user_filter(current_user)
+    _ensure_chat_project(db, project_id, user_id)
+    
+    return chat_event_stream(lambda chat_db, on_delta: project_chat_service.chat(
+        chat_db,
+        project_id,
+        request.message,
+        request.chat_history,
+        user_id,
+        request.model,
+        on_delta=on_delta
+    ))
+
+
 @router.post("/{project_id}/chat/execute-actions")
 async def execute_chat_actions(
     project_id: int,
@@ -448,13 +491,7 @@ async def wizard_chat(
 ):
     """空プロジェクト用ウィザードチャット（ワークフロー構築支援）"""
     user_id = get_user_filter(current_user)
-    project_query = db.query(Project).filter(Project.id == project_id)
-    if user_id:
-        project_query = project_query.filter(Project.user_id == user_id)
-    
-    project = project_query.first()
-    if not project:
-        raise HTTPException(status_code=404, detail="プロジェクトが見つかりません")
+    _ensure_chat_project(db, project_id, user_id)
     
     result = await project_chat_service.wizard_chat_for_new_project(
         db,
@@ -470,6 +507,30 @@ async def wizard_chat(
     return result
 
 
+@router.post("/{project_id}/wizard-chat/stream")
+def wizard_chat_stream(
+    project_id: int,
+    request: WizardChatRequest,
+    db: Session = Depends(get_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """空プロジェクト用ウィザードチャット（応答を SSE でストリーミング）"""
+    user_id = get_user_filter(current_user)
+    _ensure_chat_project(db, project_id, user_id)
+    
+    return chat_event_stream(lambda chat_db, on_delta: project_chat_service.wizard_chat_for_new_project(
+        chat_db,
+        project_id,
+        request.message,
+        request.chat_history,
+        request.video_analysis,
+        request.web_research,
+        user_id,
+        request.model,
+        on_delta=on_delta
+    ))
+
+
 @router.post("/{project_id}/web-search")
 async def web_search(
     project_id: int,
@@ -650,8 +711,7 @@ async def validate_and_create_task(
 ):
     """タスクを検証してから作成（オプションでテスト実行）"""
     from app.services.agent import run_task_with_live_view
-    from app.models import Execution
-    from datetime import datetime
+    from app.services.db_writer import create_execution, db_writer
     
     user_id = get_user_filter(current_user)
     task_data = request.task_data
@@ -726,21 +786,13 @@ async def validate_and_create_task(
     # 4. テスト実行（オプション）
     if request.auto_run_test:
         try:
-            execution = Execution(
-                task_id=task.id,
-                status="pending",
-                triggered_by="test",
-                started_at=datetime.utcnow()
-            )
-            db.add(execution)
-            db.commit()
-            db.refresh(execution)
+            execution_id = await db_writer.run(create_execution, task.id, "test")
             
             # バックグラウンドで実行
-            background_tasks.add_task(run_task_with_live_view, task.id, execution.id)
+            background_tasks.add_task(run_task_with_live_view, task.id, execution_id)
             
             validation_results["test_execution"] = {
-                "execution_id": execution.id,
+                "execution_id": execution_id,
                 "status": "started"
             }
         except Exception as e:
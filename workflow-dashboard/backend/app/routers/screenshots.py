@@ -0,0 +1,28 @@
+"""スクリーンショット配信 API"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from app.services.screenshot_store import screenshot_store
+
+router = APIRouter(prefix="/screenshots", tags=["screenshots"])
+
+# IDは内容のハッシュなので同じURLの中身は変わらない（実行画面のスクリーンショットなので共有キャッシュには置かせない）
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+@router.get("/{screenshot_id}")
+async def get_screenshot(screenshot_id: str, request: Request):
+    """スクリーンショットを取得（強いETag付き、ブラウザで永続キャッシュ可能）"""
+    etag = f'"{screenshot_id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL})
+    
+    path = screenshot_store.find(screenshot_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="スクリーンショットが見つかりません")
+    
+    return FileResponse(
+        path,
+        media_type=screenshot_store.media_type(path),
+        headers={"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
@@ -6,6 +6,9 @@ from typing import Optional, List
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from app.services.http_clients import http_clients
+from app.services.anthropic_client import prompt_cache_stats
+from app.services.llm_gateway import llm_gateway
 from app.services.openai_client import get_available_models, DEFAULT_CHAT_MODEL
 
 router = APIRouter(prefix="/system", tags=["system"])
@@ -195,4 +198,13 @@ def get_ai_models():
     }
 
 
+@router.get("/http-clients")
+def get_http_client_metrics():
+    """外部APIへのHTTPクライアントの接続の再利用状況"""
+    return http_clients.get_metrics()
 
+
+@router.get("/llm-gateway")
+def get_llm_gateway_status():
+    """LLM プロバイダーごとのサーキットブレーカーの状態と Anthropic のプロンプトキャッシュの利用状況"""
+    return {"providers": llm_gateway.get_status(), "anthropic_prompt_cache": prompt_cache_stats.get_stats()}
@@ -1,15 +1,22 @@
 """タスク管理 API"""
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from app.database import get_db
-from app.models import Task, Execution, TaskTrigger
+from app.database import get_db, get_async_db, get_async_read_db
+from app.models import Task, TaskTrigger
 from app.schemas import (
     TaskCreate, TaskUpdate, TaskResponse, TaskWithCredentials, MessageResponse,
     TaskBatchUpdateRequest, TaskTriggerCreate, TaskTriggerUpdate, TaskTriggerResponse
 )
 from app.services.auth import get_current_user, UserInfo
+from app.services.board_sync import record_board_changes
+from app.services.db_writer import create_execution, db_writer, update_execution
+from app.services.execution_events import execution_events
+from app.services.task_deletion import delete_tasks, remove_screenshot_dirs
+from app.services.task_dependencies import downstream_task_ids, upstream_task_ids
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
@@ -26,28 +33,28 @@ async def get_tasks(
     skip: int = 0,
     limit: int = 100,
     is_active: bool = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスク一覧を取得（ユーザーに紐づくタスクのみ）"""
-    query = db.query(Task)
+    query = select(Task)
     
     # ユーザーIDでフィルタリング
     user_id = get_user_filter(current_user)
     if user_id:
-        query = query.filter(Task.user_id == user_id)
+        query = query.where(Task.user_id == user_id)
     
     if is_active is not None:
-        query = query.filter(Task.is_active == is_active)
+        query = query.where(Task.is_active == is_active)
     
-    tasks = query.order_by(Task.created_at.desc()).offset(skip).limit(limit).all()
-    return tasks
+    result = await db.execute(query.order_by(Task.created_at.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
 
 
 @router.post("", response_model=TaskResponse)
 async def create_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスクを作成（ユーザーIDを保存）"""
@@ -59,26 +66,31 @@ async def create_task(
     
     db_task = Task(**task_data)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
+    await db.refresh(db_task)
     return db_task
 
 
 @router.get("/{task_id}", response_model=TaskWithCredentials)
 async def get_task(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスク詳細を取得"""
-    query = db.query(Task).filter(Task.id == task_id)
+    query = select(Task).options(
+        selectinload(Task.llm_credential),
+        selectinload(Task.site_credential),
+        selectinload(Task.notification_credential),
+        selectinload(Task.lux_credential)
+    ).where(Task.id == task_id)
     
     # ユーザーIDでフィルタリング
     user_id = get_user_filter(current_user)
     if user_id:
-        query = query.filter(Task.user_id == user_id)
+        query = query.where(Task.user_id == user_id)
     
-    task = query.first()
+    task = (await db.execute(query)).scalar_one_or_none()
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     return task
@@ -88,18 +100,18 @@ async def get_task(
 async def update_task(
     task_id: int,
     task_update: TaskUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスクを更新"""
-    query = db.query(Task).filter(Task.id == task_id)
+    query = select(Task).where(Task.id == task_id)
     
     # ユーザーIDでフィルタリング
     user_id = get_user_filter(current_user)
     if user_id:
-        query = query.filter(Task.user_id == user_id)
+        query = query.where(Task.user_id == user_id)
     
-    task = query.first()
+    task = (await db.execute(query)).scalar_one_or_none()
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
@@ -107,66 +119,53 @@ async def update_task(
     for key, value in update_data.items():
         setattr(task, key, value)
     
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
     return task
 
 
 @router.delete("/{task_id}", response_model=MessageResponse)
 async def delete_task(
     task_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
-    """タスクを削除"""
-    query = db.query(Task).filter(Task.id == task_id)
-    
-    # ユーザーIDでフィルタリング
-    user_id = get_user_filter(current_user)
-    if user_id:
-        query = query.filter(Task.user_id == user_id)
-    
-    task = query.first()
+    """タスクを削除（実行履歴・ステップもまとめて削除）"""
+    task = await _get_owned_task(db, task_id, get_user_filter(current_user))
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
-    # タスクに関連するexecutionsを取得
-    executions = db.query(Execution).filter(Execution.task_id == task_id).all()
-    
-    # 各executionのcurrent_step_idをNULLに設定（外部キー制約を回避）
-    for execution in executions:
-        if execution.current_step_id is not None:
-            execution.current_step_id = None
+    result = await db.run_sync(delete_tasks, [task_id])
+    await db.commit()
+    await execution_events.emit(result["events"])
     
-    db.commit()
-    
-    # タスクを削除（cascadeでexecutionsとexecution_stepsも削除される）
-    db.delete(task)
-    db.commit()
+    # スクリーンショットの削除はレスポンス後に行う
+    background_tasks.add_task(remove_screenshot_dirs, result["execution_ids"])
     return {"message": "タスクを削除しました"}
 
 
 @router.post("/{task_id}/toggle", response_model=TaskResponse)
 async def toggle_task(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスクの有効/無効を切り替え"""
-    query = db.query(Task).filter(Task.id == task_id)
+    query = select(Task).where(Task.id == task_id)
     
     # ユーザーIDでフィルタリング
     user_id = get_user_filter(current_user)
     if user_id:
-        query = query.filter(Task.user_id == user_id)
+        query = query.where(Task.user_id == user_id)
     
-    task = query.first()
+    task = (await db.execute(query)).scalar_one_or_none()
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
     task.is_active = not task.is_active
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
     return task
 
 
@@ -185,7 +184,6 @@ async def run_task(
     """
     from app.services.agent import run_task_with_live_view
     from app.services.github_actions import github_actions_service
-    from datetime import datetime
     import os
     
     query = db.query(Task).filter(Task.id == task_id)
@@ -199,24 +197,21 @@ async def run_task(
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
-    # 実行レコードを作成
-    execution = Execution(
-        task_id=task_id,
-        status="pending",
-        triggered_by="manual" if not use_github_actions else "github_actions",
-        started_at=datetime.utcnow()
+    # 実行レコードを作成（書き込みは db_writer 経由）
+    execution_id = await db_writer.run(
+        create_execution, task_id, "manual" if not use_github_actions else "github_actions"
     )
-    db.add(execution)
-    db.commit()
-    db.refresh(execution)
     
     # GitHub Actionsで実行する場合
     if use_github_actions:
         if not github_actions_service.is_configured():
             # 設定されていない場合はエラー
-            execution.status = "failed"
-            execution.error_message = "GitHub Actionsが設定されていません。環境変数GITHUB_PAT, GITHUB_REPO_OWNER, GITHUB_REPO_NAMEを設定してください。"
-            db.commit()
+            await db_writer.run(
+                update_execution,
+                execution_id,
+                status="failed",
+                error_message="GitHub Actionsが設定されていません。環境変数GITHUB_PAT, GITHUB_REPO_OWNER, GITHUB_REPO_NAMEを設定してください。"
+            )
             raise HTTPException(
                 status_code=400, 
                 detail="GitHub Actionsが設定されていません"
@@ -229,7 +224,7 @@ async def run_task(
         # GitHub Actionsにディスパッチ
         result = await github_actions_service.dispatch_task(
             task_id=task_id,
-            execution_id=execution.id,
+            execution_id=execution_id,
             task_prompt=task.task_prompt,
             target_url=None,  # タスクプロンプト内にURLが含まれる想定
             max_steps=task.max_steps or 20,
@@ -237,27 +232,29 @@ async def run_task(
         )
         
         if result.get("success"):
-            execution.status = "running"
-            db.commit()
+            await db_writer.run(update_execution, execution_id, status="running")
             return {
                 "message": "GitHub Actionsでタスクを開始しました。完了までお待ちください。",
-                "execution_id": execution.id,
+                "execution_id": execution_id,
                 "status": "running",
                 "execution_mode": "github_actions",
                 "estimated_start": "30秒〜1分後"
             }
         else:
-            execution.status = "failed"
-            execution.error_message = result.get("error", "GitHub Actions dispatch failed")
-            db.commit()
+            await db_writer.run(
+                update_execution,
+                execution_id,
+                status="failed",
+                error_message=result.get("error", "GitHub Actions dispatch failed")
+            )
             raise HTTPException(status_code=500, detail=result.get("error"))
     
     # 従来通りバックグラウンドで実行
-    background_tasks.add_task(run_task_with_live_view, task_id, execution.id)
+    background_tasks.add_task(run_task_with_live_view, task_id, execution_id)
     
     return {
         "message": "タスクを開始しました",
-        "execution_id": execution.id,
+        "execution_id": execution_id,
         "status": "pending",
         "execution_mode": "local"
     }
@@ -277,7 +274,6 @@ async def run_task_remote(
     - 毎回クリーンな環境
     """
     from app.services.github_actions import github_actions_service
-    from datetime import datetime
     import os
     
     query = db.query(Task).filter(Task.id == task_id)
@@ -298,16 +294,8 @@ async def run_task_remote(
             detail="GitHub Actionsが設定されていません。環境変数GITHUB_PAT, GITHUB_REPO_OWNER, GITHUB_REPO_NAMEを設定してください。"
         )
     
-    # 実行レコードを作成
-    execution = Execution(
-        task_id=task_id,
-        status="pending",
-        triggered_by="github_actions",
-        started_at=datetime.utcnow()
-    )
-    db.add(execution)
-    db.commit()
-    db.refresh(execution)
+    # 実行レコードを作成（書き込みは db_writer 経由）
+    execution_id = await db_writer.run(create_execution, task_id, "github_actions")
     
     # Webhook URLを構築
     app_url = os.environ.get("APP_URL", "http://localhost:8000")
@@ -316,7 +304,7 @@ async def run_task_remote(
     # GitHub Actionsにディスパッチ
     result = await github_actions_service.dispatch_task(
         task_id=task_id,
-        execution_id=execution.id,
+        execution_id=execution_id,
         task_prompt=task.task_prompt,
         target_url=None,
         max_steps=task.max_steps or 20,
@@ -324,20 +312,22 @@ async def run_task_remote(
     )
     
     if result.get("success"):
-        execution.status = "running"
-        db.commit()
+        await db_writer.run(update_execution, execution_id, status="running")
         return {
             "message": "GitHub Actionsでタスクを開始しました",
-            "execution_id": execution.id,
+            "execution_id": execution_id,
             "status": "running",
             "execution_mode": "github_actions",
             "estimated_start": "30秒〜1分後",
             "note": "完了時に自動で通知されます"
         }
     else:
-        execution.status = "failed"
-        execution.error_message = result.get("error", "GitHub Actions dispatch failed")
-        db.commit()
+        await db_writer.run(
+            update_execution,
+            execution_id,
+            status="failed",
+            error_message=result.get("error", "GitHub Actions dispatch failed")
+        )
         raise HTTPException(status_code=500, detail=result.get("error"))
 
 
@@ -346,70 +336,85 @@ async def run_task_remote(
 @router.post("/batch-update", response_model=MessageResponse)
 async def batch_update_tasks(
     request: TaskBatchUpdateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """複数タスクを一括更新（ドラッグ&ドロップ用）"""
     user_id = get_user_filter(current_user)
     
+    # 対象タスク（所有者のみ）を1回のクエリで確認
+    query = select(Task.id, Task.user_id).where(Task.id.in_([task_update.id for task_update in request.tasks]))
+    if user_id:
+        query = query.where(Task.user_id == user_id)
+    owners = dict((await db.execute(query)).all())
+    
+    rows = []
     for task_update in request.tasks:
-        query = db.query(Task).filter(Task.id == task_update.id)
-        if user_id:
-            query = query.filter(Task.user_id == user_id)
-        
-        task = query.first()
-        if task:
-            if task_update.project_id is not None:
-                task.project_id = task_update.project_id if task_update.project_id > 0 else None
-            if task_update.role_group is not None:
-                task.role_group = task_update.role_group
-            if task_update.role_group_id is not None:
-                task.role_group_id = task_update.role_group_id if task_update.role_group_id > 0 else None
-            if task_update.order_index is not None:
-                task.order_index = task_update.order_index
-    
-    db.commit()
+        if task_update.id not in owners:
+            continue
+        values = {"id": task_update.id}
+        if task_update.project_id is not None:
+            values["project_id"] = task_update.project_id if task_update.project_id > 0 else None
+        if task_update.role_group is not None:
+            values["role_group"] = task_update.role_group
+        if task_update.role_group_id is not None:
+            values["role_group_id"] = task_update.role_group_id if task_update.role_group_id > 0 else None
+        if task_update.order_index is not None:
+            values["order_index"] = task_update.order_index
+        if len(values) > 1:
+            rows.append(values)
+    
+    if rows:
+        # 主キー指定の一括UPDATE（セッションイベントを経由しないためボード変更は明示的に記録）
+        await db.execute(update(Task), rows)
+        changed_by_user = {}
+        for values in rows:
+            changed_by_user.setdefault(owners[values["id"]], []).append(values["id"])
+        for owner_id, task_ids in changed_by_user.items():
+            await db.run_sync(record_board_changes, "task", task_ids, "upsert", owner_id)
+    
+    await db.commit()
     return {"message": f"{len(request.tasks)}件のタスクを更新しました"}
 
 
 # ==================== トリガーAPI ====================
 
+async def _get_owned_task(db: AsyncSession, task_id: int, user_id: Optional[str]) -> Optional[Task]:
+    """ユーザーが所有するタスクを取得"""
+    query = select(Task).where(Task.id == task_id)
+    if user_id:
+        query = query.where(Task.user_id == user_id)
+    return (await db.execute(query)).scalar_one_or_none()
+
+
 @router.get("/{task_id}/triggers", response_model=List[TaskTriggerResponse])
 async def get_task_triggers(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスクのトリガー一覧を取得"""
     # タスクの存在確認
     user_id = get_user_filter(current_user)
-    task_query = db.query(Task).filter(Task.id == task_id)
-    if user_id:
-        task_query = task_query.filter(Task.user_id == user_id)
-    
-    task = task_query.first()
+    task = await _get_owned_task(db, task_id, user_id)
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
-    triggers = db.query(TaskTrigger).filter(TaskTrigger.task_id == task_id).all()
-    return triggers
+    result = await db.execute(select(TaskTrigger).where(TaskTrigger.task_id == task_id))
+    return result.scalars().all()
 
 
 @router.post("/{task_id}/triggers", response_model=TaskTriggerResponse)
 async def create_task_trigger(
     task_id: int,
     trigger: TaskTriggerCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスクのトリガーを作成"""
     # タスクの存在確認
     user_id = get_user_filter(current_user)
-    task_query = db.query(Task).filter(Task.id == task_id)
-    if user_id:
-        task_query = task_query.filter(Task.user_id == user_id)
-    
-    task = task_query.first()
+    task = await _get_owned_task(db, task_id, user_id)
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
@@ -418,8 +423,8 @@ async def create_task_trigger(
     
     db_trigger = TaskTrigger(**trigger_data)
     db.add(db_trigger)
-    db.commit()
-    db.refresh(db_trigger)
+    await db.commit()
+    await db.refresh(db_trigger)
     return db_trigger
 
 
@@ -427,56 +432,90 @@ async def create_task_trigger(
 async def update_task_trigger(
     trigger_id: int,
     trigger_update: TaskTriggerUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """トリガーを更新"""
-    trigger = db.query(TaskTrigger).filter(TaskTrigger.id == trigger_id).first()
+    trigger = await db.get(TaskTrigger, trigger_id)
     if not trigger:
         raise HTTPException(status_code=404, detail="トリガーが見つかりません")
     
     # タスクの所有確認
     user_id = get_user_filter(current_user)
-    if user_id:
-        task = db.query(Task).filter(Task.id == trigger.task_id, Task.user_id == user_id).first()
-        if not task:
-            raise HTTPException(status_code=404, detail="タスクが見つかりません")
+    if user_id and not await _get_owned_task(db, trigger.task_id, user_id):
+        raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
     update_data = trigger_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(trigger, key, value)
     
-    db.commit()
-    db.refresh(trigger)
+    await db.commit()
+    await db.refresh(trigger)
     return trigger
 
 
 @router.delete("/triggers/{trigger_id}", response_model=MessageResponse)
 async def delete_task_trigger(
     trigger_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """トリガーを削除"""
-    trigger = db.query(TaskTrigger).filter(TaskTrigger.id == trigger_id).first()
+    trigger = await db.get(TaskTrigger, trigger_id)
     if not trigger:
         raise HTTPException(status_code=404, detail="トリガーが見つかりません")
     
     # タスクの所有確認
     user_id = get_user_filter(current_user)
-    if user_id:
-        task = db.query(Task).filter(Task.id == trigger.task_id, Task.user_id == user_id).first()
-        if not task:
-            raise HTTPException(status_code=404, detail="タスクが見つかりません")
+    if user_id and not await _get_owned_task(db, trigger.task_id, user_id):
+        raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
-    db.delete(trigger)
-    db.commit()
+    await db.delete(trigger)
+    await db.commit()
     return {"message": "トリガーを削除しました"}
 
 
+# ==================== タスク依存関係API ====================
+
+async def _get_related_tasks(db: AsyncSession, task_id: int, user_id: Optional[str], closure) -> List[Task]:
+    """依存関係をたどったタスクを取得"""
+    task = await _get_owned_task(db, task_id, user_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="タスクが見つかりません")
+    
+    task_ids = await db.run_sync(closure, task_id)
+    if not task_ids:
+        return []
+    query = select(Task).where(Task.id.in_(task_ids))
+    if user_id:
+        query = query.where(Task.user_id == user_id)
+    return (await db.execute(query.order_by(Task.order_index, Task.id))).scalars().all()
+
+
+@router.get("/{task_id}/upstream", response_model=List[TaskResponse])
+async def get_upstream_tasks(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """このタスクより前に実行されるタスク（依存先を再帰的にたどる）"""
+    return await _get_related_tasks(db, task_id, get_user_filter(current_user), upstream_task_ids)
+
+
+@router.get("/{task_id}/downstream", response_model=List[TaskResponse])
+async def get_downstream_tasks(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """このタスクの後に実行されるタスク（依存元を再帰的にたどる）"""
+    return await _get_related_tasks(db, task_id, get_user_filter(current_user), downstream_task_ids)
+
+
 # ==================== タスク個別チャットAPI ====================
 
 from pydantic import BaseModel
+from app.services.chat_stream import chat_event_stream
 from app.services.project_chat import project_chat_service
 
 
@@ -491,6 +530,16 @@ class TaskChatActionsRequest(BaseModel):
     actions: list
 
 
+def _ensure_chat_task(db: Session, task_id: int, user_id: Optional[str]):
+    """チャット対象のタスクの存在確認"""
+    task_query = db.query(Task.id).filter(Task.id == task_id)
+    if user_id:
+        task_query = task_query.filter(Task.user_id == user_id)
+    
+    if not task_query.first():
+        raise HTTPException(status_code=404, detail="タスクが見つかりません")
+
+
 @router.post("/{task_id}/chat")
 async def task_chat(
     task_id: int,
@@ -500,13 +549,7 @@ async def task_chat(
 ):
     """タスク個別のAIチャット（ロジック理解・微調整）"""
     user_id = get_user_filter(current_user)
-    task_query = db.query(Task).filter(Task.id == task_id)
-    if user_id:
-        task_query = task_query.filter(Task.user_id == user_id)
-    
-    task = task_query.first()
-    if not task:
-        raise HTTPException(status_code=404, detail="タスクが見つかりません")
+    _ensure_chat_task(db, task_id, user_id)
     
     # チャットを実行（user_idを渡してAPIキー保存時に使用）
     result = await project_chat_service.task_chat(
@@ -520,6 +563,27 @@ async def task_chat(
     return result
 
 
+@router.post("/{task_id}/chat/stream")
+def task_chat_stream(
+    task_id: int,
+    request: TaskChatRequest,
+    db: Session = Depends(get_db),
+    current_user: Optional[UserInfo] = Depends(get_current_user)
+):
+    """タスク個別のAIチャット（応答を SSE でストリーミング）"""
+    user_id = get_user_filter(current_user)
+    _ensure_chat_task(db, task_id, user_id)
+    
+    return chat_event_stream(lambda chat_db, on_delta: project_chat_service.task_chat(
+        chat_db,
+        task_id,
+        request.message,
+        request.chat_history,
+        user_id,
+        on_delta=on_delta
+    ))
+
+
 @router.post("/{task_id}/chat/execute-actions")
 async def execute_task_chat_actions(
     task_id: int,
@@ -13,6 +13,7 @@ from typing import Dict, Optional, Set
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from pydantic import BaseModel
 
+from app.services.screenshot_store import screenshot_store
 from app.utils.logger import logger
 
 router = APIRouter(prefix="/trial-run", tags=["trial-run"])
@@ -46,6 +47,16 @@ trial_sessions: Dict[str, dict] = {}
 trial_watchers: Dict[str, Set[WebSocket]] = {}
 
 
+def _referenced_screenshot_ids():
+    """試運転セッションが保持しているスクリーンショットID"""
+    for session in trial_sessions.values():
+        for screenshot in session.get("screenshots", []):
+            yield screenshot.get("screenshot_id")
+
+
+screenshot_store.register_reference_source(_referenced_screenshot_ids)
+
+
 @router.get("/agents")
 async def list_connected_agents():
     """接続中のローカルエージェント一覧"""
@@ -243,10 +254,12 @@ async def agent_websocket(websocket: WebSocket, agent_id: str):
             if msg_type == "screenshot":
                 # スクリーンショット更新
                 trial_id = data.get("trial_id")
-                if trial_id and trial_id in trial_sessions:
+                if trial_id and trial_id in trial_sessions and data.get("data"):
+                    # 画像はストアに保存し、セッションとメッセージには参照のみ持つ
+                    screenshot_id = await asyncio.to_thread(screenshot_store.put_base64, data["data"])
                     screenshot_data = {
                         "step": data.get("step", 0),
-                        "image": data.get("data"),
+                        **screenshot_store.ref(screenshot_id),
                         "timestamp": datetime.now().isoformat()
                     }
                     trial_sessions[trial_id]["screenshots"].append(screenshot_data)
@@ -256,9 +269,7 @@ async def agent_websocket(websocket: WebSocket, agent_id: str):
                     await broadcast_to_watchers(trial_id, {
                         "type": "screenshot_update",
                         "trial_id": trial_id,
-                        "step": screenshot_data["step"],
-                        "image": screenshot_data["image"],
-                        "timestamp": screenshot_data["timestamp"]
+                        **screenshot_data
                     })
             
             elif msg_type == "log":
@@ -1,16 +1,17 @@
 """Webhookトリガー API - LINE通知やウェブサイトからのトリガー"""
 from typing import Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, Header
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import hashlib
 import hmac
 import json
 
-from app.database import get_db
-from app.models import Task, Execution, TaskTrigger
+from app.database import get_async_db
+from app.models import Task, TaskTrigger
 from app.schemas import MessageResponse
 from app.services.auth import get_current_user, UserInfo
+from app.services.db_writer import create_execution, db_writer
 from app.utils.logger import logger
 
 router = APIRouter(prefix="/webhook", tags=["webhooks"])
@@ -29,7 +30,7 @@ async def trigger_task_via_webhook(
     trigger_id: int,
     request: Request,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_webhook_secret: Optional[str] = Header(None)
 ):
     """汎用Webhookエンドポイント - 任意のサービスからタスクをトリガー
@@ -46,10 +47,10 @@ async def trigger_task_via_webhook(
     from app.services.agent import run_task_with_live_view
     
     # トリガーの存在確認
-    trigger = db.query(TaskTrigger).filter(
+    trigger = (await db.execute(select(TaskTrigger).where(
         TaskTrigger.id == trigger_id,
         TaskTrigger.task_id == task_id
-    ).first()
+    ))).scalar_one_or_none()
     
     if not trigger:
         raise HTTPException(status_code=404, detail="トリガーが見つかりません")
@@ -59,7 +60,7 @@ async def trigger_task_via_webhook(
         raise HTTPException(status_code=403, detail="このトリガーは無効化されています")
     
     # タスクの存在確認
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
@@ -73,26 +74,18 @@ async def trigger_task_via_webhook(
     except:
         payload = {}
     
-    # 実行レコードを作成
-    execution = Execution(
-        task_id=task_id,
-        status="pending",
-        triggered_by="webhook",
-        started_at=datetime.now(timezone.utc)
-    )
-    db.add(execution)
-    db.commit()
-    db.refresh(execution)
+    # 実行レコードを作成（書き込みは db_writer 経由）
+    execution_id = await db_writer.run(create_execution, task_id, "webhook")
     
     # バックグラウンドでタスクを実行
-    background_tasks.add_task(run_task_with_live_view, task_id, execution.id)
+    background_tasks.add_task(run_task_with_live_view, task_id, execution_id)
     
     logger.info(f"Webhook trigger: Task {task_id} triggered by trigger {trigger_id}")
     
     return {
         "message": "タスクをトリガーしました",
         "task_id": task_id,
-        "execution_id": execution.id,
+        "execution_id": execution_id,
         "trigger_type": trigger.trigger_type,
         "status": "pending"
     }
@@ -104,7 +97,7 @@ async def trigger_task_via_line(
     trigger_id: int,
     request: Request,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_line_signature: Optional[str] = Header(None)
 ):
     """LINE Notify専用Webhookエンドポイント
@@ -120,11 +113,11 @@ async def trigger_task_via_line(
     from app.services.agent import run_task_with_live_view
     
     # トリガーの存在確認
-    trigger = db.query(TaskTrigger).filter(
+    trigger = (await db.execute(select(TaskTrigger).where(
         TaskTrigger.id == trigger_id,
         TaskTrigger.task_id == task_id,
         TaskTrigger.trigger_type == "webhook"  # Webhook型のみ
-    ).first()
+    ))).scalar_one_or_none()
     
     if not trigger:
         raise HTTPException(status_code=404, detail="LINEトリガーが見つかりません")
@@ -133,7 +126,7 @@ async def trigger_task_via_line(
         raise HTTPException(status_code=403, detail="このトリガーは無効化されています")
     
     # タスクの存在確認
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
@@ -159,26 +152,18 @@ async def trigger_task_via_line(
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="無効なJSONペイロード")
     
-    # 実行レコードを作成
-    execution = Execution(
-        task_id=task_id,
-        status="pending",
-        triggered_by="webhook_line",
-        started_at=datetime.now(timezone.utc)
-    )
-    db.add(execution)
-    db.commit()
-    db.refresh(execution)
+    # 実行レコードを作成（書き込みは db_writer 経由）
+    execution_id = await db_writer.run(create_execution, task_id, "webhook_line")
     
     # バックグラウンドでタスクを実行
-    background_tasks.add_task(run_task_with_live_view, task_id, execution.id)
+    background_tasks.add_task(run_task_with_live_view, task_id, execution_id)
     
     logger.info(f"LINE trigger: Task {task_id} triggered by LINE event")
     
     return {
         "message": "LINEトリガーでタスクを開始しました",
         "task_id": task_id,
-        "execution_id": execution.id,
+        "execution_id": execution_id,
         "event_type": event_type,
         "status": "pending"
     }
@@ -188,7 +173,7 @@ async def trigger_task_via_line(
 async def get_webhook_url(
     task_id: int,
     trigger_type: str = "generic",  # generic, line, slack
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """タスクのWebhook URLを取得（トリガー作成時に使用）
@@ -202,19 +187,19 @@ async def get_webhook_url(
     
     # タスクの存在確認
     user_id = get_user_filter(current_user)
-    task_query = db.query(Task).filter(Task.id == task_id)
+    task_query = select(Task).where(Task.id == task_id)
     if user_id:
-        task_query = task_query.filter(Task.user_id == user_id)
+        task_query = task_query.where(Task.user_id == user_id)
     
-    task = task_query.first()
+    task = (await db.execute(task_query)).scalar_one_or_none()
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
     # Webhookトリガーを取得または作成
-    webhook_trigger = db.query(TaskTrigger).filter(
+    webhook_trigger = (await db.execute(select(TaskTrigger).where(
         TaskTrigger.task_id == task_id,
         TaskTrigger.trigger_type == "webhook"
-    ).first()
+    ).limit(1))).scalar_one_or_none()
     
     if not webhook_trigger:
         # 新規作成
@@ -224,8 +209,8 @@ async def get_webhook_url(
             is_active=True
         )
         db.add(webhook_trigger)
-        db.commit()
-        db.refresh(webhook_trigger)
+        await db.commit()
+        await db.refresh(webhook_trigger)
     
     # URLを構築
     app_url = os.environ.get("APP_URL", "http://localhost:8000")
@@ -255,25 +240,25 @@ async def get_webhook_url(
 async def test_webhook_trigger(
     task_id: int,
     trigger_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[UserInfo] = Depends(get_current_user)
 ):
     """Webhookトリガーのテスト実行（認証あり、本番実行なし）"""
     
     # タスクとトリガーの存在確認
     user_id = get_user_filter(current_user)
-    task_query = db.query(Task).filter(Task.id == task_id)
+    task_query = select(Task).where(Task.id == task_id)
     if user_id:
-        task_query = task_query.filter(Task.user_id == user_id)
+        task_query = task_query.where(Task.user_id == user_id)
     
-    task = task_query.first()
+    task = (await db.execute(task_query)).scalar_one_or_none()
     if not task:
         raise HTTPException(status_code=404, detail="タスクが見つかりません")
     
-    trigger = db.query(TaskTrigger).filter(
+    trigger = (await db.execute(select(TaskTrigger).where(
         TaskTrigger.id == trigger_id,
         TaskTrigger.task_id == task_id
-    ).first()
+    ))).scalar_one_or_none()
     
     if not trigger:
         raise HTTPException(status_code=404, detail="トリガーが見つかりません")
@@ -4,8 +4,12 @@ from typing import Dict, List
 import json
 import asyncio
 
+from app.services.dashboard_state import dashboard_state
+from app.services.execution_events import execution_events
+from app.services.live_view_broker import live_view_broker
 from app.services.live_view_manager import live_view_manager
 from app.services.screencast import screencast_manager
+from app.services.screenshot_store import screenshot_store
 from app.utils.logger import logger
 
 router = APIRouter(tags=["websocket"])
@@ -15,22 +19,30 @@ dashboard_connections: List[WebSocket] = []
 
 
 @router.websocket("/ws/live/{execution_id}")
-async def live_view_websocket(websocket: WebSocket, execution_id: int):
-    """ライブビュー用WebSocket"""
+async def live_view_websocket(websocket: WebSocket, execution_id: int, min_level: str = "DEBUG"):
+    """
+    ライブビュー用WebSocket
+    
+    min_level: このレベル未満のログは送信しない（DEBUG / INFO / WARNING / ERROR）
+    ログは一定間隔ごとに log_batch としてまとめて届きます。
+    """
     await websocket.accept()
-    live_view_manager.add_connection(execution_id, websocket)
+    subscriber = live_view_manager.add_connection(execution_id, websocket, min_level=min_level)
     
     try:
         # 初期データを送信
-        screenshot = live_view_manager.get_cached_screenshot(execution_id)
-        if screenshot:
+        screenshot_id = live_view_manager.get_cached_screenshot(execution_id)
+        if screenshot_id:
             await websocket.send_json({
                 "type": "screenshot_update",
-                "data": {"screenshot": screenshot}
+                "data": screenshot_store.ref(screenshot_id)
             })
         
         # キャッシュされたログを送信
-        logs = live_view_manager.get_cached_logs(execution_id)
+        logs = [
+            entry for entry in live_view_manager.get_cached_logs(execution_id)
+            if subscriber.accepts_log(entry)
+        ]
         if logs:
             await websocket.send_json({
                 "type": "initial_logs",
@@ -52,16 +64,27 @@ async def live_view_websocket(websocket: WebSocket, execution_id: int):
 
 @router.websocket("/ws/dashboard")
 async def dashboard_websocket(websocket: WebSocket):
-    """ダッシュボード更新通知用WebSocket"""
+    """
+    ダッシュボード更新通知用WebSocket
+    
+    接続時にバージョン付きスナップショットを送信し、以降は実行イベントの差分を配信します。
+    クライアントは差分の version が飛んだ場合 "snapshot" を送って再取得します。
+    """
     await websocket.accept()
     dashboard_connections.append(websocket)
     
     try:
+        snapshot = await dashboard_state.get_snapshot()
+        await websocket.send_json({"type": "snapshot", **snapshot})
+        
         while True:
             try:
                 data = await websocket.receive_text()
                 if data == "ping":
                     await websocket.send_text("pong")
+                elif data == "snapshot":
+                    snapshot = await dashboard_state.get_snapshot()
+                    await websocket.send_json({"type": "snapshot", **snapshot})
             except WebSocketDisconnect:
                 break
     finally:
@@ -70,7 +93,24 @@ async def dashboard_websocket(websocket: WebSocket):
 
 
 async def broadcast_to_dashboard(message: dict):
-    """ダッシュボードの全接続にメッセージを配信"""
+    """ダッシュボードの全接続にメッセージを配信（全ワーカー）"""
+    await live_view_broker.publish("dashboard", message)
+
+
+async def _on_execution_events(events: list):
+    """実行ライフサイクルイベントをダッシュボードへ配信"""
+    for event in events:
+        await broadcast_to_dashboard({"type": "execution_event", **event})
+
+
+async def _send_to_local_dashboards(channel: str, message: dict):
+    """このワーカーのダッシュボード接続にメッセージを送信"""
+    if message.get("type") == "execution_event":
+        # 各ワーカーが自分のスナップショットに適用し、差分として送る
+        message = dashboard_state.apply(message)
+        if message is None:
+            return
+    
     dead_connections = []
     
     for ws in dashboard_connections:
@@ -84,34 +124,36 @@ async def broadcast_to_dashboard(message: dict):
             dashboard_connections.remove(ws)
 
 
+live_view_broker.register_handler("dashboard", _send_to_local_dashboards)
+execution_events.add_listener(_on_execution_events)
+
+
 @router.websocket("/ws/executions/{execution_id}")
-async def execution_websocket(websocket: WebSocket, execution_id: int):
+async def execution_websocket(websocket: WebSocket, execution_id: int, min_level: str = "DEBUG"):
     """実行ログのリアルタイム配信用WebSocket（後方互換性）"""
     # live_view_websocketにリダイレクト
-    await live_view_websocket(websocket, execution_id)
+    await live_view_websocket(websocket, execution_id, min_level)
 
 
 @router.websocket("/ws/screencast/{execution_id}")
-async def screencast_websocket(websocket: WebSocket, execution_id: int):
+async def screencast_websocket(websocket: WebSocket, execution_id: int, quality: str = "auto"):
     """
     スクリーンキャスト（リアルタイム画面配信）用WebSocket
     
     オンデマンドで接続 - ユーザーが「ライブビュー」ボタンを押したときのみ開始
+    quality: auto（回線状況に応じて自動調整）/ high / medium / low
     """
     await websocket.accept()
-    is_viewing = False
+    viewer = None
     
     logger.info(f"スクリーンキャストWebSocket接続: execution_id={execution_id}")
     
     async def send_frame(frame_data: str):
-        """フレームをWebSocketに送信"""
-        try:
-            await websocket.send_json({
-                "type": "frame",
-                "data": frame_data
-            })
-        except Exception as e:
-            logger.warning(f"フレーム送信エラー: {e}")
+        """フレームをWebSocketに送信（視聴者ごとの送信タスクから呼ばれる）"""
+        await websocket.send_json({
+            "type": "frame",
+            "data": frame_data
+        })
     
     try:
         # ページが登録されているか確認
@@ -124,12 +166,15 @@ async def screencast_websocket(websocket: WebSocket, execution_id: int):
             return
         
         # スクリーンキャスト開始
-        success = await screencast_manager.start_viewing(execution_id, send_frame)
-        if success:
-            is_viewing = True
+        viewer = await screencast_manager.start_viewing(
+            execution_id, send_frame, profile=quality, send_message=websocket.send_json
+        )
+        if viewer:
             await websocket.send_json({
                 "type": "started",
-                "message": "ライブビュー開始"
+                "message": "ライブビュー開始",
+                "profile": viewer.profile,
+                "adaptive": viewer.adaptive
             })
         else:
             await websocket.send_json({
@@ -164,8 +209,8 @@ async def screencast_websocket(websocket: WebSocket, execution_id: int):
             pass
     finally:
         # クリーンアップ
-        if is_viewing:
-            await screencast_manager.stop_viewing(execution_id)
+        if viewer:
+            await screencast_manager.stop_viewing(execution_id, viewer)
         logger.info(f"スクリーンキャストWebSocket切断: execution_id={execution_id}")
 
 
@@ -175,6 +220,7 @@ async def get_screencast_status(execution_id: int):
     return {
         "available": screencast_manager.is_page_registered(execution_id),
         "streaming": screencast_manager.is_streaming(execution_id),
-        "viewer_count": screencast_manager.get_viewer_count(execution_id)
+        "viewer_count": screencast_manager.get_viewer_count(execution_id),
+        "viewers": screencast_manager.get_viewer_stats(execution_id)
     }
 
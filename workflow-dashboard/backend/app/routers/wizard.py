@@ -10,6 +10,7 @@ from typing import Optional
 
 from app.database import get_db
 from app.models import WizardSession, Task
+from app.services.chat_stream import chat_event_stream
 from app.services.video_analyzer import video_analyzer
 from app.services.wizard_chat import wizard_chat_service
 from app.schemas import ChatRequest, MessageResponse
@@ -177,13 +178,8 @@ async def get_session(session_id: str, db: Session = Depends(get_db)):
     }
 
 
-@router.post("/sessions/{session_id}/chat")
-async def chat(
-    session_id: str,
-    request: ChatRequest,
-    db: Session = Depends(get_db)
-):
-    """AIとチャット"""
+def _start_chat(db: Session, session_id: str) -> WizardSession:
+    """チャットできるセッションか確認し、ステータスをチャット中にする"""
     session = db.query(WizardSession).filter(
         WizardSession.session_id == session_id
     ).first()
@@ -199,9 +195,10 @@ async def chat(
         session.status = "chatting"
         db.commit()
     
-    # チャットを実行
-    result = await wizard_chat_service.chat(db, session, request.message, request.model)
-    
+    return session
+
+
+def _chat_response(result: dict) -> dict:
     return {
         "response": result["response"],
         "is_ready_to_create": result.get("is_ready_to_create", False),
@@ -210,6 +207,38 @@ async def chat(
     }
 
 
+@router.post("/sessions/{session_id}/chat")
+async def chat(
+    session_id: str,
+    request: ChatRequest,
+    db: Session = Depends(get_db)
+):
+    """AIとチャット"""
+    session = _start_chat(db, session_id)
+    
+    # チャットを実行
+    result = await wizard_chat_service.chat(db, session, request.message, request.model)
+    
+    return _chat_response(result)
+
+
+@router.post("/sessions/{session_id}/chat/stream")
+def chat_stream(
+    session_id: str,
+    request: ChatRequest,
+    db: Session = Depends(get_db)
+):
+    """AIとチャット（応答を SSE でストリーミング）"""
+    _start_chat(db, session_id)
+    
+    async def run(chat_db: Session, on_delta) -> dict:
+        session = chat_db.query(WizardSession).filter(WizardSession.session_id == session_id).first()
+        result = await wizard_chat_service.chat(chat_db, session, request.message, request.model, on_delta=on_delta)
+        return _chat_response(result)
+    
+    return chat_event_stream(run)
+
+
 @router.post("/sessions/{session_id}/generate-task")
 async def generate_task(session_id: str, db: Session = Depends(get_db)):
     """チャット履歴からタスクを生成"""
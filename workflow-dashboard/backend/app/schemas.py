@@ -204,6 +204,11 @@ class TaskResponse(TaskBase):
     id: int
     created_at: datetime
     updated_at: datetime
+    # 実行結果の要約（実行の終了時に更新）
+    last_run_status: Optional[str] = None
+    last_run_at: Optional[datetime] = None
+    success_rate: Optional[float] = None
+    p50_duration_seconds: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -253,6 +258,24 @@ class ProjectBoardData(BaseModel):
     """カンバンボード用のデータ"""
     projects: List[ProjectWithTasks]
     unassigned_tasks: List[TaskResponse]  # プロジェクト未割り当てタスク
+    version: int = 0  # この時点のボードのバージョン（差分取得の起点）
+
+
+class BoardDeletedIds(BaseModel):
+    """差分で削除されたエンティティのID"""
+    projects: List[int] = []
+    tasks: List[int] = []
+    role_groups: List[int] = []
+
+
+class ProjectBoardDelta(BaseModel):
+    """カンバンボードの差分（指定バージョン以降に変更されたもののみ）"""
+    version: int
+    full_reload: bool = False  # 差分が大きすぎる・履歴が残っていない場合は全件再取得
+    projects: List[ProjectResponse] = []
+    tasks: List[TaskResponse] = []
+    role_groups: List["RoleGroupResponse"] = []
+    deleted: BoardDeletedIds = BoardDeletedIds()
 
 
 # ==================== Execution Schemas ====================
@@ -309,6 +332,30 @@ class ExecutionWithSteps(ExecutionResponse):
     steps: List[ExecutionStepResponse] = []
 
 
+class ExecutionListItem(BaseModel):
+    """実行履歴一覧の1件（大きなテキスト列を含まない軽量版）"""
+    id: int
+    task_id: int
+    task_name: Optional[str] = None
+    status: str
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    triggered_by: Optional[str] = None
+    total_steps: Optional[int] = 0
+    completed_steps: Optional[int] = 0
+    has_result: bool = False
+    error_summary: Optional[str] = None  # エラーメッセージの先頭のみ
+
+
+class ExecutionPage(BaseModel):
+    """実行履歴一覧のページ（カーソル方式）"""
+    items: List[ExecutionListItem]
+    next_cursor: Optional[str] = None  # 次のページの取得に使うカーソル（最後のページではnull）
+    has_more: bool
+    limit: int
+    total: Optional[int] = None  # with_total=true の場合のみ
+
+
 # ==================== Live View Schemas ====================
 
 class LiveViewData(BaseModel):
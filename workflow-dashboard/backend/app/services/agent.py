@@ -15,6 +15,7 @@ from app.database import SessionLocal
 from app.services.browser_controller import browser_controller, ExecutionState
 from app.services.live_view_manager import live_view_manager
 from app.services.credential_manager import credential_manager
+from app.services.db_writer import db_writer, update_execution
 from app.services.screencast import screencast_manager
 from app.utils.logger import logger
 
@@ -98,14 +99,17 @@ async def run_task_with_live_view(task_id: int, execution_id: int):
             "手順: GITHUB_ACTIONS_SETUP.md を参照。"
         )
 
-        execution.status = "failed"
-        execution.error_message = msg
-        execution.completed_at = datetime.utcnow()
-        db.commit()
+        await db_writer.run(
+            update_execution,
+            execution_id,
+            status="failed",
+            error_message=msg,
+            completed_at=datetime.utcnow()
+        )
 
-        await live_view_manager.send_log(execution.id, "WARNING", msg)
+        await live_view_manager.send_log(execution_id, "WARNING", msg)
         await live_view_manager.send_execution_complete(
-            execution.id,
+            execution_id,
             status="failed",
             error=msg
         )
@@ -1,12 +1,21 @@
 """Anthropic Claude API クライアント - Claude Sonnet 4.5 統一使用"""
+import json
+import time
 import httpx
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Union
+from app.exceptions import LLMProviderError
+from app.services.http_clients import http_clients
 from app.utils.logger import logger
 
 # 統一モデル: Claude Sonnet 4.5 (最新版 - 2025年9月リリース)
 DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
 MODEL_DISPLAY_NAME = "Claude Sonnet 4.5"
 
+ANTHROPIC_MESSAGES_URL = "https://api.anthropic.com/v1/messages"
+
+# システムプロンプトは文字列か、Messages API の text ブロックのリスト
+SystemPrompt = Union[str, List[Dict]]
+
 # 利用可能なモデル（UI非表示だが内部で使用）
 AVAILABLE_MODELS = [
     {
@@ -34,7 +43,7 @@ async def call_anthropic_api(
     max_tokens: int = 4096,
     temperature: float = 0.7,
     timeout: int = 180,
-    system_prompt: str = None
+    system_prompt: SystemPrompt = None
 ) -> str:
     """
     Anthropic Claude APIを呼び出す
@@ -46,7 +55,8 @@ async def call_anthropic_api(
         max_tokens: 最大トークン数
         temperature: 温度パラメータ
         timeout: タイムアウト秒数
-        system_prompt: システムプロンプト（オプション）
+        system_prompt: システムプロンプト（オプション）。build_system_blocks() のブロックを渡すと
+            区切りまでをプロンプトキャッシュに載せる
     
     Returns:
         AIの応答テキスト
@@ -56,7 +66,187 @@ async def call_anthropic_api(
     
     # タイムアウト設定
     timeout_config = httpx.Timeout(timeout, connect=10.0)
+    request_body = _build_request_body(messages, model, max_tokens, temperature, system_prompt)
+    
+    logger.info(f"Calling Anthropic API with model: {model}")
     
+    client = http_clients.get("anthropic")
+    try:
+        response = await client.post(
+            ANTHROPIC_MESSAGES_URL,
+            headers=_headers(api_key),
+            json=request_body,
+            timeout=timeout_config
+        )
+        
+        if response.status_code != 200:
+            _raise_status_error(response)
+        
+        result = response.json()
+        prompt_cache_stats.record(model, result.get("usage"))
+        
+        # レスポンスからテキストを抽出
+        content = result.get("content", [])
+        if content and isinstance(content, list):
+            for block in content:
+                if block.get("type") == "text":
+                    return block.get("text", "")
+        
+        logger.warning(f"Unexpected response format: {result}")
+        return str(result)
+        
+    except httpx.TransportError as e:
+        raise _transport_error(e)
+
+
+async def stream_anthropic_api(
+    api_key: str,
+    messages: List[Dict],
+    model: str = None,
+    max_tokens: int = 4096,
+    temperature: float = 0.7,
+    timeout: int = 180,
+    system_prompt: SystemPrompt = None
+) -> AsyncIterator[str]:
+    """
+    Anthropic Claude APIをストリーミングで呼び出し、応答テキストを届いた順に返す
+    
+    引数は call_anthropic_api と同じです。タイムアウトはトークン間の待ち時間に適用されます。
+    """
+    if model is None:
+        model = DEFAULT_MODEL
+    
+    timeout_config = httpx.Timeout(timeout, connect=10.0)
+    request_body = _build_request_body(messages, model, max_tokens, temperature, system_prompt)
+    request_body["stream"] = True
+    
+    logger.info(f"Streaming Anthropic API with model: {model}")
+    
+    client = http_clients.get("anthropic")
+    started = time.monotonic()
+    usage = None
+    try:
+        async with client.stream(
+            "POST",
+            ANTHROPIC_MESSAGES_URL,
+            headers=_headers(api_key),
+            json=request_body,
+            timeout=timeout_config
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                _raise_status_error(response)
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                event_type = event.get("type")
+                if event_type == "message_start":
+                    usage = (event.get("message") or {}).get("usage")
+                elif event_type == "content_block_delta":
+                    delta = event.get("delta", {})
+                    if delta.get("type") == "text_delta" and delta.get("text"):
+                        if usage is not None:
+                            # 最初のテキストまでの時間と合わせてキャッシュの利用状況を記録
+                            prompt_cache_stats.record(model, usage, first_token_seconds=time.monotonic() - started)
+                            usage = None
+                        yield delta["text"]
+                elif event_type == "error":
+                    # ストリームの途中で返るエラー（overloaded_error など）
+                    error = event.get("error", {})
+                    logger.error(f"Anthropic API stream error: {error}")
+                    raise LLMProviderError(
+                        f"API Error: {error.get('type')} - {error.get('message')}",
+                        "anthropic",
+                        retryable=error.get("type") in ("overloaded_error", "api_error", "rate_limit_error")
+                    )
+                elif event_type == "message_stop":
+                    return
+    except httpx.TransportError as e:
+        raise _transport_error(e)
+
+
+def build_system_blocks(*cached_segments: str, tail: Optional[str] = None) -> List[Dict]:
+    """
+    システムプロンプトを text ブロックに分け、各セグメントの末尾をキャッシュの区切りにする
+    
+    変わりにくいものから順に渡します（例: 固定の指示 → プロジェクトの情報）。
+    前のセグメントが同じであれば、後ろが変わってもその区切りまではキャッシュから読まれます。
+    tail はターンごとに変わる部分で、キャッシュしません。
+    """
+    blocks = [
+        {"type": "text", "text": segment, "cache_control": {"type": "ephemeral"}}
+        for segment in cached_segments
+        if segment
+    ]
+    if tail:
+        blocks.append({"type": "text", "text": tail})
+    return blocks
+
+
+def system_prompt_text(system_prompt: SystemPrompt) -> str:
+    """ブロック形式のシステムプロンプトを1つの文字列にする（OpenAI など向け）"""
+    if isinstance(system_prompt, list):
+        return "\n\n".join(block.get("text", "") for block in system_prompt)
+    return system_prompt or ""
+
+
+class PromptCacheStats:
+    """Anthropic のプロンプトキャッシュの利用状況（usage の cache_read / cache_creation）"""
+    
+    def __init__(self):
+        self.requests = 0
+        self.cache_read_tokens = 0
+        self.cache_creation_tokens = 0
+        self.uncached_input_tokens = 0
+    
+    @property
+    def hit_rate(self) -> float:
+        """入力トークンのうちキャッシュから読まれた割合"""
+        total = self.cache_read_tokens + self.cache_creation_tokens + self.uncached_input_tokens
+        return self.cache_read_tokens / total if total else 0.0
+    
+    def record(self, model: str, usage: Optional[Dict], first_token_seconds: Optional[float] = None):
+        if not usage:
+            return
+        read = usage.get("cache_read_input_tokens") or 0
+        created = usage.get("cache_creation_input_tokens") or 0
+        uncached = usage.get("input_tokens") or 0
+        self.requests += 1
+        self.cache_read_tokens += read
+        self.cache_creation_tokens += created
+        self.uncached_input_tokens += uncached
+        
+        total = read + created + uncached
+        first_token = f", 最初のトークンまで {first_token_seconds * 1000:.0f}ms" if first_token_seconds is not None else ""
+        logger.info(
+            f"Anthropic prompt cache ({model}): 読み込み {read} / 書き込み {created} / キャッシュなし {uncached} tokens "
+            f"(ヒット率 {read / total if total else 0:.0%}, 累計 {self.hit_rate:.0%}){first_token}"
+        )
+    
+    def get_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_creation_tokens": self.cache_creation_tokens,
+            "uncached_input_tokens": self.uncached_input_tokens,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+# シングルトンインスタンス
+prompt_cache_stats = PromptCacheStats()
+
+
+def _build_request_body(
+    messages: List[Dict],
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    system_prompt: SystemPrompt
+) -> Dict:
+    """Chat形式のメッセージから Messages API のリクエストボディを作る"""
     # メッセージをAnthropic形式に変換
     anthropic_messages = []
     for msg in messages:
@@ -97,52 +287,44 @@ async def call_anthropic_api(
     if temperature is not None:
         request_body["temperature"] = min(max(temperature, 0), 1)
     
-    logger.info(f"Calling Anthropic API with model: {model}")
+    return request_body
+
+
+def _headers(api_key: str) -> Dict[str, str]:
+    return {
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "Content-Type": "application/json"
+    }
+
+
+def _raise_status_error(response: httpx.Response):
+    """200 以外のレスポンスを LLMProviderError にする"""
+    error_detail = response.text
+    logger.error(f"Anthropic API Error: {response.status_code} - {error_detail}")
     
-    async with httpx.AsyncClient(timeout=timeout_config) as client:
-        try:
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": api_key,
-                    "anthropic-version": "2023-06-01",
-                    "Content-Type": "application/json"
-                },
-                json=request_body
-            )
-            
-            if response.status_code != 200:
-                error_detail = response.text
-                logger.error(f"Anthropic API Error: {response.status_code} - {error_detail}")
-                
-                # よくあるエラーの対処法を追加
-                if response.status_code == 401:
-                    raise Exception("APIキーが無効です。Anthropic APIキーを確認してください。")
-                elif response.status_code == 429:
-                    raise Exception("APIレート制限に達しました。しばらく待ってから再試行してください。")
-                elif response.status_code == 500:
-                    raise Exception("Anthropicサーバーエラー。しばらく待ってから再試行してください。")
-                else:
-                    raise Exception(f"API Error: {response.status_code} - {error_detail}")
-            
-            result = response.json()
-            
-            # レスポンスからテキストを抽出
-            content = result.get("content", [])
-            if content and isinstance(content, list):
-                for block in content:
-                    if block.get("type") == "text":
-                        return block.get("text", "")
-            
-            logger.warning(f"Unexpected response format: {result}")
-            return str(result)
-            
-        except httpx.ConnectError as e:
-            logger.error(f"Anthropic API connection error: {e}")
-            raise Exception(f"接続エラー: Anthropic APIに接続できません。ネットワークを確認してください。")
-        except httpx.ReadTimeout as e:
-            logger.error(f"Anthropic API timeout: {e}")
-            raise Exception(f"タイムアウト: 応答に時間がかかりすぎています。")
+    # よくあるエラーの対処法を追加
+    if response.status_code == 401:
+        message = "APIキーが無効です。Anthropic APIキーを確認してください。"
+    elif response.status_code == 429:
+        message = "APIレート制限に達しました。しばらく待ってから再試行してください。"
+    elif response.status_code == 500:
+        message = "Anthropicサーバーエラー。しばらく待ってから再試行してください。"
+    else:
+        message = f"API Error: {response.status_code} - {error_detail}"
+    raise LLMProviderError.from_status(message, "anthropic", response.status_code, response.headers)
+
+
+def _transport_error(e: httpx.TransportError) -> LLMProviderError:
+    """接続・タイムアウトのエラーをリトライ可能な LLMProviderError にする"""
+    if isinstance(e, httpx.ConnectError):
+        logger.error(f"Anthropic API connection error: {e}")
+        return LLMProviderError("接続エラー: Anthropic APIに接続できません。ネットワークを確認してください。", "anthropic", retryable=True)
+    if isinstance(e, httpx.ReadTimeout):
+        logger.error(f"Anthropic API timeout: {e}")
+        return LLMProviderError("タイムアウト: 応答に時間がかかりすぎています。", "anthropic", retryable=True)
+    logger.error(f"Anthropic API transport error: {e}")
+    return LLMProviderError(f"接続エラー: {e}", "anthropic", retryable=True)
 
 
 def get_available_models() -> List[Dict]:
@@ -0,0 +1,59 @@
+"""
+カンバンボードのレスポンスキャッシュ
+
+/projects/board/data のシリアライズ済みJSONをユーザーごとに保持します。
+キーはボードのリビジョン（board_sync.get_board_state()、所有者ごとの board_versions のカウンター）で、
+そのユーザーのプロジェクト・タスク・役割グループの変更がコミットされるとリビジョンが上がります
+（他のユーザーの変更ではキャッシュは無効になりません）。バージョンはコミット順に採番されるため、
+読み込んだリビジョン以下の変更はすべてコミット済みで、古いキャッシュが返ることはありません。
+
+同じバージョンでは ETag も同じになるため、クライアントが If-None-Match を送れば
+バージョンを確認する1クエリだけで 304 を返せます。キャッシュはワーカーごとのメモリに置きます。
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# 保持するユーザー数の上限（超えたら最も古く使われたものから破棄）
+BOARD_CACHE_SIZE = 256
+
+
+def board_etag(user_id: Optional[str], version: int) -> str:
+    """ユーザーとバージョンから ETag を作成（アカウントを切り替えたブラウザで他人のボードを使わない）"""
+    user_key = hashlib.sha1((user_id or "").encode("utf-8")).hexdigest()[:12]
+    return f'"board-{user_key}-{version}"'
+
+
+class BoardCache:
+    """ユーザーごとの (バージョン, ETag, JSON) を保持する LRU キャッシュ"""
+
+    def __init__(self, max_size: int = BOARD_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Optional[str], Tuple[int, str, bytes]]" = OrderedDict()
+
+    def get(self, user_id: Optional[str], version: int) -> Optional[Tuple[str, bytes]]:
+        """バージョンが一致すれば (ETag, JSON) を返す"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1], entry[2]
+
+    def put(self, user_id: Optional[str], version: int, body: bytes) -> str:
+        """JSON を保存して ETag を返す（同時に読み込んだ新しいバージョンのものは上書きしない）"""
+        etag = board_etag(user_id, version)
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > version:
+            return etag
+        self._entries[user_id] = (version, etag, body)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return etag
+
+    def clear(self):
+        self._entries.clear()
+
+
+# シングルトンインスタンス
+board_cache = BoardCache()
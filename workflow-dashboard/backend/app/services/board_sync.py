@@ -0,0 +1,244 @@
+"""
+カンバンボードの差分同期
+
+Project / Task / RoleGroup の作成・更新・削除をセッションのフラッシュ時に
+board_changes テーブルへ記録します。記録するトランザクション内で、変更したエンティティの
+所有者の board_versions のカウンターを UPDATE ... RETURNING で加算して各行の version とするため、
+カウンターの行ロックにより所有者ごとのバージョンの順序はコミット順と一致します
+（自動採番のIDはフラッシュ時に決まるため、コミットが前後すると小さいIDが後から見えることがある）。
+ロックするのは所有者の行だけなので、別のユーザーの書き込みは互いに待ちません。
+取得時点のカウンターをボードのバージョンとして返し、
+クライアントは「バージョンN以降の自分の変更」だけを取得できます。
+
+ユーザーで絞り込まない（認証なしの）ボードでは所有者なしのカウンターをバージョンとし、
+差分も所有者なしの変更から作ります。キャッシュと ETag には全所有者のカウンターの合計を使います。
+
+一括 UPDATE/DELETE（Query.update 等）はセッションイベントを経由しないため、
+record_board_changes() で明示的に記録してください。
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import BoardChange, BoardVersion, Project, RoleGroup, Task
+from app.utils.logger import logger
+
+# 変更履歴の保持期間（これより古いバージョンからの差分要求は全件再取得）
+BOARD_CHANGE_RETENTION_DAYS = 7
+
+# 1回の差分で返すエンティティ数の上限（超える場合は全件再取得）
+MAX_DELTA_ENTITIES = 500
+
+ENTITY_TYPES = {
+    Project: "project",
+    Task: "task",
+    RoleGroup: "role_group",
+}
+
+
+def _entity_type(obj) -> Optional[str]:
+    return ENTITY_TYPES.get(type(obj))
+
+
+def _version_key(user_id: Optional[str]) -> str:
+    """カウンターの行のキー（所有者なしは空文字）"""
+    return user_id or ""
+
+
+def _next_board_version(connection, user_id: Optional[str]) -> int:
+    """
+    所有者のボードのバージョンを1つ進めて返す
+
+    カウンターの行ロックはコミットまで保持されるため、同じ所有者の変更を記録する他のトランザクションは
+    このトランザクションのコミット（またはロールバック）後に次の番号を受け取ります。
+    """
+    table = BoardVersion.__table__
+    key = _version_key(user_id)
+    version = connection.execute(
+        update(table)
+        .where(table.c.user_key == key)
+        .values(version=table.c.version + 1)
+        .returning(table.c.version)
+    ).scalar()
+    if version is not None:
+        return version
+
+    # 初めて変更を記録する所有者は、払い出し済みのどのバージョンよりも大きい値から始める
+    # （行がない間に読んだ 0 や、移行前に受け取ったバージョンを持つクライアントが取りこぼさないように）
+    start = (connection.execute(select(func.max(table.c.version))).scalar() or 0) + 1
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table).values(user_key=key, version=start)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_key"],
+            set_={"version": table.c.version + 1}
+        ).returning(table.c.version)
+        return connection.execute(stmt).scalar()
+    connection.execute(table.insert(), {"user_key": key, "version": start})
+    return start
+
+
+def _after_flush(session: Session, flush_context):
+    rows = []
+    now = datetime.utcnow()
+    for objects, op in ((session.new, "upsert"), (session.dirty, "upsert"), (session.deleted, "delete")):
+        for obj in objects:
+            entity_type = _entity_type(obj)
+            if not entity_type:
+                continue
+            if op == "upsert" and obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            rows.append({
+                "user_id": obj.user_id,
+                "entity_type": entity_type,
+                "entity_id": obj.id,
+                "op": op,
+                "created_at": now
+            })
+
+    if rows:
+        connection = session.connection()
+        # 複数の所有者をまたぐ場合は常に同じ順でロックする
+        versions = {
+            user_id: _next_board_version(connection, user_id)
+            for user_id in sorted({row["user_id"] for row in rows}, key=_version_key)
+        }
+        for row in rows:
+            row["version"] = versions[row["user_id"]]
+        connection.execute(BoardChange.__table__.insert(), rows)
+
+
+def install():
+    """セッションイベントに変更記録を登録"""
+    event.listen(Session, "after_flush", _after_flush)
+
+
+def record_board_changes(
+    db: Session,
+    entity_type: str,
+    entity_ids: Iterable[int],
+    op: str = "upsert",
+    user_id: Optional[str] = None
+):
+    """一括更新など、セッションイベントを経由しない変更を記録"""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "entity_type": entity_type, "entity_id": entity_id, "op": op, "created_at": now}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        version = _next_board_version(db, user_id)
+        for row in rows:
+            row["version"] = version
+        db.execute(BoardChange.__table__.insert(), rows)
+
+
+def _user_scoped(query, user_id: Optional[str]):
+    # バージョンは所有者ごとなので、絞り込まない場合は所有者なしの変更のみ
+    if user_id:
+        return query.filter(BoardChange.user_id == user_id)
+    return query.filter(BoardChange.user_id.is_(None))
+
+
+def get_board_version(db: Session, user_id: Optional[str]) -> int:
+    """所有者のボードの現在のバージョン（コミット済みのカウンターの値）"""
+    return db.query(BoardVersion.version).filter(BoardVersion.user_key == _version_key(user_id)).scalar() or 0
+
+
+def get_board_state(db: Session, user_id: Optional[str]) -> Tuple[int, int]:
+    """
+    (バージョン, リビジョン) を取得
+
+    リビジョンはキャッシュと ETag のキーで、ユーザーで絞り込む場合はバージョンと同じ、
+    絞り込まない場合は全所有者のカウンターの合計（どの所有者の変更でも必ず増える）です。
+    """
+    if user_id:
+        version = get_board_version(db, user_id)
+        return version, version
+    version, revision = db.query(
+        func.coalesce(func.max(case((BoardVersion.user_key == "", BoardVersion.version))), 0),
+        func.coalesce(func.sum(BoardVersion.version), 0)
+    ).one()
+    return int(version), int(revision)
+
+
+def get_board_changes(db: Session, user_id: Optional[str], since: int) -> dict:
+    """バージョン since 以降の差分を取得"""
+    version = get_board_version(db, user_id)
+    delta = {
+        "version": version,
+        "full_reload": False,
+        "projects": [],
+        "tasks": [],
+        "role_groups": [],
+        "deleted": {"projects": [], "tasks": [], "role_groups": []}
+    }
+    if since >= version:
+        return delta
+
+    # 履歴が削除済みの範囲を含む場合は差分を作れない
+    oldest = _user_scoped(db.query(func.min(BoardChange.version)), user_id).scalar()
+    if oldest is None or since < oldest - 1:
+        delta["full_reload"] = True
+        return delta
+
+    changes = _user_scoped(
+        db.query(BoardChange.entity_type, BoardChange.entity_id, BoardChange.op)
+        .filter(BoardChange.version > since, BoardChange.version <= version),
+        user_id
+    ).order_by(BoardChange.version, BoardChange.id).all()
+
+    # エンティティごとに最後の操作だけを残す
+    latest: Dict[Tuple[str, int], str] = {}
+    for entity_type, entity_id, op in changes:
+        latest[(entity_type, entity_id)] = op
+
+    if len(latest) > MAX_DELTA_ENTITIES:
+        delta["full_reload"] = True
+        return delta
+
+    upserts: Dict[str, List[int]] = {"project": [], "task": [], "role_group": []}
+    for (entity_type, entity_id), op in latest.items():
+        if op == "delete":
+            delta["deleted"][f"{entity_type}s"].append(entity_id)
+        else:
+            upserts[entity_type].append(entity_id)
+
+    for model, entity_type in ENTITY_TYPES.items():
+        ids = upserts[entity_type]
+        if not ids:
+            continue
+        query = db.query(model).filter(model.id.in_(ids))
+        if user_id:
+            query = query.filter(model.user_id == user_id)
+        found = query.all()
+        delta[f"{entity_type}s"] = found
+        # 記録後に削除された（行が残っていない）ものは削除扱い
+        missing = set(ids) - {obj.id for obj in found}
+        delta["deleted"][f"{entity_type}s"].extend(sorted(missing))
+
+    return delta
+
+
+def prune_board_changes(db: Session, retention_days: int = BOARD_CHANGE_RETENTION_DAYS) -> int:
+    """保持期間を過ぎた変更履歴を削除（差分を作れるよう所有者ごとに最新のバージョンの分は残す）"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    current = (
+        select(BoardVersion.version)
+        .where(BoardVersion.user_key == func.coalesce(BoardChange.user_id, ""))
+        .scalar_subquery()
+    )
+    deleted = db.query(BoardChange).filter(
+        BoardChange.created_at < cutoff,
+        BoardChange.version < current
+    ).delete(synchronize_session=False)
+    db.commit()
+    if deleted:
+        logger.info(f"ボード変更履歴を削除しました: {deleted}件")
+    return deleted
+
+
+install()
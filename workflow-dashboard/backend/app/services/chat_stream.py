@@ -0,0 +1,110 @@
+"""
+チャット応答のストリーミング（Server-Sent Events）
+
+チャットサービスに on_delta を渡して実行し、次のイベントを順に送ります。
+- delta: 届いた応答テキストの断片 {"text": "..."}
+- actions: 応答中の ```json ブロックが閉じた時点で取り出したアクション {"actions": [...], "creating_info": {...}}
+- done: 通常のチャットAPIと同じレスポンス
+- error: 実行中の予期しないエラー {"error": "..."}
+
+    return chat_event_stream(lambda db, on_delta: project_chat_service.chat(db, ..., on_delta=on_delta))
+"""
+import asyncio
+import json
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.utils.logger import logger
+
+ChatRunner = Callable[[Session, Callable[[str], Awaitable[None]]], Awaitable[dict]]
+
+
+def sse_event(event: str, data) -> str:
+    """SSE の1イベントを組み立てる"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class ActionBlockParser:
+    """ストリーミング中の応答から ```json ブロックのアクションを、ブロックが閉じた時点で取り出す"""
+
+    def __init__(self):
+        self.text = ""
+        self.block_start: Optional[int] = None
+        self.finished = False
+
+    def feed(self, delta: str) -> Optional[dict]:
+        if self.finished:
+            return None
+        # 区切り文字が断片をまたぐ場合に備えて、前回の末尾の少し手前から探す
+        previous_length = len(self.text)
+        self.text += delta
+        if self.block_start is None:
+            start = self.text.find("```json", max(0, previous_length - 6))
+            if start == -1:
+                return None
+            self.block_start = start + 7
+        end = self.text.find("```", max(self.block_start, previous_length - 2))
+        if end == -1:
+            return None
+
+        self.finished = True
+        try:
+            parsed = json.loads(self.text[self.block_start:end].strip())
+        except ValueError:
+            return None
+        if isinstance(parsed, dict) and "actions" in parsed:
+            return {"actions": parsed.get("actions"), "creating_info": parsed.get("creating_info")}
+        if isinstance(parsed, list):
+            return {"actions": parsed, "creating_info": None}
+        return None
+
+
+def chat_event_stream(run: ChatRunner) -> StreamingResponse:
+    """
+    run(db, on_delta) を実行して、応答を SSE で返す
+
+    レスポンスの送信中はリクエストのDBセッションが閉じられている場合があるため、
+    run には専用のセッションを渡します。
+    """
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue()
+        parser = ActionBlockParser()
+        db = SessionLocal()
+
+        async def on_delta(delta: str):
+            await queue.put(delta)
+
+        task = asyncio.create_task(run(db, on_delta))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                delta = await queue.get()
+                if delta is None:
+                    break
+                yield sse_event("delta", {"text": delta})
+                actions = parser.feed(delta)
+                if actions:
+                    yield sse_event("actions", actions)
+
+            if task.exception() is not None:
+                logger.error(f"チャットのストリーミングでエラーが発生しました: {task.exception()}")
+                yield sse_event("error", {"error": str(task.exception())})
+            else:
+                yield sse_event("done", task.result())
+        finally:
+            # クライアントが切断した場合は生成を止める
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+            db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
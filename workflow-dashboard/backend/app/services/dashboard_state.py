@@ -0,0 +1,172 @@
+"""
+ダッシュボード統計のインメモリスナップショット
+
+ワーカーごとに一度だけDBから集計し、以降は実行ライフサイクルイベントを
+適用して最新に保ちます。ダッシュボードの接続数が増えてもDB負荷は増えません。
+実行件数は executions を数えず、日別集計（stats_rollup）の合計から読み込みます。
+変更のたびに version を進め、クライアントは差分の version が連続しているかで
+取りこぼしを検出できます。
+"""
+import asyncio
+from typing import Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Execution, Task
+from app.services.stats_rollup import get_totals, status_bucket
+
+RECENT_EXECUTIONS_LIMIT = 5
+
+
+def compute_stats(db: Session) -> dict:
+    """DBからダッシュボード統計を集計"""
+    total_tasks, active_tasks = db.query(
+        func.count(Task.id),
+        func.coalesce(func.sum(case((Task.is_active == True, 1), else_=0)), 0)
+    ).one()
+    executions = get_totals(db)
+
+    # 最近の実行
+    recent_executions = db.query(Execution).order_by(
+        Execution.started_at.desc()
+    ).limit(RECENT_EXECUTIONS_LIMIT).all()
+
+    return {
+        "tasks": {
+            "total": total_tasks,
+            "active": active_tasks,
+            "inactive": total_tasks - active_tasks
+        },
+        "executions": executions,
+        "recent_executions": [
+            {
+                "id": e.id,
+                "task_id": e.task_id,
+                "status": e.status,
+                "started_at": e.started_at.isoformat() if e.started_at else None
+            }
+            for e in recent_executions
+        ]
+    }
+
+
+def _load_stats() -> dict:
+    db = SessionLocal()
+    try:
+        return compute_stats(db)
+    finally:
+        db.close()
+
+
+class DashboardState:
+    """バージョン付きのダッシュボード統計"""
+
+    def __init__(self):
+        self.version = 0
+        self._stats: Optional[dict] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._stats is not None
+
+    async def get_snapshot(self) -> dict:
+        """スナップショットを取得（未集計の場合のみDBから集計）"""
+        if self._stats is None:
+            async with self._lock:
+                if self._stats is None:
+                    self._stats = await asyncio.to_thread(_load_stats)
+                    self.version += 1
+        return {"version": self.version, **self._stats}
+
+    async def reload(self):
+        """
+        DBから集計し直してスナップショットを置き換える
+
+        差分を送らずに version を進めるため、接続中のクライアントは次の差分で
+        version の飛びを検出してスナップショットを再取得します。
+        """
+        async with self._lock:
+            self._stats = await asyncio.to_thread(_load_stats)
+            self.version += 1
+
+    def apply(self, event: dict) -> Optional[dict]:
+        """
+        イベントを適用して差分メッセージを返す
+
+        スナップショット未集計の場合は None（次回の集計に含まれるため）
+        """
+        if self._stats is None:
+            return None
+
+        kind = event.get("event")
+        if kind == "tasks_changed":
+            self._apply_tasks_changed(event)
+        elif kind == "executions_deleted":
+            self._apply_executions_deleted(event)
+        elif "execution" in event:
+            self._apply_execution_event(event)
+        else:
+            return None
+
+        self.version += 1
+        return {
+            "type": "delta",
+            "version": self.version,
+            "event": kind,
+            "execution": event.get("execution"),
+            "task_ids": event.get("task_ids"),
+            "tasks": self._stats["tasks"],
+            "executions": self._stats["executions"]
+        }
+
+    def _apply_tasks_changed(self, event: dict):
+        tasks = self._stats["tasks"]
+        tasks["total"] += event.get("total_delta", 0)
+        tasks["active"] += event.get("active_delta", 0)
+        tasks["inactive"] = tasks["total"] - tasks["active"]
+
+    def _apply_executions_deleted(self, event: dict):
+        """タスク削除などで複数の実行がまとめて削除された"""
+        counts = self._stats["executions"]
+        for key, count in event.get("counts", {}).items():
+            counts[key] = max(0, counts[key] - count)
+        task_ids = set(event.get("task_ids") or [])
+        self._stats["recent_executions"] = [
+            e for e in self._stats["recent_executions"] if e["task_id"] not in task_ids
+        ]
+
+    def _apply_execution_event(self, event: dict):
+        counts = self._stats["executions"]
+        execution = event["execution"]
+        kind = event.get("event")
+
+        previous = status_bucket(event.get("previous_status"))
+        if previous:
+            counts[previous] = max(0, counts[previous] - 1)
+
+        recent = [e for e in self._stats["recent_executions"] if e["id"] != execution["id"]]
+
+        if kind == "deleted":
+            counts["total"] = max(0, counts["total"] - 1)
+        else:
+            if kind == "created":
+                counts["total"] += 1
+            current = status_bucket(execution.get("status"))
+            if current:
+                counts[current] += 1
+            recent.append({
+                "id": execution["id"],
+                "task_id": execution["task_id"],
+                "status": execution["status"],
+                "started_at": execution["started_at"]
+            })
+
+        recent.sort(key=lambda e: (e["started_at"] or "", e["id"]), reverse=True)
+        self._stats["recent_executions"] = recent[:RECENT_EXECUTIONS_LIMIT]
+
+
+# シングルトンインスタンス
+dashboard_state = DashboardState()
@@ -0,0 +1,105 @@
+"""
+単一ライターによるデータベース書き込み
+
+SQLite は同時に1つの接続しか書き込めないため、エージェントのステップ記録など
+並行して発生する書き込みを専用スレッド1本に集約し、1件ずつ順番にコミットします。
+WAL モードと組み合わせることで、読み込み（ダッシュボード等）は書き込みを待たず、
+書き込み同士も database is locked で失敗しなくなります。
+PostgreSQL では書き込みを直列化する必要がないため、スレッドプールでそのまま実行します。
+
+    step_id = await db_writer.run(record_step, execution_id, step_number)
+
+渡す関数は第1引数に書き込み用のセッションを受け取り、コミットまで行います。
+戻り値にORMオブジェクトを返すとセッション終了後に使えないため、IDや値を返してください。
+実行レコードの作成・状態更新のように複数箇所から行う書き込みは
+create_execution() / update_execution() を使います。
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import SessionLocal, effective_db_url
+from app.models import Execution
+from app.utils.logger import logger
+
+
+class DatabaseWriter:
+    """書き込み処理を1本のスレッドで順番に実行"""
+
+    def __init__(self, session_factory: sessionmaker = SessionLocal, serialize: bool = True):
+        self._session_factory = session_factory
+        self._serialize = serialize
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """実行待ち・実行中の書き込み数"""
+        return self._pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        return self._executor
+
+    def _execute(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        db: Session = self._session_factory()
+        try:
+            result = fn(db, *args, **kwargs)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """書き込み関数を実行して結果を返す（呼び出し元のイベントループは止めない）"""
+        self._pending += 1
+        try:
+            if self._serialize:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), self._execute, fn, args, kwargs)
+            return await asyncio.to_thread(self._execute, fn, args, kwargs)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self):
+        """書き込み待ちを処理し終えてからスレッドを停止"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logger.info("データベース書き込みスレッドを停止しました")
+
+
+# ==================== 共通の書き込み関数 ====================
+
+def create_execution(db: Session, task_id: int, triggered_by: str) -> int:
+    """実行レコードを作成してIDを返す"""
+    execution = Execution(
+        task_id=task_id,
+        status="pending",
+        triggered_by=triggered_by,
+        started_at=datetime.utcnow()
+    )
+    db.add(execution)
+    db.flush()
+    return execution.id
+
+
+def update_execution(db: Session, execution_id: int, **values) -> bool:
+    """実行レコードを更新（ORM経由のため状態遷移のイベントや集計も更新される）"""
+    execution = db.get(Execution, execution_id)
+    if execution is None:
+        return False
+    for key, value in values.items():
+        setattr(execution, key, value)
+    return True
+
+
+# シングルトンインスタンス
+db_writer = DatabaseWriter(serialize=effective_db_url.startswith("sqlite"))
@@ -8,11 +8,13 @@ from typing import Optional, Callable, Any
 
 from sqlalchemy.orm import Session
 
-from app.models import Task, Execution, ExecutionStep
+from app.models import Task, Execution
 from app.database import SessionLocal
 from app.services.browser_controller import browser_controller, ExecutionState
 from app.services.live_view_manager import live_view_manager
+from app.services.step_writer import PendingStep, step_writer
 from app.services.credential_manager import credential_manager
+from app.services.db_writer import db_writer, update_execution
 from app.utils.logger import logger
 
 SCREENSHOT_DIR = Path("screenshots")
@@ -325,6 +327,8 @@ class DesktopAgent:
                 "total_steps": self.step_count
             }
         finally:
+            # 溜まっているステップを書き込んでから結果を保存させる
+            await step_writer.flush()
             browser_controller.cleanup(self.execution.id)
     
     async def _create_step(
@@ -333,24 +337,16 @@ class DesktopAgent:
         action_type: str,
         description: str,
         status: str
-    ) -> ExecutionStep:
-        """ステップをDBに作成"""
-        step = ExecutionStep(
-            execution_id=self.execution.id,
-            step_number=step_number,
+    ) -> PendingStep:
+        """ステップを作成（DBへはまとめて書き込み、実行の現在ステップもその時に更新）"""
+        step = step_writer.add_step(
+            self.execution.id,
+            step_number,
             action_type=action_type,
             description=description,
             status=status,
             started_at=datetime.now()
         )
-        self.db.add(step)
-        self.db.commit()
-        self.db.refresh(step)
-        
-        # 実行の現在ステップを更新
-        self.execution.current_step_id = step.id
-        self.execution.total_steps = step_number
-        self.db.commit()
         
         # ライブビューに通知
         await live_view_manager.send_step_update(
@@ -365,7 +361,7 @@ class DesktopAgent:
     
     async def _update_step(
         self,
-        step: ExecutionStep,
+        step: PendingStep,
         status: str,
         screenshot_path: Optional[str] = None,
         duration_ms: Optional[int] = None,
@@ -373,23 +369,20 @@ class DesktopAgent:
         error_message: Optional[str] = None
     ):
         """ステップを更新"""
-        step.status = status
-        step.completed_at = datetime.now()
+        values = {"status": status, "completed_at": datetime.now()}
         if screenshot_path:
-            step.screenshot_path = screenshot_path
+            values["screenshot_path"] = screenshot_path
         if duration_ms is not None:
-            step.duration_ms = duration_ms
+            values["duration_ms"] = duration_ms
         if description:
-            step.description = description
+            values["description"] = description
         if error_message:
-            step.error_message = error_message
-        
-        self.db.commit()
+            values["error_message"] = error_message
+        step_writer.update_step(step, **values)
         
         # 完了ステップ数を更新
         if status == "completed":
-            self.execution.completed_steps = (self.execution.completed_steps or 0) + 1
-            self.db.commit()
+            step_writer.increment_completed(self.execution.id)
     
     async def _take_screenshot(self, step_number: int) -> Optional[str]:
         """スクリーンショットを取得してBase64で返す（PyAutoGUI使用）"""
@@ -415,8 +408,7 @@ class DesktopAgent:
                 f.write(screenshot_bytes)
             
             # 実行の最新スクリーンショットパスを更新
-            self.execution.last_screenshot_path = str(screenshot_path)
-            self.db.commit()
+            step_writer.set_progress(self.execution.id, last_screenshot_path=str(screenshot_path))
             
             # Base64エンコード
             return base64.b64encode(screenshot_bytes).decode("utf-8")
@@ -442,10 +434,8 @@ async def run_desktop_task_with_live_view(task_id: int, execution_id: int):
             logger.error(f"タスクまたは実行が見つかりません: task_id={task_id}, execution_id={execution_id}")
             return
         
-        # 実行状態を更新
-        execution.status = "running"
-        execution.started_at = datetime.now()
-        db.commit()
+        # 実行状態を更新（書き込みは db_writer 経由）
+        await db_writer.run(update_execution, execution_id, status="running", started_at=datetime.now())
         
         # エージェントを実行
         agent = DesktopAgent(
@@ -458,26 +448,25 @@ async def run_desktop_task_with_live_view(task_id: int, execution_id: int):
         
         # 結果を保存
         if result.get("stopped"):
-            execution.status = "stopped"
+            values = {"status": "stopped"}
         elif result.get("success"):
-            execution.status = "completed"
-            execution.result = result.get("result")
+            values = {"status": "completed", "result": result.get("result")}
         else:
-            execution.status = "failed"
-            execution.error_message = result.get("error")
+            values = {"status": "failed", "error_message": result.get("error")}
+        await db_writer.run(update_execution, execution_id, completed_at=datetime.now(), **values)
         
-        execution.completed_at = datetime.now()
-        db.commit()
-        
-        logger.info(f"デスクトップタスク実行完了: task_id={task_id}, status={execution.status}")
+        logger.info(f"デスクトップタスク実行完了: task_id={task_id}, status={values['status']}")
         
     except Exception as e:
         logger.error(f"デスクトップタスク実行エラー: {e}")
         if execution:
-            execution.status = "failed"
-            execution.error_message = str(e)
-            execution.completed_at = datetime.now()
-            db.commit()
+            await db_writer.run(
+                update_execution,
+                execution_id,
+                status="failed",
+                error_message=str(e),
+                completed_at=datetime.now()
+            )
     finally:
         # LiveViewManagerのクリーンアップは少し遅延
         await asyncio.sleep(2)
@@ -0,0 +1,152 @@
+"""
+実行履歴のアーカイブ
+
+保持期間（EXECUTION_ARCHIVE_AFTER_DAYS）を過ぎた終了済みの実行を、ステップごと
+1行のgzip圧縮JSONにまとめて execution_archives へ移動し、executions / execution_steps を
+小さく保ちます。移動はスケジューラーのジョブが一定件数ずつのバッチで行います。
+
+アーカイブ済みの実行は load_archived_execution() でセッションに追加しない Execution として
+復元できるため、実行詳細・ログ・結果ダウンロードは移動前と同じように参照できます。
+履歴一覧（カーソル方式）には表示されません。
+
+移動はセッションイベントを経由しない一括 INSERT/DELETE で行うため、実行イベントの通知や
+日別集計の減算は発生しません（日別集計の作り直しはアーカイブ分も含めて数えます）。
+"""
+import gzip
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import DateTime, delete, exists, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Execution, ExecutionArchive, ExecutionStep, Task
+from app.utils.logger import logger
+
+# アーカイブ対象のステータス（実行中・一時停止中は移動しない）
+ARCHIVE_STATUSES = ("completed", "failed", "stopped")
+
+
+def _to_json_row(row, table) -> dict:
+    return {
+        column.name: row[column.name].isoformat()
+        if isinstance(column.type, DateTime) and row[column.name] is not None
+        else row[column.name]
+        for column in table.columns
+    }
+
+
+def _from_json_row(data: dict, table) -> dict:
+    return {
+        column.name: datetime.fromisoformat(data[column.name])
+        if isinstance(column.type, DateTime) and data.get(column.name)
+        else data.get(column.name)
+        for column in table.columns
+    }
+
+
+def pack(execution: dict, steps: List[dict]) -> bytes:
+    """実行とステップを圧縮したJSONにまとめる"""
+    document = {
+        "execution": _to_json_row(execution, Execution.__table__),
+        "steps": [_to_json_row(step, ExecutionStep.__table__) for step in steps],
+    }
+    return gzip.compress(json.dumps(document, ensure_ascii=False).encode("utf-8"))
+
+
+def unpack(payload: bytes) -> dict:
+    """pack() の逆変換（日時は datetime に戻す）"""
+    document = json.loads(gzip.decompress(payload).decode("utf-8"))
+    return {
+        "execution": _from_json_row(document["execution"], Execution.__table__),
+        "steps": [_from_json_row(step, ExecutionStep.__table__) for step in document["steps"]],
+    }
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """
+    cutoff より前に開始した終了済みの実行を最大 batch_size 件アーカイブ
+
+    Returns:
+        移動した実行数（batch_size 未満なら対象はもう残っていない）
+    """
+    executions = db.execute(
+        select(Execution.__table__)
+        .where(Execution.started_at < cutoff, Execution.status.in_(ARCHIVE_STATUSES))
+        .order_by(Execution.started_at, Execution.id)
+        .limit(batch_size)
+    ).mappings().all()
+    if not executions:
+        return 0
+
+    execution_ids = [execution["id"] for execution in executions]
+    steps_by_execution = {execution_id: [] for execution_id in execution_ids}
+    for step in db.execute(
+        select(ExecutionStep.__table__)
+        .where(ExecutionStep.execution_id.in_(execution_ids))
+        .order_by(ExecutionStep.execution_id, ExecutionStep.step_number)
+    ).mappings():
+        steps_by_execution[step["execution_id"]].append(step)
+
+    now = datetime.utcnow()
+    db.execute(insert(ExecutionArchive.__table__), [
+        {
+            "id": execution["id"],
+            "task_id": execution["task_id"],
+            "status": execution["status"],
+            "started_at": execution["started_at"],
+            "completed_at": execution["completed_at"],
+            "step_count": len(steps_by_execution[execution["id"]]),
+            "payload": pack(execution, steps_by_execution[execution["id"]]),
+            "archived_at": now,
+        }
+        for execution in executions
+    ])
+
+    # current_step_id の外部キーを外してからステップ・実行の順に削除
+    db.execute(
+        update(Execution.__table__)
+        .where(Execution.id.in_(execution_ids), Execution.current_step_id.isnot(None))
+        .values(current_step_id=None)
+    )
+    db.execute(delete(ExecutionStep.__table__).where(ExecutionStep.execution_id.in_(execution_ids)))
+    db.execute(delete(Execution.__table__).where(Execution.id.in_(execution_ids)))
+    return len(execution_ids)
+
+
+def purge_orphaned_archives(db: Session) -> int:
+    """削除済みタスクのアーカイブを削除"""
+    result = db.execute(
+        delete(ExecutionArchive.__table__).where(
+            ~exists(select(Task.id).where(Task.id == ExecutionArchive.task_id))
+        )
+    )
+    return result.rowcount or 0
+
+
+def archive_cutoff(after_days: Optional[int] = None) -> Optional[datetime]:
+    """アーカイブ対象となる開始日時の上限（無効なら None）"""
+    after_days = settings.execution_archive_after_days if after_days is None else after_days
+    if after_days <= 0:
+        return None
+    return datetime.now() - timedelta(days=after_days)
+
+
+def load_archived_execution(db: Session, execution_id: int) -> Optional[Execution]:
+    """
+    アーカイブから実行を復元（steps 付き）
+
+    返す Execution はセッションに追加されていないため、変更しても保存されません。
+    """
+    archive = db.get(ExecutionArchive, execution_id)
+    if archive is None:
+        return None
+    try:
+        document = unpack(archive.payload)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"実行アーカイブの読み込みエラー (execution_id={execution_id}): {e}")
+        return None
+    execution = Execution(**document["execution"])
+    execution.steps = [ExecutionStep(**step) for step in document["steps"]]
+    return execution
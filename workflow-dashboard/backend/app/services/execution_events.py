@@ -0,0 +1,179 @@
+"""
+実行ライフサイクルイベント
+
+SQLAlchemy のセッションイベントから Execution の作成・状態遷移・削除と
+Task の増減を検出し、コミット後に登録されたリスナーへ通知します。
+ステータスを変更する各処理にフックを書き足す必要はありません。
+
+イベント:
+- created: 実行レコードが作成された
+- started / completed / failed / stopped / paused: ステータスが遷移した
+- deleted: 実行レコードが削除された
+- executions_deleted: タスク削除等で複数の実行がまとめて削除された（task_ids, ステータス別の counts）
+- tasks_changed: タスク数・有効タスク数が変化した
+
+一括 UPDATE/DELETE（Query.update 等）はセッションイベントを経由しないため、
+その場合は emit() で明示的に通知してください。
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models import Execution, Task
+from app.utils.logger import logger
+
+EventListener = Callable[[List[dict]], Awaitable[None]]
+
+# 遷移先ステータスに対応するイベント名
+STATUS_EVENTS = {
+    "running": "started",
+    "completed": "completed",
+    "failed": "failed",
+    "stopped": "stopped",
+    "paused": "paused",
+}
+
+_SESSION_KEY = "execution_events"
+
+
+def serialize_execution(execution: Execution) -> dict:
+    """イベントに載せる実行の要約"""
+    return {
+        "id": execution.id,
+        "task_id": execution.task_id,
+        "status": execution.status,
+        "started_at": execution.started_at.isoformat() if execution.started_at else None,
+        "completed_at": execution.completed_at.isoformat() if execution.completed_at else None,
+    }
+
+
+def _track_previous(target, value, oldvalue, initiator):
+    """値はそのまま（active_history を有効にするためだけのリスナー）"""
+    return value
+
+
+def _attribute_change(obj, key: str):
+    """属性の変更前後の値を取得（変更がなければ None）"""
+    history = inspect(obj).attrs[key].history
+    if not history.added or not history.deleted:
+        return None
+    return history.deleted[0], history.added[0]
+
+
+def _deleted_in_flush(flush_context) -> list:
+    """フラッシュで削除されたオブジェクト（リレーションのカスケードで削除されたものを含む）"""
+    return [
+        state.obj()
+        for state, (isdelete, listonly) in flush_context.states.items()
+        if isdelete and not listonly and state.obj() is not None
+    ]
+
+
+class ExecutionEventService:
+    """実行ライフサイクルイベントの検出と通知"""
+
+    def __init__(self):
+        self._listeners: List[EventListener] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add_listener(self, listener: EventListener):
+        """イベントリスナーを登録"""
+        self._listeners.append(listener)
+
+    def start(self):
+        """通知先のイベントループを記録（lifespan内で呼び出す）"""
+        self._loop = asyncio.get_running_loop()
+
+    def install(self):
+        """セッションイベントに検出処理を登録"""
+        # 未ロードの属性を書き換えた場合も変更前の値を履歴に残す
+        event.listen(Execution.status, "set", _track_previous, active_history=True)
+        event.listen(Task.is_active, "set", _track_previous, active_history=True)
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_soft_rollback", self._after_rollback)
+
+    async def emit(self, events: List[dict]):
+        """イベントをリスナーへ通知"""
+        for listener in self._listeners:
+            try:
+                await listener(events)
+            except Exception as e:
+                logger.warning(f"実行イベントの通知エラー: {e}")
+
+    def _after_flush(self, session: Session, flush_context):
+        events = session.info.setdefault(_SESSION_KEY, [])
+        task_total = 0
+        task_active = 0
+
+        for obj in session.new:
+            if isinstance(obj, Execution):
+                events.append({
+                    "event": "created",
+                    "execution": serialize_execution(obj),
+                    "previous_status": None
+                })
+            elif isinstance(obj, Task):
+                task_total += 1
+                if obj.is_active is not False:
+                    task_active += 1
+
+        # session.deleted には delete-orphan 等でフラッシュ中に削除された行が含まれないため、
+        # フラッシュの対象から削除されたものを拾う（属性はメモリ上に残っている）
+        for obj in _deleted_in_flush(flush_context):
+            if isinstance(obj, Execution):
+                events.append({
+                    "event": "deleted",
+                    "execution": serialize_execution(obj),
+                    "previous_status": obj.status
+                })
+            elif isinstance(obj, Task):
+                task_total -= 1
+                if obj.is_active:
+                    task_active -= 1
+
+        for obj in session.dirty:
+            if isinstance(obj, Execution):
+                change = _attribute_change(obj, "status")
+                if change and change[0] != change[1]:
+                    events.append({
+                        "event": STATUS_EVENTS.get(change[1], "updated"),
+                        "execution": serialize_execution(obj),
+                        "previous_status": change[0]
+                    })
+            elif isinstance(obj, Task):
+                change = _attribute_change(obj, "is_active")
+                if change and bool(change[0]) != bool(change[1]):
+                    task_active += 1 if change[1] else -1
+
+        if task_total or task_active:
+            events.append({
+                "event": "tasks_changed",
+                "total_delta": task_total,
+                "active_delta": task_active
+            })
+
+    def _after_commit(self, session: Session):
+        events = session.info.pop(_SESSION_KEY, None)
+        if not events or not self._listeners or self._loop is None:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            self._loop.create_task(self.emit(events))
+        elif not self._loop.is_closed():
+            # スケジューラー等の別スレッドからのコミット
+            asyncio.run_coroutine_threadsafe(self.emit(events), self._loop)
+
+    def _after_rollback(self, session: Session, previous_transaction):
+        session.info.pop(_SESSION_KEY, None)
+
+
+# シングルトンインスタンス
+execution_events = ExecutionEventService()
+execution_events.install()
@@ -2,6 +2,7 @@
 import os
 import httpx
 from typing import Optional, Dict, Any
+from app.services.http_clients import http_clients
 from app.utils.logger import logger
 
 
@@ -66,25 +67,25 @@ class GitHubActionsService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, headers=headers, json=payload)
-                
-                if response.status_code == 204:
-                    # 成功
-                    logger.info(f"GitHub Actions dispatch successful: task_id={task_id}, execution_id={execution_id}")
-                    return {
-                        "success": True,
-                        "message": "GitHub Actionsにタスクを送信しました",
-                        "execution_id": execution_id
-                    }
-                else:
-                    # エラー
-                    error_msg = f"GitHub API error: {response.status_code} {response.text}"
-                    logger.error(error_msg)
-                    return {
-                        "success": False,
-                        "error": error_msg
-                    }
+            client = http_clients.get("github")
+            response = await client.post(url, headers=headers, json=payload, timeout=30.0)
+            
+            if response.status_code == 204:
+                # 成功
+                logger.info(f"GitHub Actions dispatch successful: task_id={task_id}, execution_id={execution_id}")
+                return {
+                    "success": True,
+                    "message": "GitHub Actionsにタスクを送信しました",
+                    "execution_id": execution_id
+                }
+            else:
+                # エラー
+                error_msg = f"GitHub API error: {response.status_code} {response.text}"
+                logger.error(error_msg)
+                return {
+                    "success": False,
+                    "error": error_msg
+                }
         
         except httpx.TimeoutException:
             error_msg = "GitHub APIへの接続がタイムアウトしました"
@@ -125,20 +126,20 @@ class GitHubActionsService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, headers=headers)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        "status": data.get("status"),
-                        "conclusion": data.get("conclusion"),
-                        "html_url": data.get("html_url"),
-                        "run_started_at": data.get("run_started_at"),
-                        "updated_at": data.get("updated_at")
-                    }
-                else:
-                    return {"error": f"GitHub API error: {response.status_code}"}
+            client = http_clients.get("github")
+            response = await client.get(url, headers=headers, timeout=10.0)
+            
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    "status": data.get("status"),
+                    "conclusion": data.get("conclusion"),
+                    "html_url": data.get("html_url"),
+                    "run_started_at": data.get("run_started_at"),
+                    "updated_at": data.get("updated_at")
+                }
+            else:
+                return {"error": f"GitHub API error: {response.status_code}"}
         
         except Exception as e:
             logger.error(f"Failed to get workflow run status: {e}")
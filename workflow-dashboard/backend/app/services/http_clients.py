@@ -0,0 +1,115 @@
+"""
+外部APIへのHTTPクライアントの共有
+
+外部サービス（Anthropic / OpenAI / GitHub / Slack / Serper）ごとに httpx.AsyncClient を1つだけ作り、
+接続プールを使い回します。呼び出しのたびにクライアントを作ると DNS 解決・TCP 接続・TLS ハンドシェイクを
+毎回やり直すため、keep-alive の接続を再利用してその分の待ち時間を省きます。
+
+クライアントは最初の利用時に作成し、アプリケーション終了時（lifespan）に close() でまとめて閉じます。
+イベントループに結びつくため、アプリケーションのイベントループ上でのみ使用してください。
+タイムアウトはリクエストごとに timeout= で上書きできます。
+
+get_metrics() でサービスごとのリクエスト数・新規接続数（接続の再利用率）を確認できます。
+"""
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+from app.config import settings
+from app.utils.logger import logger
+
+
+class ClientMetrics:
+    """1つのクライアントのリクエスト数と新規接続数"""
+
+    __slots__ = ("requests", "connections", "tls_handshakes")
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def to_dict(self) -> dict:
+        reused = max(0, self.requests - self.connections)
+        return {
+            "requests": self.requests,
+            "new_connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_connections": reused,
+            "reuse_rate": round(reused / self.requests, 3) if self.requests else None,
+        }
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class HttpClientRegistry:
+    """外部サービスごとの共有 httpx.AsyncClient"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._metrics: Dict[str, ClientMetrics] = {}
+        self._http2: Optional[bool] = None
+
+    def _use_http2(self) -> bool:
+        if self._http2 is None:
+            self._http2 = settings.http2_enabled and _http2_available()
+            if settings.http2_enabled and not self._http2:
+                logger.warning("h2 パッケージがないため HTTP/1.1 で接続します（pip install 'httpx[http2]'）")
+        return self._http2
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        metrics = self._metrics.setdefault(name, ClientMetrics())
+
+        async def trace(event_name: str, info: dict):
+            # httpcore は新しい接続を張るときだけ connect_tcp / start_tls を通知する
+            if event_name == "connection.connect_tcp.complete":
+                metrics.connections += 1
+            elif event_name == "connection.start_tls.complete":
+                metrics.tls_handshakes += 1
+
+        async def on_request(request: httpx.Request):
+            metrics.requests += 1
+            request.extensions["trace"] = trace
+
+        return httpx.AsyncClient(
+            http2=self._use_http2(),
+            timeout=httpx.Timeout(settings.http_timeout_seconds, connect=settings.http_connect_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry_seconds,
+            ),
+            event_hooks={"request": [on_request]},
+        )
+
+    def get(self, name: str = "default") -> httpx.AsyncClient:
+        """サービス名に対応する共有クライアントを取得（なければ作成）"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    def get_metrics(self) -> dict:
+        """サービスごとの接続の再利用状況"""
+        return {
+            "http2": bool(self._http2),
+            "clients": {name: metrics.to_dict() for name, metrics in sorted(self._metrics.items())},
+        }
+
+    async def close(self):
+        """すべてのクライアントを閉じる（アプリケーション終了時）"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"HTTPクライアントの終了エラー: {e}")
+
+
+# シングルトンインスタンス
+http_clients = HttpClientRegistry()
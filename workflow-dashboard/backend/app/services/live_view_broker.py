@@ -0,0 +1,220 @@
+"""
+ライブビューイベントのPub/Subブローカー
+
+ライブビュー・ダッシュボードのイベントをワーカープロセス間で共有します。
+LIVE_VIEW_BROKER で実装を切り替えます:
+- memory: 同一プロセス内のみで配信（デフォルト、単一ワーカー向け）
+- postgres: PostgreSQL の LISTEN/NOTIFY で全ワーカーに配信（複数ワーカー向け）
+
+チャンネル名は "トピック:キー" 形式（例: "execution:12", "dashboard"）で、
+トピックごとに登録されたハンドラがローカルのWebSocket接続へ配信します。
+"""
+import asyncio
+import json
+import select
+import threading
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+from app.utils.logger import logger
+
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+
+# PostgreSQLのNOTIFYペイロード上限（8000バイト）に余裕を持たせた値
+MAX_NOTIFY_PAYLOAD_BYTES = 7900
+
+
+class LiveViewBroker:
+    """ブローカーの基底クラス"""
+
+    def __init__(self):
+        self._handlers: Dict[str, MessageHandler] = {}
+
+    def register_handler(self, topic: str, handler: MessageHandler):
+        """トピックのローカル配信ハンドラを登録"""
+        self._handlers[topic] = handler
+
+    async def start(self):
+        """ブローカーを開始"""
+
+    async def stop(self):
+        """ブローカーを停止"""
+
+    async def publish(self, channel: str, message: dict):
+        """チャンネルにメッセージを配信"""
+        raise NotImplementedError
+
+    async def _dispatch(self, channel: str, message: dict):
+        """ローカルのハンドラにメッセージを渡す"""
+        topic = channel.split(":", 1)[0]
+        handler = self._handlers.get(topic)
+        if not handler:
+            return
+        try:
+            await handler(channel, message)
+        except Exception as e:
+            logger.warning(f"ブローカー配信エラー: channel={channel}, error={e}")
+
+
+class InProcessBroker(LiveViewBroker):
+    """同一プロセス内のみで配信するブローカー"""
+
+    async def publish(self, channel: str, message: dict):
+        await self._dispatch(channel, message)
+
+
+class PostgresNotifyBroker(LiveViewBroker):
+    """
+    PostgreSQL LISTEN/NOTIFY を使ったワーカー間ブローカー
+
+    発行元のワーカーには即座にローカル配信し、他ワーカーにはNOTIFYで届けます。
+    NOTIFYの上限を超える大きなメッセージ（スクリーンショット等）はローカル配信のみです。
+    トランザクションモードのプーラー（Supabaseのポート6543等）ではLISTENが使えないため、
+    セッションモード（ポート5432）か直接接続のURLを指定してください。
+    """
+
+    def __init__(self, dsn: str, pg_channel: str = "live_view_events"):
+        super().__init__()
+        self.dsn = dsn
+        self.pg_channel = pg_channel
+        self.node_id = uuid.uuid4().hex[:12]
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publish_queue: Optional[asyncio.Queue] = None
+        self._publisher_task: Optional[asyncio.Task] = None
+        self._publish_conn = None
+        self._listener_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._publish_queue = asyncio.Queue()
+        self._stop_event.clear()
+
+        self._listener_thread = threading.Thread(
+            target=self._listen_forever,
+            name="live-view-broker-listener",
+            daemon=True
+        )
+        self._listener_thread.start()
+        self._publisher_task = asyncio.create_task(self._publish_forever())
+        logger.info(f"ライブビューブローカー開始 (postgres): node_id={self.node_id}")
+
+    async def stop(self):
+        self._stop_event.set()
+        if self._publisher_task:
+            self._publisher_task.cancel()
+            try:
+                await self._publisher_task
+            except asyncio.CancelledError:
+                pass
+            self._publisher_task = None
+        if self._listener_thread:
+            await asyncio.to_thread(self._listener_thread.join, 5)
+            self._listener_thread = None
+        if self._publish_conn is not None:
+            try:
+                self._publish_conn.close()
+            except Exception:
+                pass
+            self._publish_conn = None
+        logger.info("ライブビューブローカー停止 (postgres)")
+
+    async def publish(self, channel: str, message: dict):
+        # 発行元ワーカーの視聴者にはDBを経由せず即座に配信
+        await self._dispatch(channel, message)
+
+        payload = json.dumps(
+            {"o": self.node_id, "c": channel, "m": message},
+            ensure_ascii=False,
+            default=str
+        )
+        if len(payload.encode("utf-8")) > MAX_NOTIFY_PAYLOAD_BYTES:
+            logger.debug(f"NOTIFY上限超過のためローカル配信のみ: channel={channel}")
+            return
+        if self._publish_queue is not None:
+            self._publish_queue.put_nowait(payload)
+
+    async def _publish_forever(self):
+        """キューに溜まったメッセージを順序通りNOTIFYする"""
+        while True:
+            payload = await self._publish_queue.get()
+            batch = [payload]
+            while not self._publish_queue.empty() and len(batch) < 100:
+                batch.append(self._publish_queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._notify_batch, batch)
+            except Exception as e:
+                logger.warning(f"NOTIFY送信エラー（{len(batch)}件を破棄）: {e}")
+                if self._publish_conn is not None:
+                    try:
+                        self._publish_conn.close()
+                    except Exception:
+                        pass
+                    self._publish_conn = None
+
+    def _notify_batch(self, batch: list):
+        import psycopg2
+
+        if self._publish_conn is None or self._publish_conn.closed:
+            self._publish_conn = psycopg2.connect(self.dsn)
+            self._publish_conn.autocommit = True
+        with self._publish_conn.cursor() as cur:
+            for payload in batch:
+                cur.execute("SELECT pg_notify(%s, %s)", (self.pg_channel, payload))
+
+    def _listen_forever(self):
+        """別スレッドでLISTENし、受信したメッセージをイベントループへ渡す"""
+        import psycopg2
+
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.pg_channel}"')
+
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._handle_notify(notify.payload)
+            except Exception as e:
+                logger.warning(f"LISTEN接続エラー（再接続します）: {e}")
+                self._stop_event.wait(2.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _handle_notify(self, payload: str):
+        try:
+            envelope = json.loads(payload)
+        except ValueError:
+            return
+        # 自ワーカーが発行したものは配信済み
+        if envelope.get("o") == self.node_id:
+            return
+        asyncio.run_coroutine_threadsafe(
+            self._dispatch(envelope["c"], envelope["m"]),
+            self._loop
+        )
+
+
+def create_live_view_broker() -> LiveViewBroker:
+    """設定に応じたブローカーを作成"""
+    if settings.live_view_broker == "postgres":
+        dsn = settings.live_view_broker_url or settings.effective_database_url
+        if dsn.startswith("postgresql"):
+            return PostgresNotifyBroker(dsn)
+        logger.warning("LIVE_VIEW_BROKER=postgres ですがPostgreSQLのURLがないため memory を使用します")
+    return InProcessBroker()
+
+
+# シングルトンインスタンス
+live_view_broker = create_live_view_broker()
@@ -5,42 +5,202 @@ from datetime import datetime
 from typing import Optional, List
 from pathlib import Path
 
+from app.config import settings
+from app.services.live_view_broker import live_view_broker
+from app.services.screenshot_store import screenshot_store
+from app.services.session_recorder import session_recorder
+
+# 実行完了後にキャッシュを保持する秒数（他ワーカーのキャッシュもこの時間で破棄）
+COMPLETED_CACHE_TTL_SECONDS = 300
+
+# ログレベルの優先度（未知のレベルは INFO 扱い）
+LOG_LEVEL_PRIORITY = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+}
+
+# まとめ送り待ちのログがこの件数に達したら間隔を待たずに送信
+MAX_PENDING_LOGS = 200
+
+
+def log_level_priority(level: Optional[str]) -> int:
+    """ログレベルの優先度を取得"""
+    return LOG_LEVEL_PRIORITY.get((level or "").upper(), LOG_LEVEL_PRIORITY["INFO"])
+
+
+class LiveViewSubscriber:
+    """
+    ライブビューのWebSocket接続ごとの配信状態
+    
+    ログは min_level 未満を破棄し、残りを一定間隔ごとに log_batch として1フレームにまとめて送ります。
+    ログ以外のメッセージを送る前には溜まっているログを先に送り、順序を保ちます。
+    """
+    
+    def __init__(self, websocket, min_level: str = "DEBUG", batch_interval_ms: Optional[int] = None):
+        self.websocket = websocket
+        self.min_priority = log_level_priority(min_level)
+        interval_ms = settings.live_view_log_batch_ms if batch_interval_ms is None else batch_interval_ms
+        self.batch_interval = max(0, interval_ms) / 1000
+        self.closed = False
+        self._pending_logs: List[dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    def accepts_log(self, entry: dict) -> bool:
+        """ログがこの接続の最小レベル以上か"""
+        return log_level_priority(entry.get("level")) >= self.min_priority
+    
+    def queue_log(self, entry: dict):
+        """ログをまとめ送り待ちに追加"""
+        if self.closed or not self.accepts_log(entry):
+            return
+        self._pending_logs.append(entry)
+        if len(self._pending_logs) >= MAX_PENDING_LOGS:
+            self._schedule_flush(0)
+        elif self._flush_task is None:
+            self._schedule_flush(self.batch_interval)
+    
+    def _schedule_flush(self, delay: float):
+        if self._flush_task is not None and delay > 0:
+            return
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        self._flush_task = asyncio.create_task(self._flush_later(delay))
+    
+    async def _flush_later(self, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            self.closed = True
+    
+    async def flush(self):
+        """溜まっているログを1フレームで送信"""
+        if not self._pending_logs:
+            return
+        logs, self._pending_logs = self._pending_logs, []
+        await self.websocket.send_json({
+            "type": "log_batch",
+            "data": {"logs": logs}
+        })
+    
+    async def send(self, message: dict):
+        """ログ以外のメッセージを送信"""
+        await self.flush()
+        await self.websocket.send_json(message)
+    
+    def close(self):
+        """まとめ送りを停止"""
+        self.closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending_logs = []
+
 
 class LiveViewManager:
     """ライブビューのデータ管理とWebSocket配信"""
     
     def __init__(self):
-        self._connections: dict[int, list] = {}  # execution_id -> WebSocket connections
-        self._screenshot_cache: dict[int, str] = {}  # execution_id -> base64 screenshot
+        self._connections: dict[int, List[LiveViewSubscriber]] = {}  # execution_id -> 接続ごとの配信状態
+        self._screenshot_cache: dict[int, str] = {}  # execution_id -> screenshot_id
         self._log_cache: dict[int, List[dict]] = {}  # execution_id -> log entries
+        
+        # ブローカー経由で届いたイベントをこのワーカーの接続に配信
+        live_view_broker.register_handler("execution", self._on_broker_message)
+        # 表示中のスクリーンショットは定期削除の対象から外す
+        screenshot_store.register_reference_source(lambda: list(self._screenshot_cache.values()))
     
-    def add_connection(self, execution_id: int, websocket):
+    def add_connection(
+        self,
+        execution_id: int,
+        websocket,
+        min_level: str = "DEBUG",
+        batch_interval_ms: Optional[int] = None
+    ) -> LiveViewSubscriber:
         """WebSocket接続を追加"""
+        subscriber = LiveViewSubscriber(websocket, min_level, batch_interval_ms)
         if execution_id not in self._connections:
             self._connections[execution_id] = []
-        self._connections[execution_id].append(websocket)
+        self._connections[execution_id].append(subscriber)
+        return subscriber
     
     def remove_connection(self, execution_id: int, websocket):
         """WebSocket接続を削除"""
         if execution_id in self._connections:
-            self._connections[execution_id] = [
-                ws for ws in self._connections[execution_id] if ws != websocket
-            ]
+            remaining = []
+            for subscriber in self._connections[execution_id]:
+                if subscriber.websocket == websocket:
+                    subscriber.close()
+                else:
+                    remaining.append(subscriber)
+            self._connections[execution_id] = remaining
     
     def get_connection_count(self, execution_id: int) -> int:
         """接続数を取得"""
         return len(self._connections.get(execution_id, []))
     
     async def broadcast(self, execution_id: int, message: dict):
-        """指定実行IDの全接続にメッセージを配信"""
-        connections = self._connections.get(execution_id, [])
+        """指定実行IDの全接続にメッセージを配信（全ワーカー）"""
+        await live_view_broker.publish(f"execution:{execution_id}", message)
+    
+    async def _on_broker_message(self, channel: str, message: dict):
+        """ブローカーからのメッセージをキャッシュに反映してローカル配信"""
+        execution_id = int(channel.split(":", 1)[1])
+        self._update_cache(execution_id, message)
+        await self._send_local(execution_id, message)
+    
+    def _update_cache(self, execution_id: int, message: dict):
+        """初期表示用のキャッシュを更新"""
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        
+        if message_type == "screenshot_update" and data.get("screenshot_id"):
+            self._screenshot_cache[execution_id] = data["screenshot_id"]
+        
+        elif message_type == "log":
+            logs = self._log_cache.setdefault(execution_id, [])
+            logs.append(data)
+            # 最新100件のみ保持
+            if len(logs) > 100:
+                self._log_cache[execution_id] = logs[-100:]
+        
+        elif message_type == "execution_complete":
+            # 実行元以外のワーカーにもキャッシュが残るため、一定時間後に破棄
+            try:
+                asyncio.get_running_loop().call_later(
+                    COMPLETED_CACHE_TTL_SECONDS, self._drop_cache, execution_id
+                )
+            except RuntimeError:
+                pass
+    
+    def _drop_cache(self, execution_id: int):
+        """キャッシュのみ破棄（接続は維持）"""
+        self._screenshot_cache.pop(execution_id, None)
+        self._log_cache.pop(execution_id, None)
+    
+    async def _send_local(self, execution_id: int, message: dict):
+        """このワーカーの接続にメッセージを送信"""
+        subscribers = list(self._connections.get(execution_id, []))
         dead_connections = []
+        is_log = message.get("type") == "log"
         
-        for ws in connections:
+        for subscriber in subscribers:
+            if subscriber.closed:
+                dead_connections.append(subscriber.websocket)
+                continue
+            if is_log:
+                # ログは接続ごとにまとめて送る
+                subscriber.queue_log(message.get("data") or {})
+                continue
             try:
-                await ws.send_json(message)
+                await subscriber.send(message)
             except Exception:
-                dead_connections.append(ws)
+                dead_connections.append(subscriber.websocket)
         
         # 切断された接続を削除
         for ws in dead_connections:
@@ -71,19 +231,25 @@ class LiveViewManager:
             }
         }
         
-        # スクリーンショットは別メッセージで送信（サイズが大きいため）
+        # スクリーンショットはストアに保存し、メッセージにはIDのみ載せる
         if screenshot_base64:
-            self._screenshot_cache[execution_id] = screenshot_base64
+            screenshot_id = await asyncio.to_thread(screenshot_store.put_base64, screenshot_base64)
             screenshot_message = {
                 "type": "screenshot_update",
                 "data": {
                     "step_number": step_number,
-                    "screenshot": screenshot_base64
+                    **screenshot_store.ref(screenshot_id)
                 }
             }
             await self.broadcast(execution_id, screenshot_message)
         
         await self.broadcast(execution_id, message)
+        
+        # 録画にはステップの区切りと確定したスクリーンショットのみ残す
+        if screenshot_base64 or status in ("completed", "failed"):
+            await session_recorder.record_step(
+                execution_id, step_number, description, status, screenshot_base64
+            )
     
     async def send_log(self, execution_id: int, level: str, message: str):
         """ログメッセージを配信"""
@@ -93,15 +259,7 @@ class LiveViewManager:
             "timestamp": datetime.now().isoformat()
         }
         
-        # キャッシュに追加
-        if execution_id not in self._log_cache:
-            self._log_cache[execution_id] = []
-        self._log_cache[execution_id].append(log_entry)
-        
-        # 最新100件のみ保持
-        if len(self._log_cache[execution_id]) > 100:
-            self._log_cache[execution_id] = self._log_cache[execution_id][-100:]
-        
+        # キャッシュへの追加はブローカー配信時に各ワーカーで行う
         log_message = {
             "type": "log",
             "data": log_entry
@@ -148,9 +306,10 @@ class LiveViewManager:
             }
         }
         await self.broadcast(execution_id, message)
+        session_recorder.finish(execution_id)
     
     def get_cached_screenshot(self, execution_id: int) -> Optional[str]:
-        """キャッシュされたスクリーンショットを取得"""
+        """キャッシュされた最新スクリーンショットのIDを取得"""
         return self._screenshot_cache.get(execution_id)
     
     def get_cached_logs(self, execution_id: int) -> List[dict]:
@@ -159,7 +318,8 @@ class LiveViewManager:
     
     def cleanup(self, execution_id: int):
         """実行終了時のクリーンアップ"""
-        self._connections.pop(execution_id, None)
+        for subscriber in self._connections.pop(execution_id, []):
+            subscriber.close()
         self._screenshot_cache.pop(execution_id, None)
         self._log_cache.pop(execution_id, None)
 
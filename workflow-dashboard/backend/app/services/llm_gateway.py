@@ -0,0 +1,338 @@
+"""
+LLM ゲートウェイ
+
+Anthropic / OpenAI の呼び出しをまとめて次の制御を行います。
+- APIキーごとの同時実行数の上限（セマフォ）。429 を受けたキーは retry-after の間、新しいリクエストを待たせる
+- 429・5xx・接続エラーは retry-after（なければ指数バックオフ）に従ってリトライ
+- プロバイダーごとのサーキットブレーカー（連続して失敗したら一定時間そのプロバイダーを使わない）
+- 渡された認証情報の順にフェイルオーバー（Anthropic で失敗したら OpenAI）
+- リトライ・待機・フェイルオーバーを含めた全体の期限（deadline、既定は llm_request_deadline_seconds）。
+  各試行のタイムアウトは timeout と期限までの残り時間の短い方
+- on_delta を渡すとストリーミングで呼び出し、届いたテキストを順に渡す
+  （最初のテキストを渡した後はやり直せないため、リトライ・フェイルオーバーしない）
+
+    credentials = get_llm_credentials(db)  # [("anthropic", key), ("openai", key)]
+    text = await llm_gateway.complete(credentials, messages, max_tokens=2048, timeout=120, deadline=300)
+"""
+import asyncio
+import hashlib
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.exceptions import LLMProviderError
+from app.services.anthropic_client import (
+    call_anthropic_api, stream_anthropic_api, system_prompt_text, SystemPrompt, DEFAULT_MODEL as DEFAULT_ANTHROPIC_MODEL
+)
+from app.services.credential_manager import credential_manager
+from app.services.openai_client import (
+    call_openai_api, stream_openai_api, AVAILABLE_MODELS as OPENAI_MODELS, DEFAULT_CHAT_MODEL as DEFAULT_OPENAI_MODEL
+)
+from app.utils.logger import logger
+
+PROVIDER_NAMES = {"anthropic": "Anthropic", "openai": "OpenAI"}
+
+# チャットで使うプロバイダーの優先順
+CHAT_PROVIDERS = ("anthropic", "openai")
+
+OPENAI_MODEL_IDS = {model["id"] for model in OPENAI_MODELS}
+
+DeltaHandler = Callable[[str], Awaitable[None]]
+
+
+def get_llm_credentials(db: Session, providers: Sequence[str] = CHAT_PROVIDERS) -> List[Tuple[str, str]]:
+    """登録済みのデフォルトAPIキーを (プロバイダー, APIキー) のリストで返す（providers の順）"""
+    credentials = []
+    for provider in providers:
+        cred = credential_manager.get_default(db, "api_key", provider)
+        api_key = cred["data"].get("api_key") if cred else None
+        if api_key:
+            credentials.append((provider, api_key))
+    return credentials
+
+
+def model_for(provider: str, model: Optional[str]) -> str:
+    """指定モデルがそのプロバイダーのものでなければ、プロバイダーの既定モデルを使う"""
+    if provider == "anthropic":
+        return model if model and model.startswith("claude") else DEFAULT_ANTHROPIC_MODEL
+    return model if model in OPENAI_MODEL_IDS or (model or "").startswith("gpt") else DEFAULT_OPENAI_MODEL
+
+
+class CircuitBreaker:
+    """連続した失敗で開き、一定時間後に1件だけ試して閉じるかを判断する"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """結果を記録せずに終わった試行（キャンセル等）の後も、次の1件を試せるようにする"""
+        self._trial_in_flight = False
+
+
+class KeyLimiter:
+    """1つのAPIキーの同時実行数と、429 を受けた後の待機"""
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.blocked_until = 0.0
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def __aenter__(self):
+        while True:
+            wait = self.blocked_until - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await self.semaphore.acquire()
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class DeltaForwarder:
+    """ストリーミングのテキストを呼び出し元へ渡し、1件でも渡したかを記録する"""
+
+    def __init__(self, on_delta: DeltaHandler):
+        self.on_delta = on_delta
+        self.started = False
+
+    async def __call__(self, delta: str):
+        self.started = True
+        await self.on_delta(delta)
+
+
+def _deadline_error(provider: str) -> LLMProviderError:
+    """全体の期限切れ（プロバイダーの障害とは限らないのでブレーカーに数えない）"""
+    return LLMProviderError("タイムアウト: 応答に時間がかかりすぎています。", provider)
+
+
+class LLMGateway:
+    """リトライ・同時実行数制御・サーキットブレーカー・フェイルオーバー付きの LLM 呼び出し"""
+
+    def __init__(self):
+        self._limiters: Dict[str, KeyLimiter] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _limiter(self, provider: str, api_key: str) -> KeyLimiter:
+        key = f"{provider}:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]}"
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = KeyLimiter(settings.llm_max_concurrency_per_key)
+            self._limiters[key] = limiter
+        return limiter
+
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(settings.llm_circuit_failure_threshold, settings.llm_circuit_reset_seconds)
+            self._breakers[provider] = breaker
+        return breaker
+
+    def _retry_delay(self, error: LLMProviderError, attempt: int) -> float:
+        if error.retry_after is not None:
+            return min(error.retry_after, settings.llm_retry_max_delay_seconds)
+        delay = settings.llm_retry_base_delay_seconds * (2 ** attempt)
+        # 同時に失敗したリクエストが同じタイミングで再試行しないよう揺らす
+        return min(delay * random.uniform(0.8, 1.2), settings.llm_retry_max_delay_seconds)
+
+    async def _call(
+        self,
+        provider: str,
+        api_key: str,
+        messages: List[Dict],
+        model: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        timeout: int,
+        system_prompt: Optional[SystemPrompt],
+        forward: Optional[DeltaForwarder]
+    ) -> str:
+        kwargs = {
+            "api_key": api_key,
+            "messages": messages,
+            "model": model_for(provider, model),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "timeout": timeout,
+        }
+        if provider == "anthropic":
+            kwargs["system_prompt"] = system_prompt
+        elif system_prompt:
+            kwargs["messages"] = [{"role": "system", "content": system_prompt_text(system_prompt)}] + [m for m in messages if m.get("role") != "system"]
+
+        if forward is None:
+            call = call_anthropic_api if provider == "anthropic" else call_openai_api
+            return await call(**kwargs)
+
+        stream = stream_anthropic_api if provider == "anthropic" else stream_openai_api
+        parts = []
+        async for delta in stream(**kwargs):
+            parts.append(delta)
+            await forward(delta)
+        return "".join(parts)
+
+    async def _call_limited(self, limiter: KeyLimiter, provider: str, api_key: str, **kwargs) -> str:
+        async with limiter:
+            return await self._call(provider, api_key, **kwargs)
+
+    async def _call_with_retries(self, provider: str, api_key: str, deadline_at: float, **kwargs) -> str:
+        limiter = self._limiter(provider, api_key)
+        forward = kwargs["forward"]
+        timeout = kwargs.pop("timeout")
+        for attempt in range(settings.llm_max_retries + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise _deadline_error(provider)
+            try:
+                # キーの空き待ちも含めて期限までに終わらせる
+                return await asyncio.wait_for(
+                    self._call_limited(limiter, provider, api_key, timeout=min(timeout, remaining), **kwargs),
+                    remaining
+                )
+            except asyncio.TimeoutError:
+                raise _deadline_error(provider)
+            except LLMProviderError as e:
+                if not e.retryable or attempt >= settings.llm_max_retries or (forward and forward.started):
+                    raise
+                delay = self._retry_delay(e, attempt)
+                if delay >= deadline_at - time.monotonic():
+                    # 待つと期限を過ぎるため再試行しない
+                    raise
+                if e.status_code == 429:
+                    # 同じキーの他のリクエストもこの間は送らない
+                    limiter.block(delay)
+                logger.warning(
+                    f"{PROVIDER_NAMES.get(provider, provider)} API エラーのため {delay:.1f}秒後に再試行します "
+                    f"({attempt + 1}/{settings.llm_max_retries}): {e}"
+                )
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def complete(
+        self,
+        credentials: Sequence[Tuple[str, str]],
+        messages: List[Dict],
+        model: Optional[str] = None,
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        timeout: int = 120,
+        system_prompt: Optional[SystemPrompt] = None,
+        on_delta: Optional[DeltaHandler] = None,
+        deadline: Optional[float] = None
+    ) -> str:
+        """
+        credentials の順にプロバイダーを試して応答テキストを返す
+
+        on_delta を渡すとストリーミングAPIを使い、届いたテキストを順に渡します
+        （戻り値は同じく応答テキスト全体）。
+        timeout は1回の試行、deadline（秒）はリトライ・フェイルオーバーを含めた全体の上限です。
+
+        Raises:
+            LLMProviderError: すべてのプロバイダーで失敗した場合（最後のエラー）
+        """
+        forward = DeltaForwarder(on_delta) if on_delta else None
+        deadline_at = time.monotonic() + (settings.llm_request_deadline_seconds if deadline is None else deadline)
+        last_error: Optional[LLMProviderError] = None
+        for index, (provider, api_key) in enumerate(credentials):
+            if time.monotonic() >= deadline_at:
+                last_error = last_error or _deadline_error(provider)
+                break
+            breaker = self._breaker(provider)
+            trial = breaker.state == "half_open"
+            if not breaker.allow():
+                logger.warning(f"{PROVIDER_NAMES.get(provider, provider)} は連続したエラーのため一時的に使用を停止しています")
+                last_error = last_error or LLMProviderError(
+                    f"{PROVIDER_NAMES.get(provider, provider)} APIが一時的に利用できません。しばらく待ってから再試行してください。",
+                    provider,
+                    retryable=True
+                )
+                continue
+            try:
+                result = await self._call_with_retries(
+                    provider,
+                    api_key,
+                    deadline_at,
+                    messages=messages,
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=timeout,
+                    system_prompt=system_prompt,
+                    forward=forward
+                )
+            except LLMProviderError as e:
+                # APIキーの誤りなどプロバイダー側の障害でないものはブレーカーの状態を変えない
+                if e.retryable:
+                    breaker.record_failure()
+                last_error = e
+                if forward and forward.started:
+                    # 途中まで返したテキストに別のプロバイダーの応答をつなげない
+                    raise
+                if index < len(credentials) - 1:
+                    logger.warning(f"{PROVIDER_NAMES.get(provider, provider)} の呼び出しに失敗したため次のプロバイダーを使用します: {e}")
+                continue
+            except Exception:
+                # 応答の解析失敗など想定外のエラーもプロバイダーの失敗として数える
+                breaker.record_failure()
+                raise
+            finally:
+                # キャンセルされた場合も試行中のまま残さない
+                if trial:
+                    breaker.release_trial()
+            breaker.record_success()
+            return result
+
+        if last_error is None:
+            raise LLMProviderError(
+                "Anthropic または OpenAI APIキーが設定されていません。設定画面からAPIキーを追加してください。",
+                "none"
+            )
+        raise last_error
+
+    def get_status(self) -> dict:
+        """プロバイダーごとのサーキットブレーカーの状態"""
+        return {
+            provider: {"state": breaker.state, "consecutive_failures": breaker.failures}
+            for provider, breaker in sorted(self._breakers.items())
+        }
+
+
+# シングルトンインスタンス
+llm_gateway = LLMGateway()
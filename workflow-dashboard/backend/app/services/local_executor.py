@@ -12,8 +12,9 @@ from typing import Optional
 
 from sqlalchemy.orm import Session
 
-from app.models import Task, Execution, ExecutionStep
+from app.models import Task, Execution
 from app.services.live_view_manager import live_view_manager
+from app.services.step_writer import step_writer
 from app.utils.logger import logger
 
 # 試運転APIからconnected_agentsをインポート
@@ -136,21 +137,15 @@ async def run_on_local_agent(task: Task, execution: Execution, db: Session) -> d
                     
                     trial_sessions[trial_id]["current_step"] = step
                     
-                    # ステップをDBに記録
-                    db_step = ExecutionStep(
-                        execution_id=execution.id,
-                        step_number=step,
+                    # ステップをDBに記録（まとめて書き込むため受信ループは待たない）
+                    step_writer.add_step(
+                        execution.id,
+                        step,
                         action_type="action",
                         description=description,
                         status=status,
                         started_at=datetime.now()
                     )
-                    db.add(db_step)
-                    db.commit()
-                    
-                    execution.total_steps = step
-                    execution.current_step_id = db_step.id
-                    db.commit()
                     
                     # ライブビューに通知
                     await live_view_manager.send_step_update(
@@ -260,6 +255,9 @@ async def run_on_local_agent(task: Task, execution: Execution, db: Session) -> d
         
         if trial_id in trial_sessions:
             del trial_sessions[trial_id]
+        
+        # 溜まっているステップを書き込む
+        await step_writer.flush()
     
     result = result_holder.get("result", {"success": False, "error": "不明なエラー"})
     
@@ -1,10 +1,10 @@
 """通知サービス"""
-import httpx
 from typing import Optional
 from sqlalchemy.orm import Session
 
 from app.models import Task, Execution
 from app.services.credential_manager import credential_manager
+from app.services.http_clients import http_clients
 from app.utils.logger import logger
 
 
@@ -111,12 +111,12 @@ class NotificationService:
         
         # 送信
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(webhook_url, json=message, timeout=10)
-                if response.status_code == 200:
-                    logger.info(f"Slack通知を送信しました: task_id={task.id}")
-                else:
-                    logger.error(f"Slack通知エラー: {response.status_code}")
+            client = http_clients.get("slack")
+            response = await client.post(webhook_url, json=message, timeout=10)
+            if response.status_code == 200:
+                logger.info(f"Slack通知を送信しました: task_id={task.id}")
+            else:
+                logger.error(f"Slack通知エラー: {response.status_code}")
         except Exception as e:
             logger.error(f"Slack通知送信エラー: {e}")
     
@@ -151,16 +151,16 @@ class NotificationService:
                 return {"success": False, "message": "Webhook URLが設定されていません"}
             
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        webhook_url,
-                        json={"text": "🔔 Workflow Dashboard: テスト通知"},
-                        timeout=10
-                    )
-                    if response.status_code == 200:
-                        return {"success": True, "message": "テスト通知を送信しました"}
-                    else:
-                        return {"success": False, "message": f"エラー: {response.status_code}"}
+                client = http_clients.get("slack")
+                response = await client.post(
+                    webhook_url,
+                    json={"text": "🔔 Workflow Dashboard: テスト通知"},
+                    timeout=10
+                )
+                if response.status_code == 200:
+                    return {"success": True, "message": "テスト通知を送信しました"}
+                else:
+                    return {"success": False, "message": f"エラー: {response.status_code}"}
             except Exception as e:
                 return {"success": False, "message": str(e)}
         
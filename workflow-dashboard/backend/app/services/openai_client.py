@@ -1,6 +1,9 @@
 """OpenAI API クライアント（Chat Completions API と Responses API 両対応）"""
+import json
 import httpx
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
+from app.exceptions import LLMProviderError
+from app.services.http_clients import http_clients
 from app.utils.logger import logger
 
 # 利用可能なモデルリスト
@@ -87,17 +90,108 @@ async def call_openai_api(
     # タイムアウト設定（接続10秒、読み取り180秒）
     timeout_config = httpx.Timeout(timeout, connect=10.0)
     
-    async with httpx.AsyncClient(timeout=timeout_config) as client:
+    client = http_clients.get("openai")
+    try:
         if is_responses_api_model(model):
             # Responses API を使用
             return await _call_responses_api(
-                client, api_key, messages, model, max_tokens, temperature, timeout
+                client, api_key, messages, model, max_tokens, temperature, timeout_config
             )
         else:
             # Chat Completions API を使用
             return await _call_chat_completions_api(
-                client, api_key, messages, model, max_tokens, temperature, timeout
+                client, api_key, messages, model, max_tokens, temperature, timeout_config
             )
+    except httpx.TransportError as e:
+        logger.warning(f"OpenAI API connection error: {e}")
+        raise LLMProviderError(f"API接続エラー: {e}", "openai", retryable=True)
+
+
+async def stream_openai_api(
+    api_key: str,
+    messages: List[Dict],
+    model: str = None,
+    max_tokens: int = 1024,
+    temperature: float = 0.7,
+    timeout: int = 180
+) -> AsyncIterator[str]:
+    """
+    OpenAI APIをストリーミングで呼び出し、応答テキストを届いた順に返す
+    
+    引数は call_openai_api と同じです。Responses API のモデルは response.output_text.delta を、
+    それ以外は Chat Completions の delta.content を返します。
+    """
+    if model is None:
+        model = DEFAULT_CHAT_MODEL
+    
+    timeout_config = httpx.Timeout(timeout, connect=10.0)
+    
+    if is_responses_api_model(model):
+        url = "https://api.openai.com/v1/responses"
+        request_body = {
+            "model": model,
+            "input": convert_messages_to_input(messages),
+            "max_output_tokens": max_tokens,
+            "stream": True,
+        }
+        if "codex" not in model.lower():
+            request_body["temperature"] = temperature
+    else:
+        url = "https://api.openai.com/v1/chat/completions"
+        request_body = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": messages,
+            "stream": True,
+        }
+    
+    logger.info(f"Streaming OpenAI API with model: {model}")
+    
+    client = http_clients.get("openai")
+    try:
+        async with client.stream(
+            "POST",
+            url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            json=request_body,
+            timeout=timeout_config
+        ) as response:
+            if response.status_code != 200:
+                error_detail = (await response.aread()).decode("utf-8", errors="replace")
+                logger.error(f"OpenAI API Error: {response.status_code} - {error_detail}")
+                raise LLMProviderError.from_status(
+                    f"API Error: {response.status_code} - {error_detail}", "openai", response.status_code, response.headers
+                )
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                event = json.loads(data)
+                event_type = event.get("type")
+                if event_type == "response.output_text.delta":
+                    if event.get("delta"):
+                        yield event["delta"]
+                elif event_type in ("error", "response.failed"):
+                    error = event.get("error") or (event.get("response") or {}).get("error") or {}
+                    logger.error(f"OpenAI API stream error: {error}")
+                    raise LLMProviderError(f"API Error: {error.get('message', error)}", "openai", retryable=True)
+                elif event_type == "response.completed":
+                    return
+                elif "choices" in event:
+                    for choice in event["choices"]:
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            yield content
+    except httpx.TransportError as e:
+        logger.warning(f"OpenAI API connection error: {e}")
+        raise LLMProviderError(f"API接続エラー: {e}", "openai", retryable=True)
 
 
 async def _call_responses_api(
@@ -107,75 +201,64 @@ async def _call_responses_api(
     model: str,
     max_tokens: int,
     temperature: float,
-    timeout: int
+    timeout: httpx.Timeout
 ) -> str:
-    """Responses API を呼び出す（リトライ機能付き）"""
-    import asyncio
-    
+    """Responses API を呼び出す（リトライは llm_gateway が行う）"""
     input_text = convert_messages_to_input(messages)
     logger.info(f"Calling Responses API with model: {model}")
 
     current_max_tokens = max_tokens
-    max_retries = 3
     
-    for retry in range(max_retries):
-        try:
-            # 1回目でトークン上限に達した場合のみ、上限を増やして再試行する
-            for attempt in range(2):
-                request_body = {
-                    "model": model,
-                    "input": input_text,
-                    "max_output_tokens": current_max_tokens,
-                }
-                # codex系モデル以外の場合のみtemperatureを追加
-                if "codex" not in model.lower():
-                    request_body["temperature"] = temperature
-                
-                response = await client.post(
-                    "https://api.openai.com/v1/responses",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json=request_body
-                )
-                
-                if response.status_code != 200:
-                    error_detail = response.text
-                    logger.error(f"Responses API Error: {response.status_code} - {error_detail}")
-                    raise Exception(f"API Error: {response.status_code} - {error_detail}")
-                
-                result = response.json()
-                output_text = _extract_output_text(result)
-                status = result.get("status")
-                incomplete_reason = (result.get("incomplete_details") or {}).get("reason")
-                
-                if output_text:
-                    return output_text
-                
-                # 出力がトークン上限により途切れた場合は、1度だけ上限を増やして再試行
-                if (
-                    attempt == 0
-                    and status == "incomplete"
-                    and incomplete_reason == "max_output_tokens"
-                ):
-                    logger.info(
-                        f"Responses API output was truncated (max_output_tokens={current_max_tokens}). Retrying with a higher limit."
-                    )
-                    current_max_tokens = min(current_max_tokens * 2, 8192)
-                    continue
-                
-                logger.warning(f"No output_text in response: {result}")
-                return str(result)
-            
-            return ""
-            
-        except (httpx.ConnectError, httpx.ReadTimeout, httpx.RemoteProtocolError) as e:
-            logger.warning(f"Responses API connection error (attempt {retry + 1}/{max_retries}): {e}")
-            if retry < max_retries - 1:
-                await asyncio.sleep(2 ** retry)  # 指数バックオフ: 1秒, 2秒, 4秒
-                continue
-            raise Exception(f"API接続エラー（{max_retries}回リトライ後も失敗）: {e}")
+    # 1回目でトークン上限に達した場合のみ、上限を増やして再試行する
+    for attempt in range(2):
+        request_body = {
+            "model": model,
+            "input": input_text,
+            "max_output_tokens": current_max_tokens,
+        }
+        # codex系モデル以外の場合のみtemperatureを追加
+        if "codex" not in model.lower():
+            request_body["temperature"] = temperature
+        
+        response = await client.post(
+            "https://api.openai.com/v1/responses",
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            json=request_body,
+            timeout=timeout
+        )
+        
+        if response.status_code != 200:
+            error_detail = response.text
+            logger.error(f"Responses API Error: {response.status_code} - {error_detail}")
+            raise LLMProviderError.from_status(
+                f"API Error: {response.status_code} - {error_detail}", "openai", response.status_code, response.headers
+            )
+        
+        result = response.json()
+        output_text = _extract_output_text(result)
+        status = result.get("status")
+        incomplete_reason = (result.get("incomplete_details") or {}).get("reason")
+        
+        if output_text:
+            return output_text
+        
+        # 出力がトークン上限により途切れた場合は、1度だけ上限を増やして再試行
+        if (
+            attempt == 0
+            and status == "incomplete"
+            and incomplete_reason == "max_output_tokens"
+        ):
+            logger.info(
+                f"Responses API output was truncated (max_output_tokens={current_max_tokens}). Retrying with a higher limit."
+            )
+            current_max_tokens = min(current_max_tokens * 2, 8192)
+            continue
+        
+        logger.warning(f"No output_text in response: {result}")
+        return str(result)
     
     return ""
 
@@ -187,7 +270,7 @@ async def _call_chat_completions_api(
     model: str,
     max_tokens: int,
     temperature: float,
-    timeout: int
+    timeout: httpx.Timeout
 ) -> str:
     """Chat Completions API を呼び出す"""
     logger.info(f"Calling Chat Completions API with model: {model}")
@@ -210,7 +293,9 @@ async def _call_chat_completions_api(
     if response.status_code != 200:
         error_detail = response.text
         logger.error(f"Chat Completions API Error: {response.status_code} - {error_detail}")
-        raise Exception(f"API Error: {response.status_code} - {error_detail}")
+        raise LLMProviderError.from_status(
+            f"API Error: {response.status_code} - {error_detail}", "openai", response.status_code, response.headers
+        )
     
     result = response.json()
     return result["choices"][0]["message"]["content"]
@@ -2,17 +2,19 @@
 import json
 import re
 import mimetypes
-import httpx
 import aiofiles
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Tuple, Union
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.models import Project, Task, TaskTrigger, RoleGroup, Credential
+from app.models import Project, Task, TaskTrigger, RoleGroup, Credential, TaskDependency
 from app.services.credential_manager import credential_manager
 from app.services.encryption import encryption_service
-from app.services.anthropic_client import call_anthropic_api, DEFAULT_MODEL as DEFAULT_CHAT_MODEL, get_available_models
+from app.services.http_clients import http_clients
+from app.services.task_dependencies import get_dependency_map
+from app.services.anthropic_client import DEFAULT_MODEL as DEFAULT_CHAT_MODEL, build_system_blocks, get_available_models
+from app.services.llm_gateway import llm_gateway, get_llm_credentials, DeltaHandler
 from app.utils.logger import logger
 
 UPLOAD_DIR = Path("uploads")
@@ -43,6 +45,345 @@ API_KEY_PATTERNS = {
 }
 
 
+# チャットのシステムプロンプトの固定部分
+# プロジェクト・タスクごとの情報はこの後ろに別ブロックで付けるため、
+# Anthropic のプロンプトキャッシュで毎ターン再利用される
+PROJECT_CHAT_SYSTEM_PROMPT = """あなたはプロジェクトの自動化ワークフローを管理・改善するAIアシスタントです。初心者にも伝わるように、短くやさしい言葉で説明してください。専門用語はできるだけ避け、出す場合はかんたんな言い換えも添えてください。
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【APIキーの自動登録機能】
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+ユーザーがチャットでAPIキーを送信すると、自動的に認証情報として保存されます。
+対応するパターン：
+- OpenAI: sk-で始まる文字列
+- Anthropic: sk-ant-で始まる文字列
+- Google: AIzaで始まる文字列
+
+登録済みの認証情報を確認し、不足がある場合は積極的にAPIキーの提供を促してください。
+例：「OpenAI APIキーが必要です。sk-で始まるキーをこのチャットに貼り付けてください。自動的に安全に保存されます。」
+
+このプロジェクトには既に自動化タスクが設定されています。
+あなたの役割は：
+- 既存フローの説明
+- ユーザーの要望に応じた改善・拡張
+- 新しいタスクの追加
+- 不足しているAPIキーの確認と登録の促進
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【重要】新しいタスクを追加する場合
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+新しいタスクを作成する際は、必ず以下を確認してください：
+
+1. 具体的な作業内容（何をどこで行うか）
+2. 必要な認証情報が登録されているか
+3. ユーザーの明示的な許可
+
+勝手にタスクを作成しないでください。
+
+【あなたの役割】
+
+1. ワークフローの説明
+   - タスク同士がどう連携しているか
+   - トリガーや依存関係の流れ
+   - 自動化で節約できる時間
+
+2. タスクの編集
+   変更が必要な場合、以下のJSON形式で出力：
+
+```json
+{
+    "actions": [
+        {
+            "type": "update_task",
+            "task_id": タスクID,
+            "changes": {
+                "name": "新しい名前",
+                "description": "新しい説明",
+                "task_prompt": "新しい指示（具体的なステップを含める）",
+                "schedule": "新しいスケジュール",
+                "is_active": true/false,
+                "role_group": "新しい役割グループ名"
+            }
+        },
+        {
+            "type": "create_task",
+            "data": {
+                "name": "タスク名（具体的に）",
+                "description": "このタスクが何をするかの説明",
+                "task_prompt": "AIエージェントへの詳細な指示（ステップバイステップで具体的に）",
+                "role_group": "役割グループ名",
+                "schedule": "スケジュール（cron形式）",
+                "execution_location": "server または local"
+            }
+        },
+        {
+            "type": "delete_task",
+            "task_id": タスクID
+        },
+        {
+            "type": "create_trigger",
+            "task_id": タスクID,
+            "trigger": {
+                "trigger_type": "time" or "dependency",
+                "trigger_time": "HH:MM",
+                "trigger_days": ["mon", "tue", ...],
+                "depends_on_task_id": 前提タスクID,
+                "trigger_on_status": "completed" or "failed" or "any",
+                "delay_minutes": 遅延分
+            }
+        },
+        {
+            "type": "create_role_group",
+            "data": {
+                "name": "グループ名",
+                "description": "説明",
+                "color": "#hex色"
+            }
+        }
+    ]
+}
+```
+
+【task_promptの書き方】
+task_promptは具体的なステップを含めてください：
+- 「〜にアクセスする」→「https://example.com にアクセスする」
+- 「データを取得する」→「画面上部の『レポート』ボタンをクリックし、表示されたCSVをダウンロードする」
+
+3. 質問への回答と改善提案
+   - ワークフローに関する質問に答える
+   - より効率的な自動化方法を提案
+   - 問題点を指摘し改善策を提示
+
+【重要: 出力フォーマット（必ず守ること）】
+
+★★★ 絶対ルール ★★★
+1. 番号リスト「1) 2) 3)」や「1. 2. 3.」は絶対に使わない
+2. 各セクションは絵文字見出しで始める（📌 📂 💬 🔑 🖥️ 📊 ✅ ❓）
+3. セクション間は必ず空行を2行入れる
+4. 箇条書きの各項目も1行ずつ空ける
+5. #や---、**太字**は使わない
+
+★★★ 正しい出力形式 ★★★
+
+📌 スコープ確認
+
+最初に自動化したい範囲を教えてください。
+
+例: Agent1〜3の承認フローまで先行、投稿系は後回し など
+
+
+📂 Google Drive
+
+フォルダID（01_Artworks, 02_Videos）は取得済みですか？
+
+認証方式はOAuthとサービスアカウントのどちらを使いますか？
+
+
+💬 LINE Messaging API
+
+チャネルアクセストークンはありますか？
+
+通知先のユーザーID/グループIDは決まっていますか？
+
+
+★★★ 禁止例（こう書いてはいけない）★★★
+× 1) Google Drive監視フォルダID
+× 2) 実行頻度
+× 1. まず〜してください
+× - 項目1 - 項目2（空行なしで連続）
+
+上記ルールに従い、日本語でやさしく回答してください。"""
+
+WIZARD_CHAT_SYSTEM_PROMPT = """あなたはプロジェクトの自動化フローを作成するAIアシスタントです。
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【APIキーの自動登録機能】
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+ユーザーがチャットでAPIキーを送信すると、自動的に認証情報として保存されます。
+対応するパターン：
+- OpenAI: sk-で始まる文字列
+- Anthropic: sk-ant-で始まる文字列
+- Google: AIzaで始まる文字列
+
+登録済みの認証情報に「OpenAI」「Anthropic」がない場合は、最初にAPIキーを尋ねてください。
+例：「自動化を実行するにはOpenAI APIキーが必要です。sk-で始まるキーをこのチャットに貼り付けてください。自動的に安全に保存されます。」
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【最重要ルール】絶対にタスクを勝手に作成しないでください
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+以下の情報が全て揃うまで、JSONアクションを出力してはいけません：
+
+1. 自動化の目的と具体的な作業内容
+2. 対象サービス・サイト（URL、サービス名など）
+3. 実行頻度（毎日、毎週、手動など）
+4. 必要な認証情報の確認（下記参照）
+5. ユーザーからの明示的な作成許可（「作成して」「お願い」など）
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【認証情報の確認】APIキーを積極的に尋ねてください
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+タスク実行には認証情報が必要です。不足している場合は積極的にチャットで尋ねてください：
+
+■ AIエージェント実行の場合（必須）：
+  - OpenAI APIキー（sk-で始まる）またはAnthropic APIキー（sk-ant-で始まる）
+  - 「APIキーをこのチャットに貼り付けてください」と案内
+  
+■ Web操作（ログインが必要なサイト）の場合：
+  - サイトのログイン情報は「認証情報」画面から登録が必要と案内
+
+■ デスクトップ操作の場合：
+  - OAGI APIキーが必要と案内
+
+登録済みの認証情報は下記「対象プロジェクト」の「登録済みの認証情報」で確認できます。
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【会話の進め方】このステップを必ず踏んでください
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+STEP 1: ヒアリング（最低3回のやり取り）
+- 何を自動化したいですか？
+- どのサービス・サイトを使いますか？（具体的なURL）
+- どのくらいの頻度で実行しますか？
+- 現在どのように作業していますか？
+
+STEP 2: 認証情報の確認
+- 必要なAPIキーは登録されていますか？
+- サイトログイン情報は登録されていますか？
+- 不足があれば登録方法を案内
+
+STEP 3: 全体像の説明
+- 「以下のタスクを作成します」と説明
+- 各タスクの役割を説明
+- 作成するタスク数を明示
+
+STEP 4: 作成許可の確認
+- 「この内容で作成してよろしいですか？」と必ず確認
+- ユーザーが明示的に許可するまで待つ
+
+STEP 5: タスク作成（許可後のみ）
+- 1つずつ作成
+- 作成後「次に進みますか？」と確認
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【task_promptの書き方】具体的に書いてください
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+task_prompt（AIエージェントへの指示）は以下を含む詳細なものにしてください：
+
+良い例：
+「Chromeブラウザを開いて https://example.com にアクセスする。
+ログイン画面が表示されたら、登録済みの認証情報を使ってログインする。
+ダッシュボードから「レポート」→「日次レポート」をクリック。
+表示されたデータをコピーして、Googleスプレッドシートに貼り付ける。
+スプレッドシートのURLは https://docs.google.com/... 」
+
+悪い例：
+「サイトからデータを取得する」（具体性がない）
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【Webリサーチが必要な場合】
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+```json
+{"web_search": {"query": "検索クエリ", "reason": "調べる理由"}}
+```
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【タスク作成時のJSON形式】許可を得てから出力
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+```json
+{
+    "actions": [
+        {
+            "type": "create_task",
+            "data": {
+                "name": "タスク名（具体的に）",
+                "description": "このタスクが何をするかの説明",
+                "task_prompt": "AIエージェントへの詳細な指示（ステップバイステップで）",
+                "role_group": "役割グループ名",
+                "schedule": "cron形式（例: 0 9 * * * = 毎日9時）または空文字",
+                "execution_location": "server（Web操作）または local（デスクトップ操作）"
+            }
+        }
+    ],
+    "creating_info": {
+        "current": 1,
+        "total": 3,
+        "task_name": "作成中のタスク名"
+    }
+}
+```
+
+【文章スタイル】
+- 絵文字は使わない
+- 見出し記号（#や---）は使わない
+- 箇条書きはシンプルに
+- 日本語で回答
+- 丁寧だが堅苦しくない"""
+
+TASK_CHAT_SYSTEM_PROMPT = """あなたはタスクの自動化ロジックを調整するアシスタントです。
+
+このタスクはユーザーの作業を自動化するために存在します。
+あなたの役割：
+- タスクの動作を説明する
+- ユーザーの要望に応じて設定を調整する
+- より効率的な方法を提案する
+
+【あなたの役割】
+
+1. タスクの説明
+   - 何を自動化しているか
+   - 指示内容の解説
+   - 実行フローの説明
+
+2. 調整の支援
+   変更が必要な場合、以下のJSON形式で出力（task_id は下記「対象タスク」のタスクID）：
+
+```json
+{
+    "actions": [
+        {
+            "type": "update_task",
+            "task_id": タスクID,
+            "changes": {
+                "name": "新しい名前",
+                "description": "新しい説明",
+                "task_prompt": "新しい指示",
+                "schedule": "新しいスケジュール",
+                "is_active": true/false
+            }
+        },
+        {
+            "type": "create_trigger",
+            "task_id": タスクID,
+            "trigger": {
+                "trigger_type": "time or dependency",
+                "trigger_time": "HH:MM",
+                "trigger_days": ["mon", "tue"],
+                "depends_on_task_id": 前提タスクID,
+                "trigger_on_status": "completed",
+                "delay_minutes": 0
+            }
+        }
+    ]
+}
+```
+
+3. 改善提案
+   - 指示内容の曖昧な部分を指摘
+   - より効率的な方法を提案
+
+【文章スタイル】
+- 絵文字は使わない
+- 見出し記号（#や---）は使わない
+- 箇条書きはシンプルに
+- 日本語で回答"""
+
+
 class ProjectChatService:
     """AIによるプロジェクト全体のタスク管理チャット"""
     
@@ -242,7 +583,7 @@ class ProjectChatService:
                 # OpenAIキーがなければスキップ
                 return {"reviewed": False, "reason": "OpenAI APIキーがないためレビューをスキップ"}
             
-            api_key = cred["data"].get("api_key")
+            credentials = [("openai", cred["data"].get("api_key"))]
             
             review_prompt = f"""以下のタスク指示内容をレビューしてください。
 
@@ -268,9 +609,9 @@ JSON形式で回答（説明は不要）:
 }}
 ```"""
 
-            # 統一されたOpenAI APIクライアントを使用
-            response_text = await call_anthropic_api(
-                api_key=api_key,
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
+            response_text = await llm_gateway.complete(
+                credentials,
                 messages=[{"role": "user", "content": review_prompt}],
                 model=DEFAULT_CHAT_MODEL,
                 max_tokens=1000,
@@ -293,11 +634,19 @@ JSON形式で回答（説明は不要）:
             logger.warning(f"task_promptレビューエラー: {e}")
             return {"reviewed": False, "reason": str(e)}
     
-    def _build_project_context(self, project: Project, tasks: List[Task], role_groups: List[RoleGroup], triggers: List[TaskTrigger]) -> str:
-        """プロジェクトのコンテキストを構築"""
+    def _build_project_context(
+        self,
+        project: Project,
+        tasks: List[Task],
+        role_groups: List[RoleGroup],
+        triggers: List[TaskTrigger],
+        dependencies: Dict[int, List[int]]
+    ) -> str:
+        """プロジェクトのコンテキストを構築（dependencies はタスクIDごとの依存先IDのリスト）"""
         
-        # 役割グループをマップ化
+        # 役割グループとタスクをマップ化
         group_map = {g.id: g.name for g in role_groups}
+        task_map = {t.id: t for t in tasks}
         
         # タスクをグループごとに整理
         tasks_by_group = {}
@@ -309,13 +658,8 @@ JSON形式で回答（説明は不要）:
             # タスクのトリガーを取得
             task_triggers = [t for t in triggers if t.task_id == task.id]
             
-            # 依存関係を解析
-            deps = json.loads(task.dependencies or "[]")
-            dep_names = []
-            for dep_id in deps:
-                dep_task = next((t for t in tasks if t.id == dep_id), None)
-                if dep_task:
-                    dep_names.append(dep_task.name)
+            # 依存タスク名
+            dep_names = [task_map[dep_id].name for dep_id in dependencies.get(task.id, []) if dep_id in task_map]
             
             tasks_by_group[group_name].append({
                 "id": task.id,
@@ -375,17 +719,19 @@ JSON形式で回答（説明は不要）:
         
         return context
     
-    def _build_workflow_explanation(self, tasks: List[Task], triggers: List[TaskTrigger]) -> str:
-        """ワークフローの説明を構築"""
+    def _build_workflow_explanation(
+        self,
+        tasks: List[Task],
+        triggers: List[TaskTrigger],
+        dependencies: Dict[int, List[int]]
+    ) -> str:
+        """ワークフローの説明を構築（dependencies はタスクIDごとの依存先IDのリスト）"""
         
         # タスクのマップ
         task_map = {t.id: t for t in tasks}
         
-        # 依存関係グラフを構築
-        dependencies = {}
-        for task in tasks:
-            deps = json.loads(task.dependencies or "[]")
-            dependencies[task.id] = deps
+        # 依存関係グラフを構築（呼び出し元の dict は変更しない）
+        dependencies = {task_id: list(dep_ids) for task_id, dep_ids in dependencies.items()}
         
         # トリガーベースの依存関係も追加
         for trigger in triggers:
@@ -428,236 +774,92 @@ JSON形式で回答（説明は不要）:
         user_message: str,
         chat_history: List[Dict] = None,
         user_id: str = None,
-        model: str = None
+        model: str = None,
+        on_delta: Optional[DeltaHandler] = None
     ) -> dict:
-        """プロジェクトのコンテキストを理解したチャット"""
+        """プロジェクトのコンテキストを理解したチャット（on_delta を渡すと応答をストリーミングで受け取れる）"""
         try:
             # APIキーの検出と保存
             saved_keys = self._detect_and_save_api_keys(db, user_message, user_id)
             saved_keys_message = ""
             if saved_keys:
                 key_names = [k['service'].upper() for k in saved_keys]
-                saved_keys_message = f"\n\n以下のAPIキーを認証情報に保存しました：\n- " + "\n- ".join(key_names) + "\n\n次回以降は自動的にこのキーが使用されます。"
-            
-            # プロジェクトとタスクを取得
-            project = db.query(Project).filter(Project.id == project_id).first()
-            if not project:
-                raise ValueError("プロジェクトが見つかりません")
-            
-            tasks = db.query(Task).filter(Task.project_id == project_id).all()
-            role_groups = db.query(RoleGroup).filter(RoleGroup.project_id == project_id).all()
-            
-            # 全タスクのトリガーを取得
-            task_ids = [t.id for t in tasks]
-            triggers = db.query(TaskTrigger).filter(TaskTrigger.task_id.in_(task_ids)).all() if task_ids else []
-            
-            # コンテキストを構築
-            project_context = self._build_project_context(project, tasks, role_groups, triggers)
-            workflow_explanation = self._build_workflow_explanation(tasks, triggers)
-            
-            # チャット履歴を初期化または取得
-            if chat_history is None:
-                chat_history = []
-            
-            # APIキーが保存された場合、メッセージを追加
-            display_message = user_message
-            if saved_keys:
-                # APIキーをマスクして表示
-                for key_info in saved_keys:
-                    pattern = API_KEY_PATTERNS.get(key_info['service'], {}).get('pattern', '')
-                    if pattern:
-                        display_message = re.sub(pattern, lambda m: self._mask_api_key(m.group(1)), display_message)
-            
-            # ユーザーメッセージを追加
-            chat_history.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            # Anthropic APIキーを優先、なければOpenAI
-            cred = credential_manager.get_default(db, "api_key", "anthropic")
-            if not cred:
-                cred = credential_manager.get_default(db, "api_key", "openai")
-            if not cred:
-                raise ValueError("Anthropic または OpenAI APIキーが設定されていません。設定画面からAPIキーを追加してください。")
-            
-            api_key = cred["data"].get("api_key")
-            
-            # 登録済み認証情報を取得
-            all_credentials = db.query(Credential).all()
-            credential_context = "\n## 登録済みの認証情報:\n"
-            if all_credentials:
-                for cred in all_credentials:
-                    credential_context += f"- {cred.service_name}: {cred.name} ({'デフォルト' if cred.is_default else ''})\n"
-            else:
-                credential_context += "- なし（認証情報が未登録です）\n"
-            
-            system_prompt = f"""あなたはプロジェクト「{project.name}」の自動化ワークフローを管理・改善するAIアシスタントです。初心者にも伝わるように、短くやさしい言葉で説明してください。専門用語はできるだけ避け、出す場合はかんたんな言い換えも添えてください。
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【APIキーの自動登録機能】
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-ユーザーがチャットでAPIキーを送信すると、自動的に認証情報として保存されます。
-対応するパターン：
-- OpenAI: sk-で始まる文字列
-- Anthropic: sk-ant-で始まる文字列
-- Google: AIzaで始まる文字列
-
-登録済みの認証情報を確認し、不足がある場合は積極的にAPIキーの提供を促してください。
-例：「OpenAI APIキーが必要です。sk-で始まるキーをこのチャットに貼り付けてください。自動的に安全に保存されます。」
-
-このプロジェクトには既に自動化タスクが設定されています。
-あなたの役割は：
-- 既存フローの説明
-- ユーザーの要望に応じた改善・拡張
-- 新しいタスクの追加
-- 不足しているAPIキーの確認と登録の促進
-
-{project_context}
-
-{workflow_explanation}
-
-{credential_context}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【重要】新しいタスクを追加する場合
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-新しいタスクを作成する際は、必ず以下を確認してください：
-
-1. 具体的な作業内容（何をどこで行うか）
-2. 必要な認証情報が登録されているか
-3. ユーザーの明示的な許可
-
-勝手にタスクを作成しないでください。
-
-【あなたの役割】
-
-1. ワークフローの説明
-   - タスク同士がどう連携しているか
-   - トリガーや依存関係の流れ
-   - 自動化で節約できる時間
-
-2. タスクの編集
-   変更が必要な場合、以下のJSON形式で出力：
-
-```json
-{{
-    "actions": [
-        {{
-            "type": "update_task",
-            "task_id": タスクID,
-            "changes": {{
-                "name": "新しい名前",
-                "description": "新しい説明",
-                "task_prompt": "新しい指示（具体的なステップを含める）",
-                "schedule": "新しいスケジュール",
-                "is_active": true/false,
-                "role_group": "新しい役割グループ名"
-            }}
-        }},
-        {{
-            "type": "create_task",
-            "data": {{
-                "name": "タスク名（具体的に）",
-                "description": "このタスクが何をするかの説明",
-                "task_prompt": "AIエージェントへの詳細な指示（ステップバイステップで具体的に）",
-                "role_group": "役割グループ名",
-                "schedule": "スケジュール（cron形式）",
-                "execution_location": "server または local"
-            }}
-        }},
-        {{
-            "type": "delete_task",
-            "task_id": タスクID
-        }},
-        {{
-            "type": "create_trigger",
-            "task_id": タスクID,
-            "trigger": {{
-                "trigger_type": "time" or "dependency",
-                "trigger_time": "HH:MM",
-                "trigger_days": ["mon", "tue", ...],
-                "depends_on_task_id": 前提タスクID,
-                "trigger_on_status": "completed" or "failed" or "any",
-                "delay_minutes": 遅延分
-            }}
-        }},
-        {{
-            "type": "create_role_group",
-            "data": {{
-                "name": "グループ名",
-                "description": "説明",
-                "color": "#hex色"
-            }}
-        }}
-    ]
-}}
-```
-
-【task_promptの書き方】
-task_promptは具体的なステップを含めてください：
-- 「〜にアクセスする」→「https://example.com にアクセスする」
-- 「データを取得する」→「画面上部の『レポート』ボタンをクリックし、表示されたCSVをダウンロードする」
-
-3. 質問への回答と改善提案
-   - ワークフローに関する質問に答える
-   - より効率的な自動化方法を提案
-   - 問題点を指摘し改善策を提示
-
-【重要: 出力フォーマット（必ず守ること）】
-
-★★★ 絶対ルール ★★★
-1. 番号リスト「1) 2) 3)」や「1. 2. 3.」は絶対に使わない
-2. 各セクションは絵文字見出しで始める（📌 📂 💬 🔑 🖥️ 📊 ✅ ❓）
-3. セクション間は必ず空行を2行入れる
-4. 箇条書きの各項目も1行ずつ空ける
-5. #や---、**太字**は使わない
-
-★★★ 正しい出力形式 ★★★
-
-📌 スコープ確認
-
-最初に自動化したい範囲を教えてください。
-
-例: Agent1〜3の承認フローまで先行、投稿系は後回し など
-
-
-📂 Google Drive
-
-フォルダID（01_Artworks, 02_Videos）は取得済みですか？
-
-認証方式はOAuthとサービスアカウントのどちらを使いますか？
-
-
-💬 LINE Messaging API
-
-チャネルアクセストークンはありますか？
-
-通知先のユーザーID/グループIDは決まっていますか？
+                saved_keys_message = f"\n\n以下のAPIキーを認証情報に保存しました：\n- " + "\n- ".join(key_names) + "\n\n次回以降は自動的にこのキーが使用されます。"
+            
+            # プロジェクトとタスクを取得
+            project = db.query(Project).filter(Project.id == project_id).first()
+            if not project:
+                raise ValueError("プロジェクトが見つかりません")
+            
+            tasks = db.query(Task).filter(Task.project_id == project_id).all()
+            role_groups = db.query(RoleGroup).filter(RoleGroup.project_id == project_id).all()
+            
+            # 全タスクのトリガーを取得
+            task_ids = [t.id for t in tasks]
+            triggers = db.query(TaskTrigger).filter(TaskTrigger.task_id.in_(task_ids)).all() if task_ids else []
+            
+            # コンテキストを構築
+            dependencies = get_dependency_map(db, task_ids)
+            project_context = self._build_project_context(project, tasks, role_groups, triggers, dependencies)
+            workflow_explanation = self._build_workflow_explanation(tasks, triggers, dependencies)
+            
+            # チャット履歴を初期化または取得
+            if chat_history is None:
+                chat_history = []
+            
+            # APIキーが保存された場合、メッセージを追加
+            display_message = user_message
+            if saved_keys:
+                # APIキーをマスクして表示
+                for key_info in saved_keys:
+                    pattern = API_KEY_PATTERNS.get(key_info['service'], {}).get('pattern', '')
+                    if pattern:
+                        display_message = re.sub(pattern, lambda m: self._mask_api_key(m.group(1)), display_message)
+            
+            # ユーザーメッセージを追加
+            chat_history.append({
+                "role": "user",
+                "content": user_message
+            })
+            
+            # Anthropic APIキーを優先、なければOpenAI
+            credentials = get_llm_credentials(db)
+            if not credentials:
+                raise ValueError("Anthropic または OpenAI APIキーが設定されていません。設定画面からAPIキーを追加してください。")
+            
+            # 登録済み認証情報を取得
+            all_credentials = db.query(Credential).all()
+            credential_context = "\n## 登録済みの認証情報:\n"
+            if all_credentials:
+                for cred in all_credentials:
+                    credential_context += f"- {cred.service_name}: {cred.name} ({'デフォルト' if cred.is_default else ''})\n"
+            else:
+                credential_context += "- なし（認証情報が未登録です）\n"
+            
+            context_prompt = f"""━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【対象プロジェクト】{project.name}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
+{project_context}
 
-★★★ 禁止例（こう書いてはいけない）★★★
-× 1) Google Drive監視フォルダID
-× 2) 実行頻度
-× 1. まず〜してください
-× - 項目1 - 項目2（空行なしで連続）
+{workflow_explanation}
 
-上記ルールに従い、日本語でやさしく回答してください。"""
+{credential_context}"""
 
-            # メッセージを構築
-            messages = [{"role": "system", "content": system_prompt}]
-            messages.extend([{"role": msg["role"], "content": msg["content"]} for msg in chat_history])
+            # 固定部分とプロジェクトごとの情報の末尾をキャッシュの区切りにする
+            system_prompt = build_system_blocks(PROJECT_CHAT_SYSTEM_PROMPT, context_prompt)
+            messages = [{"role": msg["role"], "content": msg["content"]} for msg in chat_history]
             
-            # 統一されたOpenAI APIクライアントを使用
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
             use_model = model or DEFAULT_CHAT_MODEL
-            assistant_message = await call_anthropic_api(
-                api_key=api_key,
+            assistant_message = await llm_gateway.complete(
+                credentials,
                 messages=messages,
+                system_prompt=system_prompt,
                 model=use_model,
                 max_tokens=2048,
-                timeout=120
+                timeout=120,
+                on_delta=on_delta
             )
             
             # アシスタントメッセージを追加
@@ -920,14 +1122,10 @@ task_promptは具体的なステップを含めてください：
                 raise ValueError("タスクが見つかりません")
             
             # Anthropic APIキーを優先、なければOpenAI
-            cred = credential_manager.get_default(db, "api_key", "anthropic")
-            if not cred:
-                cred = credential_manager.get_default(db, "api_key", "openai")
-            if not cred:
+            credentials = get_llm_credentials(db)
+            if not credentials:
                 raise ValueError("Anthropic または OpenAI APIキーが設定されていません。設定画面からAPIキーを追加してください。")
             
-            api_key = cred["data"].get("api_key")
-            
             # ログを整形
             logs_text = "\n".join(logs[:20]) if logs else "ログが取得できませんでした"
             
@@ -1010,8 +1208,8 @@ auto_fixable が true の場合、ユーザーが承認すれば自動的に修
 user_info_needed には、ユーザーが設定する必要がある環境変数や認証情報の情報を含めてください。"""
 
             use_model = model or DEFAULT_CHAT_MODEL
-            response_text = await call_anthropic_api(
-                api_key=api_key,
+            response_text = await llm_gateway.complete(
+                credentials,
                 messages=[{"role": "user", "content": prompt}],
                 model=use_model,
                 max_tokens=2048,
@@ -1074,8 +1272,9 @@ user_info_needed には、ユーザーが設定する必要がある環境変数
             task_ids = [t.id for t in tasks]
             triggers = db.query(TaskTrigger).filter(TaskTrigger.task_id.in_(task_ids)).all() if task_ids else []
             
-            context = self._build_project_context(project, tasks, role_groups, triggers)
-            workflow = self._build_workflow_explanation(tasks, triggers)
+            dependencies = get_dependency_map(db, task_ids)
+            context = self._build_project_context(project, tasks, role_groups, triggers, dependencies)
+            workflow = self._build_workflow_explanation(tasks, triggers, dependencies)
             
             # OpenAI APIキーを取得
             cred = credential_manager.get_default(db, "api_key", "openai")
@@ -1086,7 +1285,7 @@ user_info_needed には、ユーザーが設定する必要がある環境変数
                     "has_ai_analysis": False
                 }
             
-            api_key = cred["data"].get("api_key")
+            credentials = [("openai", cred["data"].get("api_key"))]
             
             prompt = f"""以下のプロジェクトのワークフローを、分かりやすく説明してください。
 各タスクがどのように連携しているか、全体の流れを説明してください。
@@ -1103,9 +1302,9 @@ user_info_needed には、ユーザーが設定する必要がある環境変数
 
 日本語で、絵文字を使って親しみやすく説明してください。"""
 
-            # 統一されたOpenAI APIクライアントを使用
-            explanation = await call_anthropic_api(
-                api_key=api_key,
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
+            explanation = await llm_gateway.complete(
+                credentials,
                 messages=[{"role": "user", "content": prompt}],
                 model=DEFAULT_CHAT_MODEL,
                 max_tokens=1500,
@@ -1137,39 +1336,39 @@ user_info_needed には、ユーザーが設定する必要がある環境変数
             
             if cred:
                 api_key = cred["data"].get("api_key")
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        "https://google.serper.dev/search",
-                        headers={
-                            "X-API-KEY": api_key,
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "q": query,
-                            "num": num_results
-                        },
-                        timeout=30
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        results = []
-                        for item in data.get("organic", [])[:num_results]:
-                            results.append({
-                                "title": item.get("title"),
-                                "url": item.get("link"),
-                                "snippet": item.get("snippet")
-                            })
-                        return {"success": True, "results": results, "source": "serper"}
+                client = http_clients.get("serper")
+                response = await client.post(
+                    "https://google.serper.dev/search",
+                    headers={
+                        "X-API-KEY": api_key,
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "q": query,
+                        "num": num_results
+                    },
+                    timeout=30
+                )
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    results = []
+                    for item in data.get("organic", [])[:num_results]:
+                        results.append({
+                            "title": item.get("title"),
+                            "url": item.get("link"),
+                            "snippet": item.get("snippet")
+                        })
+                    return {"success": True, "results": results, "source": "serper"}
             
             # Serper APIがない場合、OpenAIのBrowsing機能を使用
             cred = credential_manager.get_default(db, "api_key", "openai")
             if not cred:
                 return {"success": False, "error": "検索APIキーが設定されていません"}
             
-            api_key = cred["data"].get("api_key")
+            credentials = [("openai", cred["data"].get("api_key"))]
             
-            # 統一されたOpenAI APIクライアントを使用
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
             messages = [
                 {
                     "role": "system",
@@ -1181,8 +1380,8 @@ user_info_needed には、ユーザーが設定する必要がある環境変数
                 }
             ]
             
-            response_text = await call_anthropic_api(
-                api_key=api_key,
+            response_text = await llm_gateway.complete(
+                credentials,
                 messages=messages,
                 model=DEFAULT_CHAT_MODEL,
                 max_tokens=1500,
@@ -1399,9 +1598,10 @@ JSON形式で回答してください：
         video_analysis: Dict = None,
         web_research: Any = None,  # list または dict を許容
         user_id: str = None,
-        model: str = None
+        model: str = None,
+        on_delta: Optional[DeltaHandler] = None
     ) -> dict:
-        """空のプロジェクトでワークフローを構築するためのウィザードチャット"""
+        """空のプロジェクトでワークフローを構築するためのウィザードチャット（on_delta を渡すと応答をストリーミングで受け取れる）"""
         try:
             # APIキーの検出と保存
             saved_keys = self._detect_and_save_api_keys(db, user_message, user_id)
@@ -1424,14 +1624,10 @@ JSON形式で回答してください：
             chat_history.append({"role": "user", "content": user_message})
             
             # Anthropic APIキーを優先、なければOpenAI
-            cred = credential_manager.get_default(db, "api_key", "anthropic")
-            if not cred:
-                cred = credential_manager.get_default(db, "api_key", "openai")
-            if not cred:
+            credentials = get_llm_credentials(db)
+            if not credentials:
                 raise ValueError("Anthropic または OpenAI APIキーが設定されていません。設定画面からAPIキーを追加してください。")
             
-            api_key = cred["data"].get("api_key")
-            
             # コンテキストを構築
             additional_context = ""
             if video_analysis:
@@ -1458,150 +1654,26 @@ JSON形式で回答してください：
             else:
                 credential_context += "- なし（認証情報が未登録です）\n"
             
-            system_prompt = f"""あなたはプロジェクト「{project.name}」の自動化フローを作成するAIアシスタントです。
-
+            context_prompt = f"""━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【対象プロジェクト】{project.name}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 {existing_context}
-{credential_context}
-{additional_context}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【APIキーの自動登録機能】
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-ユーザーがチャットでAPIキーを送信すると、自動的に認証情報として保存されます。
-対応するパターン：
-- OpenAI: sk-で始まる文字列
-- Anthropic: sk-ant-で始まる文字列
-- Google: AIzaで始まる文字列
-
-登録済みの認証情報に「OpenAI」「Anthropic」がない場合は、最初にAPIキーを尋ねてください。
-例：「自動化を実行するにはOpenAI APIキーが必要です。sk-で始まるキーをこのチャットに貼り付けてください。自動的に安全に保存されます。」
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【最重要ルール】絶対にタスクを勝手に作成しないでください
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-以下の情報が全て揃うまで、JSONアクションを出力してはいけません：
-
-1. 自動化の目的と具体的な作業内容
-2. 対象サービス・サイト（URL、サービス名など）
-3. 実行頻度（毎日、毎週、手動など）
-4. 必要な認証情報の確認（下記参照）
-5. ユーザーからの明示的な作成許可（「作成して」「お願い」など）
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【認証情報の確認】APIキーを積極的に尋ねてください
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-タスク実行には認証情報が必要です。不足している場合は積極的にチャットで尋ねてください：
-
-■ AIエージェント実行の場合（必須）：
-  - OpenAI APIキー（sk-で始まる）またはAnthropic APIキー（sk-ant-で始まる）
-  - 「APIキーをこのチャットに貼り付けてください」と案内
-  
-■ Web操作（ログインが必要なサイト）の場合：
-  - サイトのログイン情報は「認証情報」画面から登録が必要と案内
-
-■ デスクトップ操作の場合：
-  - OAGI APIキーが必要と案内
-
-登録済みの認証情報は上記「登録済みの認証情報」セクションで確認できます。
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【会話の進め方】このステップを必ず踏んでください
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-STEP 1: ヒアリング（最低3回のやり取り）
-- 何を自動化したいですか？
-- どのサービス・サイトを使いますか？（具体的なURL）
-- どのくらいの頻度で実行しますか？
-- 現在どのように作業していますか？
+{credential_context}"""
 
-STEP 2: 認証情報の確認
-- 必要なAPIキーは登録されていますか？
-- サイトログイン情報は登録されていますか？
-- 不足があれば登録方法を案内
-
-STEP 3: 全体像の説明
-- 「以下のタスクを作成します」と説明
-- 各タスクの役割を説明
-- 作成するタスク数を明示
-
-STEP 4: 作成許可の確認
-- 「この内容で作成してよろしいですか？」と必ず確認
-- ユーザーが明示的に許可するまで待つ
-
-STEP 5: タスク作成（許可後のみ）
-- 1つずつ作成
-- 作成後「次に進みますか？」と確認
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【task_promptの書き方】具体的に書いてください
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-task_prompt（AIエージェントへの指示）は以下を含む詳細なものにしてください：
-
-良い例：
-「Chromeブラウザを開いて https://example.com にアクセスする。
-ログイン画面が表示されたら、登録済みの認証情報を使ってログインする。
-ダッシュボードから「レポート」→「日次レポート」をクリック。
-表示されたデータをコピーして、Googleスプレッドシートに貼り付ける。
-スプレッドシートのURLは https://docs.google.com/... 」
-
-悪い例：
-「サイトからデータを取得する」（具体性がない）
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【Webリサーチが必要な場合】
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-```json
-{{"web_search": {{"query": "検索クエリ", "reason": "調べる理由"}}}}
-```
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-【タスク作成時のJSON形式】許可を得てから出力
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-```json
-{{
-    "actions": [
-        {{
-            "type": "create_task",
-            "data": {{
-                "name": "タスク名（具体的に）",
-                "description": "このタスクが何をするかの説明",
-                "task_prompt": "AIエージェントへの詳細な指示（ステップバイステップで）",
-                "role_group": "役割グループ名",
-                "schedule": "cron形式（例: 0 9 * * * = 毎日9時）または空文字",
-                "execution_location": "server（Web操作）または local（デスクトップ操作）"
-            }}
-        }}
-    ],
-    "creating_info": {{
-        "current": 1,
-        "total": 3,
-        "task_name": "作成中のタスク名"
-    }}
-}}
-```
-
-【文章スタイル】
-- 絵文字は使わない
-- 見出し記号（#や---）は使わない
-- 箇条書きはシンプルに
-- 日本語で回答
-- 丁寧だが堅苦しくない"""
-
-            messages = [{"role": "system", "content": system_prompt}]
-            messages.extend([{"role": msg["role"], "content": msg["content"]} for msg in chat_history])
+            # 固定部分とプロジェクトごとの情報の末尾をキャッシュの区切りにする
+            system_prompt = build_system_blocks(WIZARD_CHAT_SYSTEM_PROMPT, context_prompt, tail=additional_context.strip())
+            messages = [{"role": msg["role"], "content": msg["content"]} for msg in chat_history]
             
-            # 統一されたOpenAI APIクライアントを使用
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
             use_model = model or DEFAULT_CHAT_MODEL
-            assistant_message = await call_anthropic_api(
-                api_key=api_key,
+            assistant_message = await llm_gateway.complete(
+                credentials,
                 messages=messages,
+                system_prompt=system_prompt,
                 model=use_model,
                 max_tokens=2500,
-                timeout=120
+                timeout=120,
+                on_delta=on_delta
             )
             
             chat_history.append({"role": "assistant", "content": assistant_message})
@@ -1660,9 +1732,10 @@ task_prompt（AIエージェントへの指示）は以下を含む詳細なも
         user_message: str,
         chat_history: List[Dict] = None,
         user_id: str = None,
-        model: str = None
+        model: str = None,
+        on_delta: Optional[DeltaHandler] = None
     ) -> dict:
-        """個別タスクのロジックを理解したチャット"""
+        """個別タスクのロジックを理解したチャット（on_delta を渡すと応答をストリーミングで受け取れる）"""
         try:
             # APIキーの検出と保存
             saved_keys = self._detect_and_save_api_keys(db, user_message, user_id)
@@ -1679,14 +1752,14 @@ task_prompt（AIエージェントへの指示）は以下を含む詳細なも
             triggers = db.query(TaskTrigger).filter(TaskTrigger.task_id == task_id).all()
             
             # 依存タスクを取得
-            deps = json.loads(task.dependencies or "[]")
-            dep_tasks = db.query(Task).filter(Task.id.in_(deps)).all() if deps else []
+            dep_tasks = db.query(Task).join(
+                TaskDependency, TaskDependency.depends_on_task_id == Task.id
+            ).filter(TaskDependency.task_id == task_id).all()
             
             # このタスクに依存しているタスク
-            dependent_tasks = db.query(Task).filter(
-                Task.project_id == task.project_id
-            ).all()
-            dependents = [t for t in dependent_tasks if task_id in json.loads(t.dependencies or "[]")]
+            dependents = db.query(Task).join(
+                TaskDependency, TaskDependency.task_id == Task.id
+            ).filter(TaskDependency.depends_on_task_id == task_id).all()
             
             if chat_history is None:
                 chat_history = []
@@ -1694,14 +1767,10 @@ task_prompt（AIエージェントへの指示）は以下を含む詳細なも
             chat_history.append({"role": "user", "content": user_message})
             
             # Anthropic APIキーを優先、なければOpenAI
-            cred = credential_manager.get_default(db, "api_key", "anthropic")
-            if not cred:
-                cred = credential_manager.get_default(db, "api_key", "openai")
-            if not cred:
+            credentials = get_llm_credentials(db)
+            if not credentials:
                 raise ValueError("Anthropic または OpenAI APIキーが設定されていません。設定画面からAPIキーを追加してください。")
             
-            api_key = cred["data"].get("api_key")
-            
             # タスクコンテキストを構築
             task_context = f"""【タスク情報】
 - 名前: {task.name}
@@ -1741,77 +1810,26 @@ task_prompt（AIエージェントへの指示）は以下を含む詳細なも
             if not dep_tasks and not dependents:
                 task_context += "- 依存関係なし（独立タスク）\n"
             
-            system_prompt = f"""あなたはタスク「{task.name}」の自動化ロジックを調整するアシスタントです。
-
-このタスクはユーザーの作業を自動化するために存在します。
-あなたの役割：
-- タスクの動作を説明する
-- ユーザーの要望に応じて設定を調整する
-- より効率的な方法を提案する
-
-{task_context}
-
-【あなたの役割】
-
-1. タスクの説明
-   - 何を自動化しているか
-   - 指示内容の解説
-   - 実行フローの説明
-
-2. 調整の支援
-   変更が必要な場合、以下のJSON形式で出力：
-
-```json
-{{
-    "actions": [
-        {{
-            "type": "update_task",
-            "task_id": {task_id},
-            "changes": {{
-                "name": "新しい名前",
-                "description": "新しい説明",
-                "task_prompt": "新しい指示",
-                "schedule": "新しいスケジュール",
-                "is_active": true/false
-            }}
-        }},
-        {{
-            "type": "create_trigger",
-            "task_id": {task_id},
-            "trigger": {{
-                "trigger_type": "time or dependency",
-                "trigger_time": "HH:MM",
-                "trigger_days": ["mon", "tue"],
-                "depends_on_task_id": 前提タスクID,
-                "trigger_on_status": "completed",
-                "delay_minutes": 0
-            }}
-        }}
-    ]
-}}
-```
-
-3. 改善提案
-   - 指示内容の曖昧な部分を指摘
-   - より効率的な方法を提案
+            context_prompt = f"""━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+【対象タスク】{task.name}（タスクID: {task_id}）
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-【文章スタイル】
-- 絵文字は使わない
-- 見出し記号（#や---）は使わない
-- 箇条書きはシンプルに
-- 日本語で回答"""
+{task_context}"""
 
-            messages = [{"role": "system", "content": system_prompt}]
-            messages.extend([{"role": msg["role"], "content": msg["content"]} for msg in chat_history])
+            # 固定部分とタスクごとの情報の末尾をキャッシュの区切りにする
+            system_prompt = build_system_blocks(TASK_CHAT_SYSTEM_PROMPT, context_prompt)
+            messages = [{"role": msg["role"], "content": msg["content"]} for msg in chat_history]
             
-            # 統一されたOpenAI APIクライアントを使用
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
             use_model = model or DEFAULT_CHAT_MODEL
-            assistant_message = await call_anthropic_api(
-                api_key=api_key,
+            assistant_message = await llm_gateway.complete(
+                credentials,
                 messages=messages,
+                system_prompt=system_prompt,
                 model=use_model,
                 max_tokens=2048,
-                timeout=120
+                timeout=120,
+                on_delta=on_delta
             )
             
             chat_history.append({"role": "assistant", "content": assistant_message})
@@ -0,0 +1,149 @@
+"""
+タスクごとの実行結果の要約
+
+Execution が終了状態（完了・失敗・停止）へ遷移したことをセッションのフラッシュ時に検出し、
+同じトランザクション内で Task の要約カラムを更新します。
+- last_run_status / last_run_at: 最後に終了した実行
+- success_rate: 直近 RUN_SUMMARY_WINDOW 件（完了・失敗）の成功率
+- p50_duration_seconds: 直近の完了した実行の所要時間の中央値
+
+直近の結果は Task.recent_runs に保持するため、実行が終わるたびに executions を集計し直す必要はなく、
+ボードやタスク一覧は tasks を読むだけで各タスクの状態を表示できます。
+要約の更新はボードの変更として記録するため、ボードのキャッシュも更新されます。
+
+一括 UPDATE（Query.update 等）でステータスを変更した場合は反映されません。
+既存の実行履歴からの作成はマイグレーション（app/migrations/versions.py）で行います。
+"""
+import json
+from datetime import datetime
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Execution, Task
+from app.services.board_sync import record_board_changes
+
+# 成功率・所要時間の計算に使う直近の実行数
+RUN_SUMMARY_WINDOW = 20
+
+# 要約に反映する終了状態（停止は最終実行として表示するが、成功率には含めない）
+FINISHED_STATUSES = ("completed", "failed", "stopped")
+
+# (タスクID, ステータス, 終了日時, 所要秒数)
+Run = Tuple[int, str, Optional[datetime], Optional[float]]
+
+
+def _track_previous(target, value, oldvalue, initiator):
+    """値はそのまま（active_history を有効にするためだけのリスナー）"""
+    return value
+
+
+def _run_of(execution: Execution) -> Run:
+    finished_at = execution.completed_at or execution.started_at
+    duration = None
+    if execution.started_at and execution.completed_at:
+        duration = max(0.0, (execution.completed_at - execution.started_at).total_seconds())
+    return execution.task_id, execution.status, finished_at, duration
+
+
+def parse_recent_runs(value: Optional[str]) -> List[list]:
+    """Task.recent_runs を [[成功=1/失敗=0, 所要秒数], ...] に変換（不正な値は空）"""
+    if not value:
+        return []
+    try:
+        runs = json.loads(value)
+    except ValueError:
+        return []
+    return [run for run in runs if isinstance(run, list) and len(run) == 2] if isinstance(runs, list) else []
+
+
+def summarize(recent_runs: List[list], runs: List[Run]) -> dict:
+    """直近の結果に runs（古い順）を加えた要約カラムの値"""
+    recent_runs = list(recent_runs)
+    values = {}
+    for _, status, finished_at, duration in runs:
+        values["last_run_status"] = status
+        values["last_run_at"] = finished_at
+        if status in ("completed", "failed"):
+            recent_runs.append([1 if status == "completed" else 0, duration])
+    recent_runs = recent_runs[-RUN_SUMMARY_WINDOW:]
+
+    durations = [duration for ok, duration in recent_runs if ok and duration is not None]
+    values["success_rate"] = (
+        sum(ok for ok, _ in recent_runs) / len(recent_runs) if recent_runs else None
+    )
+    values["p50_duration_seconds"] = median(durations) if durations else None
+    values["recent_runs"] = json.dumps(recent_runs)
+    return values
+
+
+def apply_runs(connection, runs: List[Run], replace: bool = False):
+    """
+    終了した実行を Task の要約に反映
+
+    replace=True の場合は保持している直近の結果を使わずに runs だけから作り直します。
+    """
+    runs_by_task: Dict[int, List[Run]] = {}
+    for run in sorted(runs, key=lambda run: run[2] or datetime.min):
+        runs_by_task.setdefault(run[0], []).append(run)
+    if not runs_by_task:
+        return
+
+    # 同じタスクの実行が同時に終了しても直近の結果を上書きし合わないよう、
+    # 書き込むタスクの行をコミットまでロックする（ID順に取ってデッドロックを避ける）
+    tasks = connection.execute(
+        select(Task.id, Task.user_id, Task.recent_runs)
+        .where(Task.id.in_(list(runs_by_task)))
+        .order_by(Task.id)
+        .with_for_update()
+    ).all()
+    table = Task.__table__
+    rows = []
+    task_ids_by_user: Dict[Optional[str], List[int]] = {}
+    for task in tasks:
+        recent_runs = [] if replace else parse_recent_runs(task.recent_runs)
+        rows.append({"b_id": task.id, **summarize(recent_runs, runs_by_task[task.id])})
+        task_ids_by_user.setdefault(task.user_id, []).append(task.id)
+    if not rows:
+        return
+
+    # 要約の更新で updated_at（ユーザーによる編集日時）は変えない
+    connection.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(updated_at=table.c.updated_at),
+        rows
+    )
+    for user_id, task_ids in task_ids_by_user.items():
+        record_board_changes(connection, "task", task_ids, user_id=user_id)
+
+
+def _finished_in_flush(session: Session) -> List[Run]:
+    runs = []
+    for obj in session.new:
+        if isinstance(obj, Execution) and obj.status in FINISHED_STATUSES:
+            runs.append(_run_of(obj))
+    for obj in session.dirty:
+        if not isinstance(obj, Execution) or obj.status not in FINISHED_STATUSES:
+            continue
+        history = inspect(obj).attrs.status.history
+        if history.added and not (history.deleted and history.deleted[0] in FINISHED_STATUSES):
+            runs.append(_run_of(obj))
+    return runs
+
+
+def _after_flush(session: Session, flush_context):
+    runs = _finished_in_flush(session)
+    if runs:
+        apply_runs(session.connection(), runs)
+
+
+def install():
+    """セッションイベントに要約の更新を登録"""
+    event.listen(Execution.status, "set", _track_previous, active_history=True)
+    event.listen(Session, "after_flush", _after_flush)
+
+
+install()
@@ -1,12 +1,14 @@
 """スケジューラーサービス"""
+import asyncio
 from datetime import datetime
 from typing import Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import SessionLocal
-from app.models import Task, Execution
+from app.models import Task
 from app.utils.logger import logger
 
 
@@ -24,6 +26,45 @@ class SchedulerService:
             self._started = True
             logger.info("スケジューラーを開始しました")
             self._load_scheduled_tasks()
+            
+            # ボード変更履歴の定期削除
+            self.scheduler.add_job(
+                self._prune_board_changes,
+                "interval",
+                hours=24,
+                id="prune_board_changes",
+                replace_existing=True
+            )
+            
+            # 実行統計の日別集計の直近分の作り直し（既存の実行履歴はマイグレーションで取り込み済み）
+            if settings.stats_reconcile_interval_minutes > 0:
+                self.scheduler.add_job(
+                    self._reconcile_stats,
+                    "interval",
+                    minutes=settings.stats_reconcile_interval_minutes,
+                    id="reconcile_stats",
+                    replace_existing=True
+                )
+            
+            # 保持期間を過ぎた実行履歴のアーカイブ
+            if settings.execution_archive_after_days > 0:
+                self.scheduler.add_job(
+                    self._archive_executions,
+                    "interval",
+                    hours=1,
+                    id="archive_executions",
+                    replace_existing=True
+                )
+            
+            # 参照されなくなったスクリーンショットの削除
+            if settings.screenshot_blob_retention_hours > 0:
+                self.scheduler.add_job(
+                    self._sweep_screenshots,
+                    "interval",
+                    hours=1,
+                    id="sweep_screenshots",
+                    replace_existing=True
+                )
     
     def stop(self):
         """スケジューラーを停止"""
@@ -32,6 +73,67 @@ class SchedulerService:
             self._started = False
             logger.info("スケジューラーを停止しました")
     
+    def _prune_board_changes(self):
+        """保持期間を過ぎたボード変更履歴を削除"""
+        from app.services.board_sync import prune_board_changes
+        
+        db = SessionLocal()
+        try:
+            prune_board_changes(db)
+        except Exception as e:
+            logger.error(f"ボード変更履歴の削除エラー: {e}")
+        finally:
+            db.close()
+    
+    async def _reconcile_stats(self):
+        """直近の日別集計を実行履歴から作り直し、ずれていればダッシュボード統計も読み直す"""
+        from app.services.dashboard_state import dashboard_state
+        from app.services.db_writer import db_writer
+        from app.services.stats_rollup import reconcile_stats
+        
+        try:
+            if await db_writer.run(reconcile_stats, settings.stats_reconcile_days) and dashboard_state.is_loaded:
+                await dashboard_state.reload()
+        except Exception as e:
+            logger.error(f"実行統計の集計エラー: {e}")
+    
+    async def _archive_executions(self):
+        """保持期間を過ぎた実行履歴を一定件数ずつアーカイブ"""
+        from app.services.db_writer import db_writer
+        from app.services.execution_archive import archive_batch, archive_cutoff, purge_orphaned_archives
+        
+        cutoff = archive_cutoff()
+        if cutoff is None:
+            return
+        batch_size = settings.execution_archive_batch_size
+        archived = 0
+        try:
+            # 1バッチごとにコミットし、他の書き込みを長時間待たせない
+            for _ in range(settings.execution_archive_max_batches):
+                count = await db_writer.run(archive_batch, cutoff, batch_size)
+                archived += count
+                if count < batch_size:
+                    break
+            purged = await db_writer.run(purge_orphaned_archives)
+            if archived or purged:
+                logger.info(f"実行履歴をアーカイブしました: {archived}件 (削除済みタスク分の削除: {purged}件)")
+        except Exception as e:
+            logger.error(f"実行履歴のアーカイブエラー: {e}")
+    
+    async def _sweep_screenshots(self):
+        """参照されておらず保持期間を過ぎたスクリーンショットを削除"""
+        from app.services.screenshot_store import screenshot_store
+        
+        try:
+            referenced = screenshot_store.referenced_ids()
+            removed = await asyncio.to_thread(
+                screenshot_store.sweep, referenced, settings.screenshot_blob_retention_hours * 3600
+            )
+            if removed:
+                logger.info(f"参照されていないスクリーンショットを削除しました: {removed}件")
+        except Exception as e:
+            logger.error(f"スクリーンショットの削除エラー: {e}")
+    
     def _load_scheduled_tasks(self):
         """DBからスケジュール設定されたタスクを読み込み"""
         db = SessionLocal()
@@ -93,6 +195,7 @@ class SchedulerService:
     async def _run_task(self, task_id: int):
         """スケジュールされたタスクを実行"""
         from app.services.agent import run_task_with_live_view
+        from app.services.db_writer import create_execution, db_writer
         
         db = SessionLocal()
         try:
@@ -101,21 +204,13 @@ class SchedulerService:
                 logger.warning(f"タスク {task_id} は無効または存在しません")
                 return
             
-            # 実行レコードを作成
-            execution = Execution(
-                task_id=task_id,
-                status="pending",
-                triggered_by="schedule",
-                started_at=datetime.utcnow()
-            )
-            db.add(execution)
-            db.commit()
-            db.refresh(execution)
+            # 実行レコードを作成（書き込みは db_writer 経由）
+            execution_id = await db_writer.run(create_execution, task_id, "schedule")
             
-            logger.info(f"スケジュール実行開始: task_id={task_id}, execution_id={execution.id}")
+            logger.info(f"スケジュール実行開始: task_id={task_id}, execution_id={execution_id}")
             
             # エージェントを実行
-            await run_task_with_live_view(task_id, execution.id)
+            await run_task_with_live_view(task_id, execution_id)
             
         except Exception as e:
             logger.error(f"スケジュール実行エラー (task_id={task_id}): {e}")
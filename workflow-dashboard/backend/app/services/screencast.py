@@ -1,30 +1,244 @@
 """CDPスクリーンキャストサービス"""
 import asyncio
 import base64
-from typing import Optional, Callable, Dict
+import io
+import time
+from collections import deque
+from typing import Optional, Callable, Deque, Dict, Set
 from datetime import datetime
 
+from app.services.session_recorder import session_recorder
 from app.utils.logger import logger
 
+# 実効フレームレートの計測に使う直近フレーム数
+FPS_WINDOW_FRAMES = 30
+
+# エンコードプロファイル（high は CDP から受け取ったフレームをそのまま配信）
+ENCODE_PROFILES = {
+    "high": {"quality": 80, "max_width": 1280, "max_height": 720},
+    "medium": {"quality": 60, "max_width": 960, "max_height": 540},
+    "low": {"quality": 40, "max_width": 640, "max_height": 360},
+}
+PROFILE_ORDER = ["low", "medium", "high"]
+SOURCE_PROFILE = "high"
+
+# 視聴者ごとの品質自動調整
+ADAPT_INTERVAL_SECONDS = 2.0
+DOWNGRADE_LATENCY_SECONDS = 0.25
+DOWNGRADE_DROP_RATIO = 0.5
+UPGRADE_LATENCY_SECONDS = 0.08
+UPGRADE_DROP_RATIO = 0.1
+# 品質を上げるまでに必要な連続良好区間数（上げ下げの振動を防ぐ）
+UPGRADE_STABLE_INTERVALS = 3
+
+
+def is_transcoding_available() -> bool:
+    """Pillow が使えるか確認"""
+    try:
+        from PIL import Image  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def transcode_frame(frame_data: str, profile: str) -> str:
+    """JPEGフレーム（base64）をプロファイルの解像度・品質で再エンコード"""
+    from PIL import Image
+    
+    settings = ENCODE_PROFILES[profile]
+    image = Image.open(io.BytesIO(base64.b64decode(frame_data)))
+    image.thumbnail((settings["max_width"], settings["max_height"]))
+    
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=settings["quality"])
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class ScreencastViewer:
+    """
+    視聴者ごとの送信キュー
+    
+    キューは最新1フレームのみ保持し、送信が追いつかない場合は古いフレームを破棄します。
+    遅い視聴者は自分のフレームレートが下がるだけで、他の視聴者やブラウザには影響しません。
+    """
+    
+    def __init__(
+        self,
+        execution_id: int,
+        send_frame: Callable,
+        profile: str = "auto",
+        send_message: Optional[Callable] = None
+    ):
+        self.execution_id = execution_id
+        self.send_frame = send_frame
+        self.send_message = send_message
+        self.adaptive = profile not in ENCODE_PROFILES
+        self.profile = SOURCE_PROFILE if self.adaptive else profile
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.latency_ewma: Optional[float] = None
+        self._sent_times: Deque[float] = deque(maxlen=FPS_WINDOW_FRAMES)
+        self._task: Optional[asyncio.Task] = None
+        self._window_started = time.monotonic()
+        self._window_sent = 0
+        self._window_dropped = 0
+        self._stable_intervals = 0
+    
+    def start(self):
+        """送信タスクを開始"""
+        self._task = asyncio.create_task(self._send_forever())
+    
+    async def close(self):
+        """送信タスクを停止"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def offer(self, frame_data: str):
+        """フレームをキューに入れる（未送信の古いフレームは破棄）"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped_count += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(frame_data)
+    
+    @property
+    def effective_fps(self) -> float:
+        """直近の実効フレームレート"""
+        if len(self._sent_times) < 2:
+            return 0.0
+        elapsed = self._sent_times[-1] - self._sent_times[0]
+        return (len(self._sent_times) - 1) / elapsed if elapsed > 0 else 0.0
+    
+    async def _send_forever(self):
+        while True:
+            frame_data = await self.queue.get()
+            started = time.monotonic()
+            try:
+                await self.send_frame(frame_data)
+            except Exception as e:
+                logger.warning(f"フレーム送信エラー: execution_id={self.execution_id}, error={e}")
+                return
+            now = time.monotonic()
+            latency = now - started
+            self.latency_ewma = latency if self.latency_ewma is None else self.latency_ewma * 0.8 + latency * 0.2
+            self.sent_count += 1
+            self._sent_times.append(now)
+            
+            if self.adaptive and now - self._window_started >= ADAPT_INTERVAL_SECONDS:
+                await self._adapt(now)
+    
+    async def _adapt(self, now: float):
+        """送信レイテンシと破棄率から品質プロファイルを上げ下げする"""
+        sent = self.sent_count - self._window_sent
+        dropped = self.dropped_count - self._window_dropped
+        drop_ratio = dropped / (sent + dropped) if sent + dropped else 0.0
+        self._window_started = now
+        self._window_sent = self.sent_count
+        self._window_dropped = self.dropped_count
+        
+        index = PROFILE_ORDER.index(self.profile)
+        new_index = index
+        if self.latency_ewma > DOWNGRADE_LATENCY_SECONDS or drop_ratio > DOWNGRADE_DROP_RATIO:
+            self._stable_intervals = 0
+            new_index = max(0, index - 1)
+        elif self.latency_ewma < UPGRADE_LATENCY_SECONDS and drop_ratio < UPGRADE_DROP_RATIO:
+            self._stable_intervals += 1
+            if self._stable_intervals >= UPGRADE_STABLE_INTERVALS:
+                self._stable_intervals = 0
+                new_index = min(len(PROFILE_ORDER) - 1, index + 1)
+        else:
+            self._stable_intervals = 0
+        
+        if new_index == index:
+            return
+        
+        self.profile = PROFILE_ORDER[new_index]
+        logger.info(
+            f"スクリーンキャスト品質変更: execution_id={self.execution_id}, profile={self.profile}, "
+            f"latency={self.latency_ewma * 1000:.0f}ms, drop_ratio={drop_ratio:.2f}"
+        )
+        if self.send_message:
+            try:
+                await self.send_message({"type": "profile", "profile": self.profile})
+            except Exception:
+                pass
+
+
+class ProfileEncoder:
+    """
+    プロファイル単位の再エンコーダ
+    
+    そのプロファイルの視聴者がいる間だけ存在し、最新フレームのみを変換して配信します。
+    """
+    
+    def __init__(self, session: "ScreencastSession", profile: str):
+        self.session = session
+        self.profile = profile
+        self._pending: Optional[str] = None
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._encode_forever())
+    
+    def offer(self, frame_data: str):
+        """変換待ちのフレームを最新のものに差し替える"""
+        self._pending = frame_data
+        self._ready.set()
+    
+    async def close(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+    
+    async def _encode_forever(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            frame_data, self._pending = self._pending, None
+            if not frame_data:
+                continue
+            try:
+                encoded = await asyncio.to_thread(transcode_frame, frame_data, self.profile)
+            except Exception as e:
+                logger.warning(f"フレーム再エンコードエラー: profile={self.profile}, error={e}")
+                continue
+            for viewer in list(self.session.viewers):
+                if viewer.profile == self.profile:
+                    viewer.offer(encoded)
+
 
 class ScreencastSession:
-    """個別のスクリーンキャストセッション"""
+    """
+    個別のスクリーンキャストセッション
+    
+    受信したフレームは即座にACKしてブラウザを待たせず、
+    最新フレームを保持したうえで各視聴者のキューへ配信します。
+    """
     
     def __init__(self, execution_id: int):
         self.execution_id = execution_id
         self.cdp_session = None
         self.is_active = False
-        self.frame_callback: Optional[Callable] = None
+        self.viewers: Set[ScreencastViewer] = set()
         self.last_frame: Optional[str] = None
         self.frame_count = 0
+        self._encoders: Dict[str, ProfileEncoder] = {}
+        self._can_transcode = is_transcoding_available()
     
-    async def start(self, page, frame_callback: Callable):
+    async def start(self, page):
         """スクリーンキャストを開始"""
         if self.is_active:
             return
         
         try:
-            self.frame_callback = frame_callback
             self.is_active = True
             
             # CDPセッションを作成
@@ -33,12 +247,13 @@ class ScreencastSession:
             # フレーム受信ハンドラを設定
             self.cdp_session.on('Page.screencastFrame', self._on_frame)
             
-            # スクリーンキャストを開始
+            # スクリーンキャストを開始（最高品質で受け取り、低いプロファイルはサーバー側で変換）
+            source = ENCODE_PROFILES[SOURCE_PROFILE]
             await self.cdp_session.send('Page.startScreencast', {
                 'format': 'jpeg',
-                'quality': 60,  # 品質（1-100）
-                'maxWidth': 1280,
-                'maxHeight': 720,
+                'quality': source["quality"],  # 品質（1-100）
+                'maxWidth': source["max_width"],
+                'maxHeight': source["max_height"],
                 'everyNthFrame': 2  # 2フレームごとに1フレーム送信（パフォーマンス調整）
             })
             
@@ -49,6 +264,45 @@ class ScreencastSession:
             self.is_active = False
             raise
     
+    def add_viewer(self, viewer: ScreencastViewer):
+        """視聴者を追加（最新フレームがあればすぐに送る）"""
+        if not self._can_transcode:
+            # Pillow がない場合は元フレームのみ配信
+            viewer.adaptive = False
+            viewer.profile = SOURCE_PROFILE
+        self.viewers.add(viewer)
+        viewer.start()
+        if self.last_frame:
+            if viewer.profile == SOURCE_PROFILE:
+                viewer.offer(self.last_frame)
+            else:
+                self._distribute(self.last_frame)
+    
+    def _distribute(self, frame_data: str):
+        """視聴者のプロファイルごとにフレームを配信（変換は購読者がいるプロファイルのみ）"""
+        wanted = set()
+        for viewer in self.viewers:
+            if viewer.profile == SOURCE_PROFILE:
+                viewer.offer(frame_data)
+            else:
+                wanted.add(viewer.profile)
+        
+        for profile in wanted:
+            encoder = self._encoders.get(profile)
+            if encoder is None:
+                encoder = ProfileEncoder(self, profile)
+                self._encoders[profile] = encoder
+            encoder.offer(frame_data)
+        
+        for profile in list(self._encoders):
+            if profile not in wanted:
+                asyncio.create_task(self._encoders.pop(profile).close())
+    
+    async def remove_viewer(self, viewer: ScreencastViewer):
+        """視聴者を削除"""
+        self.viewers.discard(viewer)
+        await viewer.close()
+    
     async def _on_frame(self, params):
         """フレーム受信時のハンドラ"""
         if not self.is_active:
@@ -58,18 +312,16 @@ class ScreencastSession:
             frame_data = params.get('data', '')
             session_id = params.get('sessionId', 0)
             
-            self.last_frame = frame_data
-            self.frame_count += 1
-            
-            # コールバックでフレームを配信
-            if self.frame_callback:
-                await self.frame_callback(frame_data)
-            
-            # フレームを確認応答（次のフレームを受信するために必要）
+            # 配信より先に確認応答し、視聴者の送信速度にブラウザを引きずられないようにする
             if self.cdp_session:
                 await self.cdp_session.send('Page.screencastFrameAck', {
                     'sessionId': session_id
                 })
+            
+            self.last_frame = frame_data
+            self.frame_count += 1
+            
+            self._distribute(frame_data)
                 
         except Exception as e:
             logger.warning(f"フレーム処理エラー: {e}")
@@ -81,6 +333,13 @@ class ScreencastSession:
         
         self.is_active = False
         
+        for viewer in list(self.viewers):
+            await viewer.close()
+        self.viewers.clear()
+        for encoder in self._encoders.values():
+            await encoder.close()
+        self._encoders.clear()
+        
         try:
             if self.cdp_session:
                 await self.cdp_session.send('Page.stopScreencast')
@@ -91,8 +350,6 @@ class ScreencastSession:
             
         except Exception as e:
             logger.warning(f"スクリーンキャスト停止エラー: {e}")
-        
-        self.frame_callback = None
 
 
 class ScreencastManager:
@@ -101,26 +358,43 @@ class ScreencastManager:
     def __init__(self):
         self._sessions: Dict[int, ScreencastSession] = {}
         self._pages: Dict[int, any] = {}  # execution_id -> page
-        self._viewers: Dict[int, int] = {}  # execution_id -> viewer count
+        self._recorders: Dict[int, ScreencastViewer] = {}  # execution_id -> 録画用の視聴者
     
     def register_page(self, execution_id: int, page):
         """ページを登録（タスク実行開始時に呼び出す）"""
         self._pages[execution_id] = page
-        self._viewers[execution_id] = 0
         logger.info(f"ページ登録: execution_id={execution_id}")
+        
+        # 録画が有効なら視聴者がいなくてもスクリーンキャストを流す
+        if session_recorder.enabled:
+            asyncio.create_task(self._start_recording(execution_id))
+    
+    async def _start_recording(self, execution_id: int):
+        """録画用の視聴者として購読する"""
+        async def record(frame_data: str):
+            await session_recorder.record_frame(execution_id, frame_data)
+        
+        viewer = await self.start_viewing(execution_id, record, profile=SOURCE_PROFILE)
+        if viewer:
+            self._recorders[execution_id] = viewer
     
     def unregister_page(self, execution_id: int):
         """ページの登録を解除（タスク実行終了時に呼び出す）"""
         self._pages.pop(execution_id, None)
-        self._viewers.pop(execution_id, None)
+        self._recorders.pop(execution_id, None)
         
         # セッションがあれば停止
-        if execution_id in self._sessions:
-            asyncio.create_task(self._sessions[execution_id].stop())
-            del self._sessions[execution_id]
+        session = self._sessions.pop(execution_id, None)
+        asyncio.create_task(self._close_session(execution_id, session))
         
         logger.info(f"ページ登録解除: execution_id={execution_id}")
     
+    async def _close_session(self, execution_id: int, session: Optional[ScreencastSession]):
+        """セッションを停止してから録画を閉じる"""
+        if session:
+            await session.stop()
+        session_recorder.finish(execution_id)
+    
     def get_page(self, execution_id: int):
         """登録されたページを取得"""
         return self._pages.get(execution_id)
@@ -129,39 +403,51 @@ class ScreencastManager:
         """ページが登録されているか確認"""
         return execution_id in self._pages
     
-    async def start_viewing(self, execution_id: int, frame_callback: Callable) -> bool:
-        """視聴を開始"""
+    async def start_viewing(
+        self,
+        execution_id: int,
+        send_frame: Callable,
+        profile: str = "auto",
+        send_message: Optional[Callable] = None
+    ) -> Optional[ScreencastViewer]:
+        """
+        視聴を開始（視聴者を返す。stop_viewing に渡して終了する）
+        
+        profile: "auto"（回線状況に応じて自動調整）または ENCODE_PROFILES のいずれか
+        """
         page = self._pages.get(execution_id)
         if not page:
             logger.warning(f"ページが見つかりません: execution_id={execution_id}")
-            return False
-        
-        # 視聴者数を増加
-        self._viewers[execution_id] = self._viewers.get(execution_id, 0) + 1
+            return None
         
         # セッションがなければ作成して開始
-        if execution_id not in self._sessions:
+        session = self._sessions.get(execution_id)
+        if session is None:
             session = ScreencastSession(execution_id)
             self._sessions[execution_id] = session
-            await session.start(page, frame_callback)
-        else:
-            # 既存セッションにコールバックを更新
-            self._sessions[execution_id].frame_callback = frame_callback
+            try:
+                await session.start(page)
+            except Exception:
+                self._sessions.pop(execution_id, None)
+                return None
         
-        return True
+        viewer = ScreencastViewer(execution_id, send_frame, profile, send_message)
+        session.add_viewer(viewer)
+        return viewer
     
-    async def stop_viewing(self, execution_id: int):
+    async def stop_viewing(self, execution_id: int, viewer: ScreencastViewer):
         """視聴を停止"""
-        if execution_id not in self._viewers:
+        session = self._sessions.get(execution_id)
+        if session is None:
+            await viewer.close()
             return
         
-        # 視聴者数を減少
-        self._viewers[execution_id] = max(0, self._viewers.get(execution_id, 1) - 1)
+        await session.remove_viewer(viewer)
         
         # 視聴者がいなくなったらスクリーンキャストを停止
-        if self._viewers[execution_id] == 0 and execution_id in self._sessions:
-            await self._sessions[execution_id].stop()
+        if not session.viewers and self._sessions.get(execution_id) is session:
             del self._sessions[execution_id]
+            await session.stop()
     
     def get_last_frame(self, execution_id: int) -> Optional[str]:
         """最新フレームを取得"""
@@ -169,8 +455,29 @@ class ScreencastManager:
         return session.last_frame if session else None
     
     def get_viewer_count(self, execution_id: int) -> int:
-        """視聴者数を取得"""
-        return self._viewers.get(execution_id, 0)
+        """視聴者数を取得（録画用の視聴者は含めない）"""
+        session = self._sessions.get(execution_id)
+        if not session:
+            return 0
+        return len(session.viewers) - (1 if execution_id in self._recorders else 0)
+    
+    def get_viewer_stats(self, execution_id: int) -> list:
+        """視聴者ごとの配信状況を取得"""
+        session = self._sessions.get(execution_id)
+        if not session:
+            return []
+        return [
+            {
+                "profile": viewer.profile,
+                "adaptive": viewer.adaptive,
+                "sent": viewer.sent_count,
+                "dropped": viewer.dropped_count,
+                "fps": round(viewer.effective_fps, 1),
+                "latency_ms": round(viewer.latency_ewma * 1000, 1) if viewer.latency_ewma is not None else None
+            }
+            for viewer in session.viewers
+            if viewer is not self._recorders.get(execution_id)
+        ]
     
     def is_streaming(self, execution_id: int) -> bool:
         """ストリーミング中か確認"""
@@ -180,10 +487,3 @@ class ScreencastManager:
 
 # シングルトンインスタンス
 screencast_manager = ScreencastManager()
-
-
-
-
-
-
-
@@ -0,0 +1,135 @@
+"""
+スクリーンショットストア
+
+スクリーンショットを内容のハッシュをIDとして一度だけ保存し、
+WebSocketメッセージやAPIレスポンスではIDとURLのみを受け渡します。
+同じ画像は同じIDになるため、ブラウザは /api/screenshots/{id} を一度取得すればキャッシュを使い続けられます。
+
+    screenshots/blobs/{IDの先頭2文字}/{ID}.{png|jpg}
+
+どこからも参照されず、保持期間より長く保存・再利用されていないファイルは sweep() で削除します。
+参照元（ライブビューのキャッシュや試運転セッション）は register_reference_source() で登録します。
+"""
+import base64
+import hashlib
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set
+
+from app.config import settings
+
+BLOB_ROOT = Path("screenshots") / "blobs"
+
+SCREENSHOT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+}
+
+
+def _detect_extension(data: bytes) -> str:
+    if data[:2] == b"\xff\xd8":
+        return "jpg"
+    return "png"
+
+
+class ScreenshotStore:
+    """内容アドレス方式のスクリーンショット保存"""
+
+    def __init__(self):
+        self._reference_sources: List[Callable[[], Iterable[str]]] = []
+
+    def register_reference_source(self, source: Callable[[], Iterable[str]]):
+        """参照中のIDを返す関数を登録（sweep() で削除対象から外す）"""
+        self._reference_sources.append(source)
+
+    def referenced_ids(self) -> Set[str]:
+        """登録された参照元が保持しているID（参照元を変更するイベントループ上で呼ぶ）"""
+        referenced: Set[str] = set()
+        for source in self._reference_sources:
+            referenced.update(screenshot_id for screenshot_id in source() if screenshot_id)
+        return referenced
+
+    def put_bytes(self, data: bytes) -> str:
+        """画像を保存してIDを返す（同じ内容なら既存ファイルを再利用）"""
+        screenshot_id = hashlib.sha256(data).hexdigest()[:32]
+        path = self._path(screenshot_id, _detect_extension(data))
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 書き込み途中のファイルを配信しないよう一時ファイルから置き換える
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+        else:
+            # 再利用されたファイルは保持期間を延ばす
+            os.utime(path)
+        return screenshot_id
+
+    def put_base64(self, image_base64: str) -> str:
+        """base64の画像を保存してIDを返す"""
+        return self.put_bytes(base64.b64decode(image_base64))
+
+    def find(self, screenshot_id: str) -> Optional[Path]:
+        """IDに対応するファイルを取得"""
+        if not SCREENSHOT_ID_PATTERN.match(screenshot_id):
+            return None
+        for extension in MEDIA_TYPES:
+            path = self._path(screenshot_id, extension)
+            if path.exists():
+                return path
+        return None
+
+    def media_type(self, path: Path) -> str:
+        return MEDIA_TYPES.get(path.suffix.lstrip("."), "application/octet-stream")
+
+    @staticmethod
+    def url_for(screenshot_id: Optional[str]) -> Optional[str]:
+        """配信用URL"""
+        if not screenshot_id:
+            return None
+        return f"{settings.api_prefix}/screenshots/{screenshot_id}"
+
+    def ref(self, screenshot_id: Optional[str]) -> dict:
+        """メッセージに載せる参照"""
+        return {"screenshot_id": screenshot_id, "screenshot_url": self.url_for(screenshot_id)}
+
+    def sweep(self, referenced: Set[str], max_age_seconds: float) -> int:
+        """
+        referenced に含まれず、最後の保存から max_age_seconds を過ぎたファイルを削除して件数を返す
+        
+        他のワーカーが保持している参照は見えないため、保存・再利用からの経過時間でも判定します。
+        """
+        if not BLOB_ROOT.exists():
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for directory in BLOB_ROOT.iterdir():
+            if not directory.is_dir():
+                continue
+            for path in directory.iterdir():
+                screenshot_id = path.name.split(".", 1)[0]
+                if screenshot_id in referenced:
+                    continue
+                try:
+                    if path.stat().st_mtime >= cutoff:
+                        continue
+                    path.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+            try:
+                directory.rmdir()
+            except OSError:
+                pass  # 空でなければ残す
+        return removed
+
+    @staticmethod
+    def _path(screenshot_id: str, extension: str) -> Path:
+        return BLOB_ROOT / screenshot_id[:2] / f"{screenshot_id}.{extension}"
+
+
+# シングルトンインスタンス
+screenshot_store = ScreenshotStore()
@@ -0,0 +1,295 @@
+"""
+セッション録画サービス
+
+スクリーンキャストのフレームとステップのスクリーンショットを
+実行ごとに1つのMJPEGファイルへ追記し、シーク用のインデックスを併せて書き出します。
+
+    screenshots/{execution_id}/session.mjpeg  JPEGフレームを連結したもの
+    screenshots/{execution_id}/session.idx    1行1レコードのJSON（追記のみ）
+        {"t": 経過ms, "o": オフセット, "n": バイト数}            フレーム
+        {"t": 経過ms, "step": 番号, "f": フレーム番号, ...}      ステップマーカー
+
+追記のみのためプロセスが落ちても途中まで再生できます。
+WebM等の動画コーデックはエンコーダ依存が大きいため使わず、MJPEG+インデックスのみ対応します。
+ファイルの読み書きは録画専用のスレッド1本で順番に行い、イベントループを止めません。
+"""
+import asyncio
+import base64
+import bisect
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.utils.logger import logger
+
+RECORDING_ROOT = Path("screenshots")
+VIDEO_FILENAME = "session.mjpeg"
+INDEX_FILENAME = "session.idx"
+
+# 読み込み済みインデックスのキャッシュ上限
+INDEX_CACHE_SIZE = 16
+
+
+def _to_jpeg(image_base64: str) -> bytes:
+    """スクリーンショット（PNG等）をJPEGに変換"""
+    data = base64.b64decode(image_base64)
+    if data[:2] == b"\xff\xd8":
+        return data
+
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=settings.screencast_recording_quality)
+    return buffer.getvalue()
+
+
+class SessionRecording:
+    """
+    1実行分の録画ファイル
+
+    accept_frame() 以外は録画スレッドから呼び出します（ファイルは最初の書き込み時に開く）。
+    """
+
+    def __init__(self, execution_id: int):
+        self.execution_id = execution_id
+        self.frame_count = 0
+        self._video = None
+        self._index = None
+        self._started = time.monotonic()
+        self._last_frame_at = 0.0
+        self._min_interval = 1.0 / max(1, settings.screencast_recording_fps)
+
+    def _open(self):
+        if self._video is not None:
+            return
+        directory = RECORDING_ROOT / str(self.execution_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        # 再開時は既存の続きから時刻・フレーム番号を振る
+        resumed_ms, self.frame_count = self._read_tail(directory / INDEX_FILENAME)
+        self._video = open(directory / VIDEO_FILENAME, "ab")
+        self._index = open(directory / INDEX_FILENAME, "a", encoding="utf-8")
+        self._started = time.monotonic() - resumed_ms / 1000
+
+    @staticmethod
+    def _read_tail(index_path: Path) -> tuple:
+        """既存インデックスの最終時刻とフレーム数"""
+        if not index_path.exists():
+            return 0, 0
+        last_ms = 0
+        frames = 0
+        with open(index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                last_ms = entry.get("t", last_ms)
+                if "step" not in entry:
+                    frames += 1
+        return last_ms, frames
+
+    def _elapsed_ms(self) -> int:
+        return int((time.monotonic() - self._started) * 1000)
+
+    def accept_frame(self, force: bool = False) -> bool:
+        """録画FPSを超える分を間引く（イベントループ側で判定し、書き込まないフレームは渡さない）"""
+        now = time.monotonic()
+        if not force and now - self._last_frame_at < self._min_interval:
+            return False
+        self._last_frame_at = now
+        return True
+
+    def write_frame(self, jpeg: bytes) -> int:
+        """フレームを追記して、書き込んだフレーム番号を返す"""
+        self._open()
+        offset = self._video.tell()
+        self._video.write(jpeg)
+        self._index.write(json.dumps({"t": self._elapsed_ms(), "o": offset, "n": len(jpeg)}) + "\n")
+        self.flush()
+        self.frame_count += 1
+        return self.frame_count - 1
+
+    def write_step(self, step_number: int, frame: Optional[int], description: str, status: str):
+        """ステップマーカーを追記"""
+        self._open()
+        self._index.write(json.dumps({
+            "t": self._elapsed_ms(),
+            "step": step_number,
+            "f": frame if frame is not None else max(0, self.frame_count - 1),
+            "description": description[:200],
+            "status": status
+        }, ensure_ascii=False) + "\n")
+        self.flush()
+
+    def flush(self):
+        if self._video is not None:
+            self._video.flush()
+            self._index.flush()
+
+    def close(self):
+        if self._video is not None:
+            self.flush()
+            self._video.close()
+            self._index.close()
+
+
+def _write_step(
+    recording: SessionRecording,
+    jpeg: Optional[bytes],
+    step_number: int,
+    description: str,
+    status: str
+):
+    """ステップのスクリーンショットとマーカーを書き込む（録画スレッドで実行）"""
+    frame = recording.write_frame(jpeg) if jpeg else None
+    recording.write_step(step_number, frame, description, status)
+
+
+def _close_recording(recording: SessionRecording):
+    """録画ファイルを閉じる（録画スレッドで実行）"""
+    try:
+        recording.close()
+        logger.info(f"セッション録画終了: execution_id={recording.execution_id}, frames={recording.frame_count}")
+    except Exception as e:
+        logger.warning(f"録画終了エラー: execution_id={recording.execution_id}, error={e}")
+
+
+class SessionRecorder:
+    """録画の管理（SCREENCAST_RECORDING_ENABLED が有効な場合のみ動作）"""
+
+    def __init__(self):
+        self._recordings: Dict[int, SessionRecording] = {}
+        self._index_cache: Dict[int, tuple] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.screencast_recording_enabled
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-recorder")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        """録画スレッドで実行して結果を待つ（書き込み順は呼び出し順のまま）"""
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    def _get_recording(self, execution_id: int) -> SessionRecording:
+        recording = self._recordings.get(execution_id)
+        if recording is None:
+            recording = SessionRecording(execution_id)
+            self._recordings[execution_id] = recording
+            logger.info(f"セッション録画開始: execution_id={execution_id}")
+        return recording
+
+    async def record_frame(self, execution_id: int, frame_base64: str):
+        """スクリーンキャストのフレームを記録"""
+        if not self.enabled:
+            return
+        try:
+            recording = self._get_recording(execution_id)
+            if recording.accept_frame():
+                await self._run(recording.write_frame, base64.b64decode(frame_base64))
+        except Exception as e:
+            logger.warning(f"録画フレーム書き込みエラー: execution_id={execution_id}, error={e}")
+
+    async def record_step(
+        self,
+        execution_id: int,
+        step_number: int,
+        description: str,
+        status: str,
+        screenshot_base64: Optional[str] = None
+    ):
+        """ステップのスクリーンショットとマーカーを記録"""
+        if not self.enabled:
+            return
+        try:
+            recording = self._get_recording(execution_id)
+            jpeg = None
+            if screenshot_base64:
+                jpeg = await asyncio.to_thread(_to_jpeg, screenshot_base64)
+                recording.accept_frame(force=True)
+            await self._run(_write_step, recording, jpeg, step_number, description, status)
+        except Exception as e:
+            logger.warning(f"録画ステップ書き込みエラー: execution_id={execution_id}, error={e}")
+
+    def finish(self, execution_id: int):
+        """録画を終了"""
+        recording = self._recordings.pop(execution_id, None)
+        if recording:
+            # 書き込み待ちのフレームの後に閉じる
+            self._get_executor().submit(_close_recording, recording)
+
+    def shutdown(self):
+        """書き込み待ちを処理し終えてからスレッドを停止"""
+        for execution_id in list(self._recordings):
+            self.finish(execution_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def is_recording(self, execution_id: int) -> bool:
+        """録画中か確認"""
+        return execution_id in self._recordings
+
+    def load_index(self, execution_id: int) -> Optional[dict]:
+        """録画インデックスを読み込む（ファイル更新時刻でキャッシュ）"""
+        path = RECORDING_ROOT / str(execution_id) / INDEX_FILENAME
+        if not path.exists():
+            return None
+
+        # 録画中のファイルはフレームごとにフラッシュ済み
+        mtime = path.stat().st_mtime
+        cached = self._index_cache.get(execution_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        frames: List[dict] = []
+        steps: List[dict] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 書き込み途中の行
+                    continue
+                if "step" in entry:
+                    steps.append(entry)
+                else:
+                    frames.append(entry)
+
+        index = {
+            "frames": frames,
+            "frame_times": [frame["t"] for frame in frames],
+            "steps": steps,
+            "duration_ms": frames[-1]["t"] if frames else 0
+        }
+        if len(self._index_cache) >= INDEX_CACHE_SIZE:
+            self._index_cache.pop(next(iter(self._index_cache)))
+        self._index_cache[execution_id] = (mtime, index)
+        return index
+
+    def find_frame(self, index: dict, t_ms: int) -> int:
+        """指定時刻に表示されているフレーム番号"""
+        position = bisect.bisect_right(index["frame_times"], t_ms) - 1
+        return max(0, position)
+
+    def read_frame(self, execution_id: int, index: dict, frame_number: int) -> Optional[bytes]:
+        """フレームのJPEGを読み出す"""
+        if frame_number < 0 or frame_number >= len(index["frames"]):
+            return None
+        frame = index["frames"][frame_number]
+        with open(RECORDING_ROOT / str(execution_id) / VIDEO_FILENAME, "rb") as f:
+            f.seek(frame["o"])
+            return f.read(frame["n"])
+
+
+# シングルトンインスタンス
+session_recorder = SessionRecorder()
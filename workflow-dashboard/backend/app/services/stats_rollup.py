@@ -0,0 +1,244 @@
+"""
+実行統計の日別集計
+
+Execution の作成・状態遷移・削除をセッションのフラッシュ時に検出し、
+execution_stats_daily（started_at の日付 × タスク）の件数を同じトランザクション内で増減します。
+ダッシュボード統計やタスク別・ユーザー別の日次推移は executions を数え直さずに
+この集計から取得できます。
+
+一括 UPDATE/DELETE（Query.update 等）はセッションイベントを経由せず集計に反映されないため、
+reconcile_stats() で直近の実行履歴から定期的に作り直します（スケジューラーが実行）。
+アーカイブ済みの実行（execution_archives）も引き続き集計に含めます。
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, delete, event, func, insert, inspect, select, text, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import Execution, ExecutionArchive, ExecutionStatsDaily, Task
+from app.utils.logger import logger
+
+# 集計上「実行中」とみなすステータス
+RUNNING_STATUSES = ("running", "pending")
+
+COUNTERS = ("total", "running", "completed", "failed")
+
+# 集計のキーになる Execution の属性
+TRACKED_ATTRIBUTES = ("started_at", "task_id", "status")
+
+_SESSION_KEY = "execution_stats_deltas"
+
+BucketKey = Tuple[date, int]
+
+
+def status_bucket(status: Optional[str]) -> Optional[str]:
+    """ステータスに対応する集計カラム（集計しないステータスは None）"""
+    if status in RUNNING_STATUSES:
+        return "running"
+    if status in ("completed", "failed"):
+        return status
+    return None
+
+
+def _track_previous(target, value, oldvalue, initiator):
+    """値はそのまま（active_history を有効にするためだけのリスナー）"""
+    return value
+
+
+def _previous_value(obj, key: str):
+    """フラッシュ前の属性値"""
+    history = inspect(obj).attrs[key].history
+    if history.added:
+        return history.deleted[0] if history.deleted else None
+    return getattr(obj, key)
+
+
+def _add(deltas: Dict[BucketKey, Counter], started_at, task_id, status, sign: int):
+    # started_at のない実行は集計しない（作成時に必ず設定される）
+    if started_at is None or task_id is None:
+        return
+    counts = deltas[(started_at.date(), task_id)]
+    counts["total"] += sign
+    bucket = status_bucket(status)
+    if bucket:
+        counts[bucket] += sign
+
+
+def _session_deltas(session: Session) -> Dict[BucketKey, Counter]:
+    return session.info.setdefault(_SESSION_KEY, defaultdict(Counter))
+
+
+def _before_flush(session: Session, flush_context, instances):
+    # 削除対象は行が消える前に値を読んでおく
+    deltas = None
+    for obj in session.deleted:
+        if isinstance(obj, Execution):
+            deltas = deltas if deltas is not None else _session_deltas(session)
+            _add(
+                deltas,
+                *(_previous_value(obj, key) for key in TRACKED_ATTRIBUTES),
+                sign=-1
+            )
+
+
+def _after_flush(session: Session, flush_context):
+    deltas = session.info.pop(_SESSION_KEY, None) or defaultdict(Counter)
+
+    for obj in session.new:
+        if isinstance(obj, Execution):
+            _add(deltas, obj.started_at, obj.task_id, obj.status, 1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Execution):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in TRACKED_ATTRIBUTES):
+            continue
+        previous = tuple(_previous_value(obj, key) for key in TRACKED_ATTRIBUTES)
+        current = tuple(getattr(obj, key) for key in TRACKED_ATTRIBUTES)
+        if previous != current:
+            _add(deltas, *previous, sign=-1)
+            _add(deltas, *current, sign=1)
+
+    rows = [
+        {"day": day, "task_id": task_id, **{column: counts[column] for column in COUNTERS}}
+        for (day, task_id), counts in deltas.items()
+        if any(counts[column] for column in COUNTERS)
+    ]
+    if rows:
+        apply_deltas(session, rows)
+
+
+def _after_rollback(session: Session, previous_transaction):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def apply_deltas(session: Session, rows: list):
+    """日別集計に件数の増減を加算（行がなければ作成）"""
+    connection = session.connection()
+    table = ExecutionStatsDaily.__table__
+
+    task_ids = {row["task_id"] for row in rows}
+    owners = dict(connection.execute(
+        select(Task.id, Task.user_id).where(Task.id.in_(task_ids))
+    ).all())
+    for row in rows:
+        row["user_id"] = owners.get(row["task_id"])
+
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "task_id"],
+            set_={column: table.c[column] + stmt.excluded[column] for column in COUNTERS}
+        )
+        connection.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            update(table)
+            .where(table.c.day == row["day"], table.c.task_id == row["task_id"])
+            .values({column: table.c[column] + row[column] for column in COUNTERS})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table), row)
+
+
+def get_totals(db: Session, user_id: Optional[str] = None, since: Optional[date] = None) -> dict:
+    """実行件数の合計（日別集計の合計なので実行履歴の件数に依存しない）"""
+    query = db.query(*(func.coalesce(func.sum(ExecutionStatsDaily.__table__.c[column]), 0) for column in COUNTERS))
+    if user_id:
+        query = query.filter(ExecutionStatsDaily.user_id == user_id)
+    if since:
+        query = query.filter(ExecutionStatsDaily.day >= since)
+    return {column: max(0, int(value)) for column, value in zip(COUNTERS, query.one())}
+
+
+def daily_stats_query(user_id: Optional[str] = None, task_id: Optional[int] = None, since: Optional[date] = None):
+    """日ごとの実行件数を返す SELECT（同期・非同期どちらのセッションでも実行可能）"""
+    table = ExecutionStatsDaily.__table__
+    query = select(
+        table.c.day,
+        *(func.sum(table.c[column]).label(column) for column in COUNTERS)
+    )
+    if user_id:
+        query = query.where(table.c.user_id == user_id)
+    if task_id:
+        query = query.where(table.c.task_id == task_id)
+    if since:
+        query = query.where(table.c.day >= since)
+    return query.group_by(table.c.day).having(func.sum(table.c.total) > 0).order_by(table.c.day)
+
+
+def reconcile_stats(db: Session, days: Optional[int] = None) -> bool:
+    """
+    日別集計を実行履歴から作り直す
+
+    days を指定すると直近 days 日分（started_at の日付、UTC）だけを作り直します。
+    一括更新でずれるのはほとんどが最近の実行のため、定期実行では全期間を読み直しません。
+    PostgreSQL では集計テーブルをロックしてから入れ替えるため、作り直しの間に
+    他のトランザクションが件数を増減することはありません（SQLite は最初の DELETE で
+    書き込みロックを取るため、作り直す件数の読み込みは他の書き込みと重なりません）。
+
+    Returns:
+        合計件数にずれがあった場合は True
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE execution_stats_daily IN SHARE ROW EXCLUSIVE MODE"))
+    since = datetime.utcnow().date() - timedelta(days=days - 1) if days else None
+    before = get_totals(db, since=since)
+
+    source = union_all(
+        *(
+            select(model.task_id, model.status, model.started_at).where(
+                model.started_at >= datetime.combine(since, time.min) if since else model.started_at.isnot(None)
+            )
+            for model in (Execution, ExecutionArchive)
+        )
+    ).subquery()
+    day = func.date(source.c.started_at)
+    rebuilt = (
+        select(
+            day,
+            source.c.task_id,
+            Task.user_id,
+            func.count(),
+            func.sum(case((source.c.status.in_(RUNNING_STATUSES), 1), else_=0)),
+            func.sum(case((source.c.status == "completed", 1), else_=0)),
+            func.sum(case((source.c.status == "failed", 1), else_=0)),
+        )
+        .outerjoin(Task, Task.id == source.c.task_id)
+        .group_by(day, source.c.task_id, Task.user_id)
+    )
+    stale = delete(ExecutionStatsDaily)
+    if since:
+        stale = stale.where(ExecutionStatsDaily.day >= since)
+    db.execute(stale)
+    db.execute(
+        insert(ExecutionStatsDaily).from_select(
+            ["day", "task_id", "user_id", *COUNTERS], rebuilt
+        )
+    )
+
+    after = get_totals(db, since=since)
+    if before != after:
+        logger.warning(f"実行統計の日別集計のずれを補正しました: {before} -> {after}")
+        return True
+    return False
+
+
+def install():
+    """セッションイベントに集計処理を登録"""
+    # 未ロードの属性を書き換えた場合も変更前の値を履歴に残す
+    for key in TRACKED_ATTRIBUTES:
+        event.listen(getattr(Execution, key), "set", _track_previous, active_history=True)
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
+
+
+install()
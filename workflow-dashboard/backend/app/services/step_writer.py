@@ -0,0 +1,274 @@
+"""
+実行ステップのまとめ書き込み
+
+エージェントの1アクションごとにステップ作成・更新・実行の進捗更新で
+何度もコミットしていた書き込みをメモリ上に溜め、一定間隔または一定件数ごとに
+1トランザクションでまとめて書き込みます（書き込みは db_writer 経由）。
+
+- add_step() は書き込み待ちのステップ（PendingStep）をすぐに返すため、
+  ライブビューへの通知はDB書き込みを待たずに行えます
+- 書き込み前のステップへの更新は INSERT に統合されます
+- current_step_id はフラッシュ時に確定したステップIDで更新します
+- まとめ書き込みに失敗したら実行ごとに分けて書き直し、それでも失敗した実行の変更だけを
+  バッファに戻して次回のフラッシュで再試行します。step_writer_max_retries 回続けて
+  失敗したら、その実行の変更のみ破棄します（他の実行の書き込みは巻き込まない）
+- 実行完了時は flush() を呼び出して残りを書き込んでください
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Execution, ExecutionStep
+from app.services.db_writer import db_writer
+from app.utils.logger import logger
+
+
+class PendingStep:
+    """書き込み待ちのステップ（フラッシュ後に id が確定）"""
+
+    __slots__ = ("execution_id", "values", "id", "dropped")
+
+    def __init__(self, execution_id: int, values: dict):
+        self.execution_id = execution_id
+        self.values = values
+        self.id: Optional[int] = None
+        self.dropped = False  # 書き込みの再試行回数を超えて破棄された
+
+
+def _write_batch(
+    db: Session,
+    new_steps: List[tuple],
+    step_updates: List[tuple],
+    progress: Dict[int, dict]
+) -> List[int]:
+    """
+    溜まった変更を1トランザクションで書き込む（書き込みスレッドで実行）
+
+    コミット前に PendingStep.id を設定するとロールバック時に誤ったIDが残るため、
+    作成したステップのIDを new_steps の順に返し、呼び出し元でコミット後に設定します。
+    """
+    rows = [ExecutionStep(execution_id=step.execution_id, **values) for step, values in new_steps]
+    if rows:
+        db.add_all(rows)
+        db.flush()
+    step_ids = {step: row.id for (step, _), row in zip(new_steps, rows)}
+
+    updates = [{"id": step.id, **values} for step, values in step_updates]
+    if updates:
+        db.execute(update(ExecutionStep), updates)
+
+    for execution_id, values in progress.items():
+        values = dict(values)
+        current_step = values.pop("current_step", None)
+        if current_step is not None:
+            current_step_id = current_step.id or step_ids.get(current_step)
+            if current_step_id is not None:
+                values["current_step_id"] = current_step_id
+        completed_delta = values.pop("completed_delta", 0)
+        if completed_delta:
+            values["completed_steps"] = func.coalesce(Execution.completed_steps, 0) + completed_delta
+        if values:
+            db.query(Execution).filter(Execution.id == execution_id).update(values, synchronize_session=False)
+    return [row.id for row in rows]
+
+
+def _group_by_execution(
+    new_steps: List[tuple],
+    step_updates: List[tuple],
+    progress: Dict[int, dict]
+) -> Dict[int, tuple]:
+    """変更を実行ごとの (new_steps, step_updates, progress) に分ける"""
+    groups: Dict[int, tuple] = {}
+
+    def group(execution_id: int) -> tuple:
+        if execution_id not in groups:
+            groups[execution_id] = ([], [], {})
+        return groups[execution_id]
+
+    for step, values in new_steps:
+        group(step.execution_id)[0].append((step, values))
+    for step, values in step_updates:
+        group(step.execution_id)[1].append((step, values))
+    for execution_id, values in progress.items():
+        group(execution_id)[2][execution_id] = values
+    return groups
+
+
+class StepWriter:
+    """ステップと実行の進捗をまとめて書き込む"""
+
+    def __init__(self):
+        self._new_steps: List[PendingStep] = []
+        self._step_updates: Dict[PendingStep, dict] = {}
+        self._progress: Dict[int, dict] = {}
+        self._failures: Dict[int, int] = {}  # execution_id -> 連続して書き込みに失敗した回数
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def buffered(self) -> int:
+        """書き込み待ちの件数"""
+        return len(self._new_steps) + len(self._step_updates) + len(self._progress)
+
+    def add_step(self, execution_id: int, step_number: int, **values) -> PendingStep:
+        """ステップを作成（実行の総ステップ数・現在ステップも更新）"""
+        step = PendingStep(execution_id, {"step_number": step_number, **values})
+        self._new_steps.append(step)
+        self.set_progress(execution_id, total_steps=step_number, current_step=step)
+        self._schedule()
+        return step
+
+    def update_step(self, step: PendingStep, **values):
+        """ステップを更新（未書き込みなら作成内容に統合）"""
+        if step.dropped:
+            return
+        if step.id is None and step in self._new_steps:
+            step.values.update(values)
+        else:
+            self._step_updates.setdefault(step, {}).update(values)
+        self._schedule()
+
+    def increment_completed(self, execution_id: int, count: int = 1):
+        """実行の完了ステップ数を加算"""
+        progress = self._progress.setdefault(execution_id, {})
+        progress["completed_delta"] = progress.get("completed_delta", 0) + count
+        self._schedule()
+
+    def set_progress(self, execution_id: int, **values):
+        """実行の進捗項目（last_screenshot_path 等）を設定"""
+        self._progress.setdefault(execution_id, {}).update(values)
+        self._schedule()
+
+    async def flush(self):
+        """溜まった変更をすぐに書き込む"""
+        async with self._lock:
+            if not self.buffered:
+                return
+            # 書き込み中に追加された変更は次回に回す
+            pending = self._new_steps
+            pending_set = set(pending)
+            step_updates = self._step_updates
+            progress = self._progress
+            self._new_steps = []
+            self._step_updates = {}
+            self._progress = {}
+
+            # 作成前のステップへの更新は INSERT に統合し、
+            # 前回の書き込みが終わっていないステップへの更新は ID が確定するまで残す
+            merged = {step: dict(step.values) for step in pending}
+            updates = []
+            for step, values in step_updates.items():
+                if step in pending_set:
+                    merged[step].update(values)
+                elif step.id is not None:
+                    updates.append((step, values))
+                elif not step.dropped:
+                    self._step_updates[step] = values
+            new_steps = [(step, merged[step]) for step in pending]
+
+            try:
+                step_ids = await db_writer.run(_write_batch, new_steps, updates, progress)
+            except Exception as e:
+                groups = _group_by_execution(new_steps, updates, progress)
+                if len(groups) == 1:
+                    execution_id, group = next(iter(groups.items()))
+                    self._requeue(execution_id, *group, e)
+                    return
+                # 1つの実行の不正な行（削除済みの実行への外部キー違反等）で他の実行まで失敗させない
+                logger.warning(f"ステップのまとめ書き込みエラーのため実行ごとに書き込みます: executions={len(groups)}, error={e}")
+                for execution_id, group in groups.items():
+                    try:
+                        step_ids = await db_writer.run(_write_batch, *group)
+                    except Exception as group_error:
+                        self._requeue(execution_id, *group, group_error)
+                        continue
+                    self._failures.pop(execution_id, None)
+                    self._apply(group[0], step_ids)
+                return
+            for execution_id in _group_by_execution(new_steps, updates, progress):
+                self._failures.pop(execution_id, None)
+            self._apply(new_steps, step_ids)
+
+    @staticmethod
+    def _apply(new_steps: List[tuple], step_ids: List[int]):
+        """コミットしたステップのIDを設定"""
+        for (step, values), step_id in zip(new_steps, step_ids):
+            step.id = step_id
+            step.values = values
+
+    def _requeue(
+        self,
+        execution_id: int,
+        new_steps: List[tuple],
+        step_updates: List[tuple],
+        progress: Dict[int, dict],
+        error: Exception
+    ):
+        """書き込めなかった実行の変更をバッファの先頭に戻す（再試行回数を超えたら破棄）"""
+        failures = self._failures.get(execution_id, 0) + 1
+        if failures > settings.step_writer_max_retries:
+            logger.error(
+                f"ステップの書き込みに{failures}回続けて失敗したため破棄します: execution_id={execution_id}, "
+                f"steps={len(new_steps)}, updates={len(step_updates)}, error={error}"
+            )
+            self._failures.pop(execution_id, None)
+            for step, _ in new_steps:
+                step.dropped = True
+            self._step_updates = {
+                step: values for step, values in self._step_updates.items() if not step.dropped
+            }
+            return
+
+        self._failures[execution_id] = failures
+        logger.warning(
+            f"ステップの書き込みエラーのため再試行します ({failures}/{settings.step_writer_max_retries}): "
+            f"execution_id={execution_id}, steps={len(new_steps)}, error={error}"
+        )
+        for step, values in new_steps:
+            step.values = values
+        self._new_steps = [step for step, _ in new_steps] + self._new_steps
+        for step, values in step_updates:
+            self._step_updates[step] = {**values, **self._step_updates.get(step, {})}
+        for progress_execution_id, values in progress.items():
+            newer = self._progress.get(progress_execution_id, {})
+            combined = {**values, **newer}
+            completed_delta = values.get("completed_delta", 0) + newer.get("completed_delta", 0)
+            if completed_delta:
+                combined["completed_delta"] = completed_delta
+            self._progress[progress_execution_id] = combined
+        # すぐに再試行しないよう、件数が上限を超えていても次の間隔まで待たせる
+        self._ensure_flush_task()
+
+    def _schedule(self):
+        """定期フラッシュを開始し、件数が上限を超えたらすぐに書き込ませる"""
+        if self._ensure_flush_task() and self.buffered >= settings.step_writer_max_rows:
+            self._wakeup.set()
+
+    def _ensure_flush_task(self) -> bool:
+        """定期フラッシュのタスクがなければ開始（イベントループ外では何もしない）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if self._flush_task is None or self._flush_task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_task = loop.create_task(self._flush_loop())
+        return True
+
+    async def _flush_loop(self):
+        interval = settings.step_writer_flush_ms / 1000
+        while self.buffered:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+# シングルトンインスタンス
+step_writer = StepWriter()
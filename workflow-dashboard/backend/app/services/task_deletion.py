@@ -0,0 +1,128 @@
+"""
+タスク・プロジェクトの一括削除
+
+ORM のカスケード削除は実行・ステップを1行ずつ読み込んで削除するため、実行の多いタスクでは
+削除に時間がかかります。ここではタスクID単位の UPDATE / DELETE 文で関連する行
+（ステップ・実行制御・実行・アーカイブ・日別集計・トリガー・依存関係）をまとめて削除します。
+
+一括 DELETE はセッションイベントを経由しないため、ボード変更はここで記録し、
+ダッシュボード向けのイベントは戻り値の events を呼び出し元がコミット後に
+execution_events.emit() で通知します。スクリーンショットのディレクトリ削除は
+時間がかかるため、呼び出し元がバックグラウンドで remove_screenshot_dirs() を実行します。
+"""
+import shutil
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Execution, ExecutionArchive, ExecutionControl, ExecutionStatsDaily, ExecutionStep,
+    Project, RoleGroup, Task, TaskDependency, TaskTrigger
+)
+from app.services.board_sync import record_board_changes
+from app.services.stats_rollup import status_bucket
+from app.utils.logger import logger
+
+SCREENSHOT_ROOT = Path("screenshots")
+
+
+def _empty_result() -> dict:
+    return {"execution_ids": [], "events": []}
+
+
+def delete_tasks(db: Session, task_ids: Iterable[int]) -> dict:
+    """
+    タスクと関連する行をまとめて削除（コミットは呼び出し元）
+
+    Returns:
+        {"execution_ids": 削除した実行ID, "events": コミット後に通知するイベント}
+    """
+    tasks = db.execute(
+        select(Task.id, Task.user_id, Task.is_active).where(Task.id.in_(list(task_ids)))
+    ).all()
+    if not tasks:
+        return _empty_result()
+    task_ids = [task.id for task in tasks]
+
+    execution_ids_query = select(Execution.id).where(Execution.task_id.in_(task_ids))
+    execution_ids = db.execute(execution_ids_query).scalars().all()
+    counts = {"total": len(execution_ids), "running": 0, "completed": 0, "failed": 0}
+    for status, count in db.execute(
+        select(Execution.status, func.count())
+        .where(Execution.task_id.in_(task_ids))
+        .group_by(Execution.status)
+    ):
+        bucket = status_bucket(status)
+        if bucket:
+            counts[bucket] += count
+
+    # current_step_id の外部キーを外してから、参照する側の行から順に削除
+    db.execute(
+        update(Execution.__table__)
+        .where(Execution.task_id.in_(task_ids), Execution.current_step_id.isnot(None))
+        .values(current_step_id=None)
+    )
+    db.execute(delete(ExecutionStep.__table__).where(ExecutionStep.execution_id.in_(execution_ids_query)))
+    db.execute(delete(ExecutionControl.__table__).where(ExecutionControl.execution_id.in_(execution_ids_query)))
+    db.execute(delete(Execution.__table__).where(Execution.task_id.in_(task_ids)))
+    db.execute(delete(ExecutionArchive.__table__).where(ExecutionArchive.task_id.in_(task_ids)))
+    db.execute(delete(ExecutionStatsDaily.__table__).where(ExecutionStatsDaily.task_id.in_(task_ids)))
+    # 削除するタスクの完了を待つ依存トリガーも削除
+    db.execute(delete(TaskTrigger.__table__).where(or_(
+        TaskTrigger.task_id.in_(task_ids),
+        TaskTrigger.depends_on_task_id.in_(task_ids)
+    )))
+    db.execute(delete(TaskDependency.__table__).where(or_(
+        TaskDependency.task_id.in_(task_ids),
+        TaskDependency.depends_on_task_id.in_(task_ids)
+    )))
+    db.execute(delete(Task.__table__).where(Task.id.in_(task_ids)))
+
+    task_ids_by_user = defaultdict(list)
+    for task in tasks:
+        task_ids_by_user[task.user_id].append(task.id)
+    for user_id, ids in task_ids_by_user.items():
+        record_board_changes(db, "task", ids, op="delete", user_id=user_id)
+
+    events = []
+    if execution_ids:
+        events.append({"event": "executions_deleted", "task_ids": task_ids, "counts": counts})
+    events.append({
+        "event": "tasks_changed",
+        "total_delta": -len(tasks),
+        "active_delta": -sum(1 for task in tasks if task.is_active)
+    })
+    return {"execution_ids": execution_ids, "events": events}
+
+
+def delete_project(db: Session, project_id: int) -> dict:
+    """プロジェクトと含まれるタスク・役割グループをまとめて削除（戻り値は delete_tasks と同じ）"""
+    project_user_id = db.execute(select(Project.user_id).where(Project.id == project_id)).first()
+    if project_user_id is None:
+        return _empty_result()
+    user_id: Optional[str] = project_user_id[0]
+
+    task_ids = db.execute(select(Task.id).where(Task.project_id == project_id)).scalars().all()
+    result = delete_tasks(db, task_ids) if task_ids else _empty_result()
+
+    role_group_ids = db.execute(select(RoleGroup.id).where(RoleGroup.project_id == project_id)).scalars().all()
+    db.execute(delete(RoleGroup.__table__).where(RoleGroup.project_id == project_id))
+    db.execute(delete(Project.__table__).where(Project.id == project_id))
+    record_board_changes(db, "role_group", role_group_ids, op="delete", user_id=user_id)
+    record_board_changes(db, "project", [project_id], op="delete", user_id=user_id)
+    return result
+
+
+def remove_screenshot_dirs(execution_ids: List[int]):
+    """削除した実行のスクリーンショットのディレクトリを削除（バックグラウンドで実行）"""
+    removed = 0
+    for execution_id in execution_ids:
+        path = SCREENSHOT_ROOT / str(execution_id)
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"削除した実行のスクリーンショットを削除しました: {removed}件")
@@ -0,0 +1,132 @@
+"""
+タスクの依存関係
+
+Task.dependencies（前のタスクIDのリストのJSON文字列）はAPIの入出力としてそのまま使い、
+検索用にセッションのフラッシュ時に task_dependencies（依存元 → 依存先の辺）へ同期します。
+依存先・依存元の取得や上流・下流をたどる検索は、JSONを読み直さずに
+インデックス付きの結合・再帰CTEで行えます。
+
+既存データベースの辺はマイグレーション（app/migrations/versions.py）で Task.dependencies から作成します。
+"""
+import json
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, event, inspect, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.models import Task, TaskDependency
+
+
+def parse_dependencies(value) -> List[int]:
+    """Task.dependencies の値をタスクIDのリストに変換（不正な値は空）"""
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value) if isinstance(value, str) else value
+    except ValueError:
+        return []
+    if not isinstance(parsed, list):
+        return []
+    ids = []
+    for item in parsed:
+        try:
+            task_id = int(item)
+        except (TypeError, ValueError):
+            continue
+        if task_id not in ids:
+            ids.append(task_id)
+    return ids
+
+
+def replace_edges(connection, dependencies: Dict[int, List[int]]):
+    """タスクごとの依存先の辺を置き換え（存在しないタスク・自分自身への依存は除く）"""
+    table = TaskDependency.__table__
+    connection.execute(delete(table).where(table.c.task_id.in_(list(dependencies))))
+
+    referenced = {dep_id for dep_ids in dependencies.values() for dep_id in dep_ids}
+    if not referenced:
+        return
+    existing = set(connection.execute(select(Task.id).where(Task.id.in_(referenced))).scalars())
+    rows = [
+        {"task_id": task_id, "depends_on_task_id": dep_id}
+        for task_id, dep_ids in dependencies.items()
+        for dep_id in dep_ids
+        if dep_id in existing and dep_id != task_id
+    ]
+    if rows:
+        connection.execute(insert(table), rows)
+
+
+def _before_flush(session: Session, flush_context, instances):
+    # 削除するタスクの辺を先に消しておく（外部キー制約を回避）
+    deleted_ids = [obj.id for obj in session.deleted if isinstance(obj, Task) and obj.id is not None]
+    if deleted_ids:
+        session.connection().execute(
+            delete(TaskDependency.__table__).where(or_(
+                TaskDependency.task_id.in_(deleted_ids),
+                TaskDependency.depends_on_task_id.in_(deleted_ids)
+            ))
+        )
+
+
+def _after_flush(session: Session, flush_context):
+    dependencies = {}
+    for obj in session.new:
+        if isinstance(obj, Task):
+            dependencies[obj.id] = parse_dependencies(obj.dependencies)
+    for obj in session.dirty:
+        if isinstance(obj, Task) and inspect(obj).attrs.dependencies.history.has_changes():
+            dependencies[obj.id] = parse_dependencies(obj.dependencies)
+
+    if dependencies:
+        replace_edges(session.connection(), dependencies)
+
+
+def install():
+    """セッションイベントに辺の同期を登録"""
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_flush", _after_flush)
+
+
+def get_dependency_map(db: Session, task_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """タスクIDごとの直接の依存先IDのリスト"""
+    task_ids = list(task_ids)
+    dependencies = {task_id: [] for task_id in task_ids}
+    if not task_ids:
+        return dependencies
+    rows = db.execute(
+        select(TaskDependency.task_id, TaskDependency.depends_on_task_id)
+        .where(TaskDependency.task_id.in_(task_ids))
+        .order_by(TaskDependency.task_id, TaskDependency.depends_on_task_id)
+    )
+    for task_id, dep_id in rows:
+        dependencies[task_id].append(dep_id)
+    return dependencies
+
+
+def _closure(db: Session, task_id: int, downstream: bool) -> List[int]:
+    """依存関係を再帰的にたどったタスクIDのリスト（循環があっても停止する）"""
+    table = TaskDependency.__table__
+    source, target = (
+        (table.c.depends_on_task_id, table.c.task_id) if downstream
+        else (table.c.task_id, table.c.depends_on_task_id)
+    )
+    closure = select(target.label("id")).where(source == task_id).cte("closure", recursive=True)
+    closure = closure.union(
+        select(target).select_from(table).join(closure, source == closure.c.id)
+    )
+    ids = db.execute(select(closure.c.id)).scalars().all()
+    return sorted(i for i in set(ids) if i != task_id)
+
+
+def upstream_task_ids(db: Session, task_id: int) -> List[int]:
+    """このタスクより前に実行されるタスク（依存先を再帰的にたどる）"""
+    return _closure(db, task_id, downstream=False)
+
+
+def downstream_task_ids(db: Session, task_id: int) -> List[int]:
+    """このタスクの後に実行されるタスク（依存元を再帰的にたどる）"""
+    return _closure(db, task_id, downstream=True)
+
+
+install()
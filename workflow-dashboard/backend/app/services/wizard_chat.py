@@ -4,8 +4,8 @@ from typing import Optional, List
 from sqlalchemy.orm import Session
 
 from app.models import WizardSession
-from app.services.credential_manager import credential_manager
-from app.services.anthropic_client import call_anthropic_api, DEFAULT_MODEL as DEFAULT_CHAT_MODEL, get_available_models
+from app.services.anthropic_client import DEFAULT_MODEL as DEFAULT_CHAT_MODEL, get_available_models
+from app.services.llm_gateway import llm_gateway, get_llm_credentials, DeltaHandler
 from app.utils.logger import logger
 
 
@@ -17,9 +17,10 @@ class WizardChatService:
         db: Session,
         session: WizardSession,
         user_message: str,
-        model: str = None
+        model: str = None,
+        on_delta: Optional[DeltaHandler] = None
     ) -> dict:
-        """ユーザーメッセージに応答"""
+        """ユーザーメッセージに応答（on_delta を渡すと応答をストリーミングで受け取れる）"""
         try:
             # チャット履歴を取得
             chat_history = json.loads(session.chat_history or "[]")
@@ -31,14 +32,10 @@ class WizardChatService:
             })
             
             # Anthropic APIキーを優先、なければOpenAI
-            cred = credential_manager.get_default(db, "api_key", "anthropic")
-            if not cred:
-                cred = credential_manager.get_default(db, "api_key", "openai")
-            if not cred:
+            credentials = get_llm_credentials(db)
+            if not credentials:
                 raise ValueError("Anthropic または OpenAI APIキーが設定されていません")
             
-            api_key = cred["data"].get("api_key")
-            
             # 動画分析結果をコンテキストに含める（あれば）
             video_analysis = json.loads(session.video_analysis or "{}")
             has_video = bool(video_analysis)
@@ -166,14 +163,15 @@ JSONを出力する際は、以下の形式でメッセージを構成してく
             messages = [{"role": "system", "content": system_prompt}]
             messages.extend([{"role": msg["role"], "content": msg["content"]} for msg in chat_history])
             
-            # 統一されたOpenAI APIクライアントを使用
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
             use_model = model or DEFAULT_CHAT_MODEL
-            assistant_message = await call_anthropic_api(
-                api_key=api_key,
+            assistant_message = await llm_gateway.complete(
+                credentials,
                 messages=messages,
                 model=use_model,
                 max_tokens=2048,
-                timeout=120
+                timeout=120,
+                on_delta=on_delta
             )
             
             # アシスタントメッセージを追加
@@ -266,14 +264,10 @@ JSONを出力する際は、以下の形式でメッセージを構成してく
         """チャット履歴からタスクを生成"""
         try:
             # Anthropic APIキーを優先、なければOpenAI
-            cred = credential_manager.get_default(db, "api_key", "anthropic")
-            if not cred:
-                cred = credential_manager.get_default(db, "api_key", "openai")
-            if not cred:
+            credentials = get_llm_credentials(db)
+            if not credentials:
                 raise ValueError("Anthropic または OpenAI APIキーが設定されていません")
             
-            api_key = cred["data"].get("api_key")
-            
             chat_history = json.loads(session.chat_history or "[]")
             video_analysis = json.loads(session.video_analysis or "{}")
             
@@ -310,10 +304,10 @@ JSONを出力する際は、以下の形式でメッセージを構成してく
 }}
 ```"""
             
-            # 統一されたOpenAI APIクライアントを使用
+            # LLMゲートウェイ経由で呼び出す（リトライ・フェイルオーバー付き）
             use_model = model or DEFAULT_CHAT_MODEL
-            response_text = await call_anthropic_api(
-                api_key=api_key,
+            response_text = await llm_gateway.complete(
+                credentials,
                 messages=[{"role": "user", "content": prompt}],
                 model=use_model,
                 max_tokens=2048,
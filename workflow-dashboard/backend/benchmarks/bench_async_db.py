@@ -0,0 +1,120 @@
+"""
+非同期データベース層のベンチマーク
+
+重い読み込みクエリ（DB側で走査・並べ替えを行うもの）を同時に流しながら、イベントループの遅延（ライブビューの配信遅延に相当）を計測します。
+- sync:  async def の中で同期セッションを直接使う（移行前のルーター）
+- async: AsyncSession（get_async_db）を使う（移行後のルーター）
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_async_db.py --rows 20000 --readers 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal, SessionLocal, init_db
+from app.models import Task
+
+# ライブビューのフレーム間隔を模したティック間隔
+TICK_INTERVAL = 0.01
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * p / 100))
+    return values[index]
+
+
+def seed(rows: int):
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(Task.id)).filter(Task.name.like("bench-%")).scalar()
+        if existing >= rows:
+            return
+        db.add_all([
+            Task(name=f"bench-{i}", task_prompt="benchmark " * 50)
+            for i in range(existing, rows)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def ticker(stop: asyncio.Event, lags: list):
+    """一定間隔で起きて、予定時刻からの遅れを記録"""
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK_INTERVAL
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+def heavy_query():
+    """インデックスの効かない絞り込みと並べ替え（DB側で時間がかかり、返す行は少ない）"""
+    return (
+        select(Task)
+        .where(Task.name.like("bench-%"), Task.task_prompt.like("%benchmark%"))
+        .order_by(func.length(Task.task_prompt), Task.name.desc())
+        .limit(100)
+    )
+
+
+async def sync_reader():
+    db = SessionLocal()
+    try:
+        db.execute(heavy_query()).scalars().all()
+    finally:
+        db.close()
+
+
+async def async_reader():
+    async with AsyncSessionLocal() as db:
+        (await db.execute(heavy_query())).scalars().all()
+
+
+async def run(label: str, reader, readers: int, rounds: int):
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(stop, lags))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(reader() for _ in range(readers)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+    print(
+        f"{label:6s} readers={readers} rounds={rounds} elapsed={elapsed:6.2f}s  "
+        f"loop lag p50={percentile(lags, 50) * 1000:7.2f}ms  "
+        f"p99={percentile(lags, 99) * 1000:7.2f}ms  "
+        f"max={max(lags, default=0) * 1000:7.2f}ms  "
+        f"mean={statistics.mean(lags) * 1000 if lags else 0:7.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="非同期データベース層のベンチマーク")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.rows)
+
+    await run("sync", sync_reader, args.readers, args.rounds)
+    await run("async", async_reader, args.readers, args.rounds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""
+タスク削除・ボード並べ替えのベンチマーク
+
+- delete: 大量の実行履歴（ステップ付き）を持つタスクの削除
+    orm:  実行の current_step_id を外し、ORM のカスケードで1行ずつ削除（変更前）
+    bulk: task_deletion.delete_tasks の一括 UPDATE/DELETE（変更後）
+- reorder: 多数のタスクの order_index 等を一括更新（カンバンボードの並べ替え）
+    orm:  タスクを読み込んで属性を変更し、フラッシュで1行ずつ UPDATE（変更前）
+    bulk: 主キー指定の一括 UPDATE（変更後）
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_bulk_delete.py --executions 50000 --steps 2 --tasks 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import create_engine, event, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, apply_sqlite_pragmas
+from app.models import Execution, ExecutionStep, Task
+from app.services.task_deletion import delete_tasks
+
+
+def make_session_factory() -> sessionmaker:
+    path = os.path.join(tempfile.mkdtemp(), "bulk.db")
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def seed_task(Session, executions: int, steps: int) -> int:
+    db = Session()
+    task = Task(name="bench", task_prompt="benchmark")
+    db.add(task)
+    db.commit()
+    task_id = task.id
+    started = datetime(2024, 1, 1)
+    db.execute(insert(Execution), [
+        {"task_id": task_id, "status": "completed", "started_at": started, "result": "x" * 200}
+        for _ in range(executions)
+    ])
+    execution_ids = db.execute(select(Execution.id).where(Execution.task_id == task_id)).scalars().all()
+    batch = []
+    for execution_id in execution_ids:
+        for step_number in range(1, steps + 1):
+            batch.append({"execution_id": execution_id, "step_number": step_number, "action_type": "click", "status": "completed"})
+            if len(batch) >= 20000:
+                db.execute(insert(ExecutionStep), batch)
+                batch = []
+    if batch:
+        db.execute(insert(ExecutionStep), batch)
+    db.commit()
+    db.close()
+    return task_id
+
+
+def delete_orm(db, task_id: int):
+    db.execute(
+        update(Execution)
+        .where(Execution.task_id == task_id, Execution.current_step_id.isnot(None))
+        .values(current_step_id=None)
+    )
+    db.commit()
+    db.delete(db.get(Task, task_id))
+    db.commit()
+
+
+def delete_bulk(db, task_id: int):
+    delete_tasks(db, [task_id])
+    db.commit()
+
+
+def seed_board(Session, tasks: int):
+    db = Session()
+    db.add_all([Task(name=f"bench-{i}", task_prompt="benchmark", order_index=i) for i in range(tasks)])
+    db.commit()
+    task_ids = db.execute(select(Task.id).order_by(Task.id)).scalars().all()
+    db.close()
+    return task_ids
+
+
+def reorder_orm(db, task_ids):
+    tasks_by_id = {task.id: task for task in db.execute(select(Task).where(Task.id.in_(task_ids))).scalars()}
+    for index, task_id in enumerate(reversed(task_ids)):
+        tasks_by_id[task_id].order_index = index
+        tasks_by_id[task_id].role_group = f"group-{index % 5}"
+    db.commit()
+
+
+def reorder_bulk(db, task_ids):
+    owned = set(db.execute(select(Task.id).where(Task.id.in_(task_ids))).scalars())
+    rows = [
+        {"id": task_id, "order_index": index, "role_group": f"group-{index % 5}"}
+        for index, task_id in enumerate(task_ids)
+        if task_id in owned
+    ]
+    db.execute(update(Task), rows)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="タスク削除・ボード並べ替えのベンチマーク")
+    parser.add_argument("--executions", type=int, default=50000)
+    parser.add_argument("--steps", type=int, default=2, help="実行あたりのステップ数")
+    parser.add_argument("--tasks", type=int, default=500, help="並べ替えるタスク数")
+    args = parser.parse_args()
+
+    for label, fn in (("orm", delete_orm), ("bulk", delete_bulk)):
+        Session = make_session_factory()
+        task_id = seed_task(Session, args.executions, args.steps)
+        db = Session()
+        started = time.perf_counter()
+        fn(db, task_id)
+        print(f"delete  {label:4s} executions={args.executions} elapsed={(time.perf_counter() - started) * 1000:9.1f}ms")
+        db.close()
+
+    for label, fn in (("orm", reorder_orm), ("bulk", reorder_bulk)):
+        Session = make_session_factory()
+        task_ids = seed_board(Session, args.tasks)
+        db = Session()
+        started = time.perf_counter()
+        fn(db, task_ids)
+        print(f"reorder {label:4s} tasks={args.tasks} elapsed={(time.perf_counter() - started) * 1000:9.1f}ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+データベース接続プールのベンチマーク
+
+API リクエスト相当の処理（セッションを開いて軽いクエリを1回実行して閉じる）を繰り返し、
+NullPool（変更前: 毎回新規接続）と QueuePool（変更後: database.py のプール設定）で
+1リクエストあたりのレイテンシを比較します。
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_db_pool.py --requests 200
+    python benchmarks/bench_db_pool.py --dsn postgresql://...:6543/postgres --concurrency 8
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import build_pool_settings, detect_pooler_mode
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * p / 100))
+    return values[index]
+
+
+def make_engine(dsn: str, pooled: bool):
+    if not dsn.startswith("postgresql"):
+        connect_args = {"check_same_thread": False} if dsn.startswith("sqlite") else {}
+        if pooled:
+            return create_engine(dsn, connect_args=connect_args)
+        return create_engine(dsn, connect_args=connect_args, poolclass=NullPool)
+
+    if pooled:
+        url, pool_settings, connect_args = build_pool_settings(dsn)
+        return create_engine(url, connect_args=connect_args, **pool_settings)
+    return create_engine(dsn, poolclass=NullPool)
+
+
+def run(label: str, dsn: str, pooled: bool, requests: int, concurrency: int):
+    engine = make_engine(dsn, pooled)
+    Session = sessionmaker(bind=engine)
+
+    def one_request():
+        started = time.perf_counter()
+        db = Session()
+        try:
+            db.execute(text("SELECT 1")).scalar()
+        finally:
+            db.close()
+        return time.perf_counter() - started
+
+    # 初回接続はどちらも同条件になるよう計測から除く
+    one_request()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(lambda _: one_request(), range(requests)))
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    print(
+        f"{label:10s} requests={requests} concurrency={concurrency} "
+        f"throughput={requests / elapsed:8.1f} req/s  "
+        f"p50={percentile(latencies, 50) * 1000:7.2f}ms  "
+        f"p95={percentile(latencies, 95) * 1000:7.2f}ms  "
+        f"mean={statistics.mean(latencies) * 1000:7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="データベース接続プールのベンチマーク")
+    parser.add_argument("--dsn", default=settings.effective_database_url)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.dsn.startswith("postgresql"):
+        print(f"pooler_mode={detect_pooler_mode(args.dsn)}")
+    run("NullPool", args.dsn, False, args.requests, args.concurrency)
+    run("QueuePool", args.dsn, True, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+実行履歴アーカイブのベンチマーク
+
+大量の実行履歴（ステップ付き）をバッチでアーカイブし、移動の速度・圧縮率と、
+実行詳細の読み込み時間（通常のテーブル / アーカイブからの復元）を計測します。
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_execution_archive.py --rows 20000 --steps 20 --batch 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import create_engine, event, func, insert
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.database import Base, apply_sqlite_pragmas
+from app.models import Execution, ExecutionArchive, ExecutionStep, Task
+from app.services.execution_archive import archive_batch, load_archived_execution
+
+
+def seed(Session, rows: int, steps: int):
+    db = Session()
+    task = Task(name="bench", task_prompt="benchmark")
+    db.add(task)
+    db.commit()
+    started = datetime(2024, 1, 1)
+    db.execute(insert(Execution), [
+        {
+            "task_id": task.id,
+            "status": "completed",
+            "started_at": started + timedelta(minutes=i),
+            "completed_at": started + timedelta(minutes=i, seconds=30),
+            "result": f"抽出結果 {i} " * 50,
+        }
+        for i in range(rows)
+    ])
+    execution_ids = [row[0] for row in db.query(Execution.id)]
+    batch = []
+    for execution_id in execution_ids:
+        for step_number in range(1, steps + 1):
+            batch.append({
+                "execution_id": execution_id,
+                "step_number": step_number,
+                "action_type": "click",
+                "description": f"ボタン {step_number} をクリックして次の画面へ移動",
+                "status": "completed",
+                "screenshot_path": f"screenshots/{execution_id}/step_{step_number}.png",
+                "started_at": started,
+                "duration_ms": 1200,
+            })
+            if len(batch) >= 20000:
+                db.execute(insert(ExecutionStep), batch)
+                batch = []
+    if batch:
+        db.execute(insert(ExecutionStep), batch)
+    db.commit()
+    db.close()
+    return execution_ids
+
+
+def timed(fn, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="実行履歴アーカイブのベンチマーク")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--steps", type=int, default=20, help="実行あたりのステップ数")
+    parser.add_argument("--batch", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "archive.db")
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    execution_ids = seed(Session, args.rows, args.steps)
+    db = Session()
+
+    live_id = execution_ids[-1]
+    live = timed(lambda: db.query(Execution).options(selectinload(Execution.steps)).filter(Execution.id == live_id).first())
+
+    # 最後の1件を残してアーカイブ
+    cutoff = datetime(2024, 1, 1) + timedelta(minutes=args.rows - 1)
+    started = time.perf_counter()
+    batches = 0
+    while True:
+        count = archive_batch(db, cutoff, args.batch)
+        db.commit()
+        batches += 1
+        if count < args.batch:
+            break
+    elapsed = time.perf_counter() - started
+
+    archived = db.query(func.count(ExecutionArchive.id)).scalar()
+    payload_bytes = db.query(func.sum(func.length(ExecutionArchive.payload))).scalar() or 0
+    archived_id = execution_ids[0]
+    restored = timed(lambda: load_archived_execution(db, archived_id))
+
+    print(f"archived={archived} batches={batches} elapsed={elapsed:6.2f}s ({archived / elapsed:8.1f} executions/s)")
+    print(f"payload={payload_bytes / archived:8.1f} bytes/execution (steps={args.steps})")
+    print(f"detail live={live * 1000:7.2f}ms  archived={restored * 1000:7.2f}ms")
+    print(f"remaining executions={db.query(func.count(Execution.id)).scalar()} steps={db.query(func.count(ExecutionStep.id)).scalar()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+実行履歴一覧のページネーションのベンチマーク
+
+大量の実行履歴に対して、offset 方式（変更前）とカーソル方式（変更後）で
+深いページを取得する時間を比較します。
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_execution_pagination.py --rows 200000 --pages 1,100,1000,5000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import create_engine, event, func, insert, tuple_
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, apply_sqlite_pragmas
+from app.models import Execution, Task
+
+PAGE_SIZE = 20
+
+
+def seed(Session, rows: int):
+    db = Session()
+    task = Task(name="bench", task_prompt="benchmark")
+    db.add(task)
+    db.commit()
+    started = datetime(2024, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "task_id": task.id,
+            "status": "completed" if i % 3 else "failed",
+            "started_at": started + timedelta(seconds=i),
+            "result": "x" * 2000,
+        })
+        if len(batch) >= 10000:
+            db.execute(insert(Execution), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Execution), batch)
+    db.commit()
+    db.close()
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="実行履歴ページネーションのベンチマーク")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--pages", default="1,100,1000,5000")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "executions.db")
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    seed(Session, args.rows)
+    db = Session()
+
+    order = (Execution.started_at.desc(), Execution.id.desc())
+    for page in (int(p) for p in args.pages.split(",")):
+        skip = (page - 1) * PAGE_SIZE
+        if skip >= args.rows:
+            continue
+
+        def offset_page():
+            db.query(Execution).order_by(*order).offset(skip).limit(PAGE_SIZE).all()
+
+        # カーソルは前のページの最後の行
+        anchor = db.query(Execution.started_at, Execution.id).order_by(*order).offset(max(0, skip - 1)).first()
+
+        def cursor_page():
+            query = db.query(
+                Execution.id, Execution.status, Execution.started_at,
+                Execution.result.isnot(None), func.substr(Execution.error_message, 1, 200)
+            )
+            if skip:
+                query = query.filter(tuple_(Execution.started_at, Execution.id) < tuple_(*anchor))
+            query.order_by(*order).limit(PAGE_SIZE + 1).all()
+
+        print(
+            f"page={page:6d}  offset={timed(offset_page) * 1000:8.2f}ms  "
+            f"cursor={timed(cursor_page) * 1000:8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
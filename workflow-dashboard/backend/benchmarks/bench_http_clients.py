@@ -0,0 +1,87 @@
+"""
+外部APIへのHTTPクライアントのベンチマーク
+
+呼び出しごとに httpx.AsyncClient を作る方法（変更前）と、共有クライアント
+http_clients（変更後）で同じURLへ連続してリクエストした場合の1件あたりの時間と、
+共有クライアントの接続の再利用状況を比較します。
+--url を省略するとローカルに keep-alive 対応のHTTPサーバーを起動して計測します
+（TLS がないため、実際の外部APIでは差がさらに大きくなります）。
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_http_clients.py --requests 200
+    python benchmarks/bench_http_clients.py --requests 20 --url https://api.github.com/zen
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, '.')
+
+import httpx
+
+from app.services.http_clients import http_clients
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_local_server() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+async def per_call(url: str, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            (await client.get(url)).raise_for_status()
+    return time.perf_counter() - started
+
+
+async def shared(url: str, requests: int) -> float:
+    client = http_clients.get("bench")
+    started = time.perf_counter()
+    for _ in range(requests):
+        (await client.get(url)).raise_for_status()
+    return time.perf_counter() - started
+
+
+async def run(url: str, requests: int):
+    before = await per_call(url, requests)
+    after = await shared(url, requests)
+    print(f"per-call client ={before / requests * 1000:8.2f}ms / request")
+    print(f"shared client   ={after / requests * 1000:8.2f}ms / request")
+    print(f"metrics         ={http_clients.get_metrics()['clients']['bench']}")
+    await http_clients.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="外部APIへのHTTPクライアントのベンチマーク")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--url", default="", help="計測するURL（省略時はローカルサーバー）")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url or start_local_server(), args.requests))
+
+
+if __name__ == "__main__":
+    main()
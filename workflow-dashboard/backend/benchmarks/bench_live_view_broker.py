@@ -0,0 +1,122 @@
+"""
+ライブビューブローカーのベンチマーク
+
+ファンアウトのスループットと配信レイテンシを計測します。
+- memory: 同一プロセス内で N 接続へ配信
+- postgres: 発行ワーカーと受信ワーカーを模した2つのブローカー間で LISTEN/NOTIFY 経由で配信
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_live_view_broker.py --messages 2000 --viewers 50
+    python benchmarks/bench_live_view_broker.py --broker postgres --dsn postgresql://...
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from app.services.live_view_broker import InProcessBroker, PostgresNotifyBroker
+
+
+class FakeWebSocket:
+    """受信時刻を記録するだけのWebSocket"""
+
+    def __init__(self):
+        self.latencies = []
+
+    async def send_json(self, message: dict):
+        self.latencies.append(time.perf_counter() - message["data"]["sent_at"])
+
+
+def make_fanout_handler(viewers):
+    async def handler(channel: str, message: dict):
+        for ws in viewers:
+            await ws.send_json(message)
+    return handler
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * p / 100))
+    return values[index]
+
+
+def report(label, viewers, total_messages, elapsed):
+    latencies = [lat for ws in viewers for lat in ws.latencies]
+    delivered = len(latencies)
+    print(f"\n[{label}]")
+    print(f"  配信数: {delivered} / 期待値 {total_messages * len(viewers)}")
+    print(f"  スループット: {delivered / elapsed:,.0f} deliveries/s ({total_messages / elapsed:,.0f} publishes/s)")
+    if latencies:
+        print(f"  レイテンシ p50: {statistics.median(latencies) * 1000:.3f} ms")
+        print(f"  レイテンシ p99: {percentile(latencies, 99) * 1000:.3f} ms")
+
+
+async def bench_memory(messages: int, viewer_count: int):
+    broker = InProcessBroker()
+    viewers = [FakeWebSocket() for _ in range(viewer_count)]
+    broker.register_handler("execution", make_fanout_handler(viewers))
+    await broker.start()
+
+    start = time.perf_counter()
+    for i in range(messages):
+        await broker.publish("execution:1", {"type": "log", "data": {"seq": i, "sent_at": time.perf_counter()}})
+    elapsed = time.perf_counter() - start
+
+    await broker.stop()
+    report("memory", viewers, messages, elapsed)
+
+
+async def bench_postgres(dsn: str, messages: int, viewer_count: int):
+    publisher = PostgresNotifyBroker(dsn, pg_channel="live_view_bench")
+    subscriber = PostgresNotifyBroker(dsn, pg_channel="live_view_bench")
+
+    viewers = [FakeWebSocket() for _ in range(viewer_count)]
+    subscriber.register_handler("execution", make_fanout_handler(viewers))
+
+    await publisher.start()
+    await subscriber.start()
+    # LISTENの確立を待つ
+    await asyncio.sleep(1.0)
+
+    start = time.perf_counter()
+    for i in range(messages):
+        await publisher.publish("execution:1", {"type": "log", "data": {"seq": i, "sent_at": time.perf_counter()}})
+
+    # 全メッセージが受信ワーカーに届くまで待つ（最大30秒）
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline and viewers and len(viewers[0].latencies) < messages:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    await publisher.stop()
+    await subscriber.stop()
+    report("postgres (cross-worker)", viewers, messages, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ライブビューブローカーのベンチマーク")
+    parser.add_argument("--broker", choices=["memory", "postgres", "all"], default="memory")
+    parser.add_argument("--dsn", default="", help="PostgreSQL接続URL（postgres計測時に必須）")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--viewers", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.broker in ("memory", "all"):
+        asyncio.run(bench_memory(args.messages, args.viewers))
+
+    if args.broker in ("postgres", "all"):
+        if not args.dsn:
+            print("postgres の計測には --dsn が必要です")
+            sys.exit(1)
+        asyncio.run(bench_postgres(args.dsn, args.messages, args.viewers))
+
+
+if __name__ == "__main__":
+    main()
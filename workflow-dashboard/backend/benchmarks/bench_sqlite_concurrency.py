@@ -0,0 +1,130 @@
+"""
+SQLite 同時読み書きのベンチマーク
+
+エージェントのステップ書き込み（複数の実行が並行）とダッシュボードの読み込みを同時に流し、
+書き込み・読み込みのスループットと database is locked の発生数を比較します。
+- default: ロールバックジャーナル、各書き込みを別スレッドから直接コミット（変更前）
+- profile: WAL + プラグマ設定、書き込みは db_writer の単一スレッドに集約（変更後）
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_sqlite_concurrency.py --writers 8 --writes 200 --readers 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, apply_sqlite_pragmas
+from app.models import ExecutionStep
+from app.services.db_writer import DatabaseWriter
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * p / 100))
+    return values[index]
+
+
+def make_session_factory(path: str, profile: bool) -> sessionmaker:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 1})
+    if profile:
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    else:
+        @event.listens_for(engine, "connect")
+        def _rollback_journal(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA journal_mode=DELETE")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def write_step(db, execution_id: int, step_number: int):
+    db.add(ExecutionStep(
+        execution_id=execution_id,
+        step_number=step_number,
+        action_type="action",
+        description=f"step {step_number}",
+        status="completed",
+        started_at=datetime.now()
+    ))
+
+
+def read_dashboard(Session):
+    db = Session()
+    try:
+        db.query(func.count(ExecutionStep.id)).scalar()
+        db.query(ExecutionStep).order_by(ExecutionStep.id.desc()).limit(50).all()
+    finally:
+        db.close()
+
+
+async def run(label: str, profile: bool, writers: int, writes: int, readers: int):
+    path = os.path.join(tempfile.mkdtemp(), f"{label}.db")
+    Session = make_session_factory(path, profile)
+    writer = DatabaseWriter(Session, serialize=profile)
+
+    errors = 0
+    write_done = asyncio.Event()
+    read_latencies = []
+
+    async def agent(execution_id: int):
+        nonlocal errors
+        for step_number in range(writes):
+            try:
+                await writer.run(write_step, execution_id, step_number)
+            except OperationalError:
+                errors += 1
+
+    async def dashboard():
+        while not write_done.is_set():
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(read_dashboard, Session)
+                read_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                pass
+
+    reader_tasks = [asyncio.create_task(dashboard()) for _ in range(readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(agent(execution_id) for execution_id in range(writers)))
+    elapsed = time.perf_counter() - started
+    write_done.set()
+    await asyncio.gather(*reader_tasks)
+    writer.shutdown()
+
+    total_writes = writers * writes - errors
+    print(
+        f"{label:8s} writes={total_writes / elapsed:8.1f}/s  locked={errors:4d}  "
+        f"reads={len(read_latencies) / elapsed:8.1f}/s  "
+        f"read p50={percentile(read_latencies, 50) * 1000:7.2f}ms  "
+        f"p95={percentile(read_latencies, 95) * 1000:7.2f}ms  "
+        f"mean={statistics.mean(read_latencies) * 1000 if read_latencies else 0:7.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SQLite 同時読み書きのベンチマーク")
+    parser.add_argument("--writers", type=int, default=8, help="並行して書き込む実行の数")
+    parser.add_argument("--writes", type=int, default=200, help="実行ごとのステップ数")
+    parser.add_argument("--readers", type=int, default=4, help="ダッシュボード読み込みの並列数")
+    args = parser.parse_args()
+
+    await run("default", False, args.writers, args.writes, args.readers)
+    await run("profile", True, args.writers, args.writes, args.readers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
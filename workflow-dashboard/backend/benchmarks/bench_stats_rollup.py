@@ -0,0 +1,110 @@
+"""
+ダッシュボード統計の集計方法のベンチマーク
+
+大量の実行履歴に対して、executions を COUNT する集計（変更前）と
+日別集計 execution_stats_daily の合計（変更後）の時間を比較します。
+あわせて、実行の作成・状態遷移1件あたりの書き込み時間（日別集計の更新込み）を計測します。
+
+使用方法:
+    cd workflow-dashboard/backend
+    python benchmarks/bench_stats_rollup.py --rows 200000 --tasks 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import create_engine, event, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, apply_sqlite_pragmas
+from app.models import Execution, Task
+from app.services.stats_rollup import RUNNING_STATUSES, get_totals, reconcile_stats
+
+STATUSES = ("completed", "completed", "failed", "stopped", "running")
+
+
+def seed(Session, rows: int, tasks: int):
+    db = Session()
+    task_rows = [Task(name=f"bench-{i}", task_prompt="benchmark", user_id=f"user-{i % 5}") for i in range(tasks)]
+    db.add_all(task_rows)
+    db.commit()
+    started = datetime(2024, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "task_id": task_rows[i % tasks].id,
+            "status": STATUSES[i % len(STATUSES)],
+            "started_at": started + timedelta(minutes=i),
+        })
+        if len(batch) >= 10000:
+            db.execute(insert(Execution), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Execution), batch)
+    db.commit()
+    # 一括INSERTはセッションイベントを経由しないため作り直す
+    reconcile_stats(db)
+    db.commit()
+    db.close()
+
+
+def count_stats(db):
+    """変更前: ステータスごとに executions を COUNT"""
+    return {
+        "total": db.query(func.count(Execution.id)).scalar(),
+        "running": db.query(func.count(Execution.id)).filter(Execution.status.in_(RUNNING_STATUSES)).scalar(),
+        "completed": db.query(func.count(Execution.id)).filter(Execution.status == "completed").scalar(),
+        "failed": db.query(func.count(Execution.id)).filter(Execution.status == "failed").scalar(),
+    }
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ダッシュボード統計の集計方法のベンチマーク")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=200, help="計測する実行の作成・完了の回数")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "stats.db")
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    seed(Session, args.rows, args.tasks)
+    db = Session()
+
+    assert count_stats(db) == get_totals(db)
+    print(f"count  ={timed(lambda: count_stats(db)) * 1000:8.2f}ms")
+    print(f"rollup ={timed(lambda: get_totals(db)) * 1000:8.2f}ms")
+    print(f"user   ={timed(lambda: get_totals(db, 'user-1')) * 1000:8.2f}ms")
+
+    task_id = db.query(Task.id).first()[0]
+    started = time.perf_counter()
+    for _ in range(args.writes):
+        execution = Execution(task_id=task_id, status="running", started_at=datetime.now())
+        db.add(execution)
+        db.commit()
+        execution.status = "completed"
+        db.commit()
+    elapsed = time.perf_counter() - started
+    print(f"write  ={elapsed / args.writes * 1000:8.2f}ms / execution (create + complete)")
+    assert count_stats(db) == get_totals(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+データベースマイグレーションスクリプト
+
+未適用のマイグレーション（app/migrations/versions.py）を番号順に適用します。
+アプリケーションの起動時にも自動で適用されるため、通常は実行不要です。
+大きなテーブルへの変更を起動前に済ませておきたい場合などに使用します。
+
+使用方法:
+    cd workflow-dashboard/backend
+    python migrate.py            # 未適用のマイグレーションを適用
+    python migrate.py --status   # 適用状況を表示
+"""
+
+import argparse
+import sys
+sys.path.insert(0, '.')
+
+from app.database import engine
+from app.migrations import get_status, run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="データベースマイグレーション")
+    parser.add_argument("--status", action="store_true", help="適用状況を表示して終了")
+    args = parser.parse_args()
+    
+    if args.status:
+        for version, name, applied_at in get_status(engine):
+            state = f"適用済み ({applied_at:%Y-%m-%d %H:%M:%S})" if applied_at else "未適用"
+            print(f"{version:4d}  {name:32s} {state}")
+        return
+    
+    count = run_migrations(engine)
+    if count:
+        print(f"✓ {count} 件のマイグレーションを適用しました")
+    else:
+        print("マイグレーション不要: 最新の状態です")
+
+
+if __name__ == "__main__":
+    main()
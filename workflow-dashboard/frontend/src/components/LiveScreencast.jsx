@@ -14,6 +14,7 @@ export default function LiveScreencast({ executionId, isRunning }) {
   const [isAvailable, setIsAvailable] = useState(false);
   const [error, setError] = useState(null);
   const [frameCount, setFrameCount] = useState(0);
+  const [profile, setProfile] = useState(null);
   const wsRef = useRef(null);
   const canvasRef = useRef(null);
   const imageRef = useRef(new Image());
@@ -101,6 +102,11 @@ export default function LiveScreencast({ executionId, isRunning }) {
           case 'started':
             setIsConnecting(false);
             setIsViewing(true);
+            setProfile(message.profile);
+            break;
+          case 'profile':
+            // 回線状況に応じてサーバー側で品質が切り替わった
+            setProfile(message.profile);
             break;
           case 'frame':
             drawFrame(message.data);
@@ -167,7 +173,7 @@ export default function LiveScreencast({ executionId, isRunning }) {
           <span className="text-foreground font-medium">{t('execution.liveView')}</span>
           {isViewing && (
             <span className="text-xs text-muted-foreground">
-              {frameCount} frames
+              {frameCount} frames{profile && ` · ${profile}`}
             </span>
           )}
         </div>
@@ -41,6 +41,7 @@ import useProjectChatStore from '../stores/projectChatStore'
 import useTaskStore from '../stores/taskStore'
 import useCredentialStore from '../stores/credentialStore'
 import useNotificationStore from '../stores/notificationStore'
+import { appendStreamingDelta } from '../utils/chatStream'
 
 export default function ProjectChatPanel({
   project,
@@ -645,7 +646,10 @@ export default function ProjectChatPanel({
     setTaskEditChatHistory(newHistory)
     
     try {
-      const response = await tasksApi.taskChat(editingTask.id, message, taskEditChatHistory)
+      const response = await tasksApi.taskChatStream(editingTask.id, message, taskEditChatHistory, {
+        onDelta: (text) => setTaskEditChatHistory(prev => appendStreamingDelta(prev, text)),
+        onActions: (actions) => setTaskEditPendingActions(actions.actions)
+      })
       setTaskEditChatHistory(response.data.chat_history || newHistory)
       
       if (response.data.actions?.actions) {
@@ -922,16 +926,23 @@ ${response.data.message}
       const projectTasks = boardData?.projects?.find(p => p.id === project.id)?.tasks || []
       const isWizardMode = projectTasks.length === 0
       
+      // 応答はストリーミングで受け取り、届いた分から表示する（完了後にサーバーの履歴で置き換える）
+      setChatHistory(prev => [...prev, { role: 'user', content: userMessage }])
+      const streamHandlers = {
+        onDelta: (text) => setChatHistory(prev => appendStreamingDelta(prev, text))
+      }
+      
       if (isWizardMode) {
         // ウィザードモード（空プロジェクト用）
         try {
-          const response = await projectsApi.wizardChat(
+          const response = await projectsApi.wizardChatStream(
             project.id, 
             userMessage, 
             chatHistory,
             videoAnalysis,
             webResearchResults,
-            selectedModel
+            selectedModel,
+            streamHandlers
           )
         
           // Webリサーチリクエストがあれば実行
@@ -947,13 +958,14 @@ ${response.data.message}
           setWebResearchResults(searchResponse.data.results)
           
           // リサーチ結果を含めて再度チャット
-          const followUp = await projectsApi.wizardChat(
+          const followUp = await projectsApi.wizardChatStream(
             project.id,
             `リサーチ結果を確認しました。続けてください。`,
             response.data.chat_history,
             videoAnalysis,
             searchResponse.data.results,
-            selectedModel
+            selectedModel,
+            streamHandlers
           )
           if (followUp.data.actions?.actions) {
             // JSONアクションがある場合は確認ボタンを表示
@@ -1052,7 +1064,7 @@ ${response.data.message}
       } else {
         // 通常モード（既存タスクがあるプロジェクト）
         try {
-          const response = await projectsApi.chat(project.id, userMessage, chatHistory, selectedModel)
+          const response = await projectsApi.chatStream(project.id, userMessage, chatHistory, selectedModel, streamHandlers)
         
         if (response.data.actions?.actions) {
           // JSONアクションがある場合は確認ボタンを表示
@@ -0,0 +1,84 @@
+import { useEffect, useState } from 'react';
+import { Film } from 'lucide-react';
+import { liveViewApi } from '../services/api';
+
+/**
+ * セッション録画の再生コンポーネント
+ *
+ * 録画インデックスを取得し、スライダーの位置に対応するフレームだけを読み込む
+ * - ステップマーカーをクリックするとそのステップの画面へ移動
+ * - 録画がない実行では何も表示しない
+ */
+export default function SessionReplay({ executionId }) {
+  const [recording, setRecording] = useState(null);
+  const [position, setPosition] = useState(0);
+
+  useEffect(() => {
+    if (!executionId) return;
+
+    liveViewApi.getRecording(executionId)
+      .then(res => {
+        setRecording(res.data);
+        setPosition(res.data.duration_ms);
+      })
+      .catch(() => setRecording(null));
+  }, [executionId]);
+
+  if (!recording) return null;
+
+  const duration = Math.max(recording.duration_ms, 1);
+  const formatPosition = (ms) => {
+    const seconds = Math.floor(ms / 1000);
+    return `${Math.floor(seconds / 60)}:${String(seconds % 60).padStart(2, '0')}`;
+  };
+
+  return (
+    <div className="card">
+      <div className="card-header">
+        <h2 className="font-semibold text-foreground flex items-center gap-2">
+          <Film className="w-5 h-5 text-primary" />
+          セッション録画
+        </h2>
+        <p className="text-xs text-muted-foreground">
+          {recording.frame_count} frames · {formatPosition(recording.duration_ms)}
+        </p>
+      </div>
+      <div className="card-body space-y-3">
+        <div className="rounded-lg overflow-hidden border border-border bg-black">
+          <img
+            src={liveViewApi.getRecordingFrameUrl(executionId, position)}
+            alt="Session replay"
+            className="w-full object-contain max-h-[480px]"
+          />
+        </div>
+
+        <div className="relative pt-3">
+          {recording.steps.map((step, index) => (
+            <button
+              key={`${step.step}-${index}`}
+              onClick={() => setPosition(step.t)}
+              title={`Step ${step.step}: ${step.description}`}
+              className={`absolute top-0 w-1.5 h-3 -translate-x-1/2 rounded-sm ${
+                step.status === 'failed' ? 'bg-red-500' : 'bg-primary'
+              }`}
+              style={{ left: `${(step.t / duration) * 100}%` }}
+            />
+          ))}
+          <input
+            type="range"
+            min={0}
+            max={duration}
+            value={position}
+            onChange={(e) => setPosition(Number(e.target.value))}
+            className="w-full"
+          />
+        </div>
+
+        <div className="flex justify-between text-xs text-muted-foreground font-mono">
+          <span>{formatPosition(position)}</span>
+          <span>{formatPosition(recording.duration_ms)}</span>
+        </div>
+      </div>
+    </div>
+  );
+}
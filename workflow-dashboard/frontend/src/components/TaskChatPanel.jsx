@@ -17,6 +17,7 @@ import {
   RotateCcw
 } from 'lucide-react'
 import { tasksApi } from '../services/api'
+import { appendStreamingDelta } from '../utils/chatStream'
 import useLanguageStore from '../stores/languageStore'
 import useTaskChatStore from '../stores/taskChatStore'
 
@@ -124,8 +125,14 @@ export default function TaskChatPanel({
     setTaskChatLoading(true)
     setTaskPendingActions(null)
     
+    setTaskChatHistory(prev => [...prev, { role: 'user', content: userMessage }])
+    
     try {
-      const response = await tasksApi.taskChat(task.id, userMessage, taskChatHistory)
+      // 応答はストリーミングで受け取り、届いた分から表示する
+      const response = await tasksApi.taskChatStream(task.id, userMessage, taskChatHistory, {
+        onDelta: (text) => setTaskChatHistory(prev => appendStreamingDelta(prev, text)),
+        onActions: (actions) => setTaskPendingActions(actions.actions)
+      })
       setTaskChatHistory(response.data.chat_history || [])
       
       if (response.data.actions?.actions) {
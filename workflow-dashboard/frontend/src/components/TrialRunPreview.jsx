@@ -80,13 +80,13 @@ export default function TrialRunPreview({
         case 'initial_state':
           setCurrentStep(data.current_step)
           if (data.screenshots?.length > 0) {
-            setScreenshot(data.screenshots[data.screenshots.length - 1].image)
+            setScreenshot(data.screenshots[data.screenshots.length - 1].screenshot_url)
           }
           setLogs(data.logs || [])
           break
           
         case 'screenshot_update':
-          setScreenshot(data.image)
+          setScreenshot(data.screenshot_url)
           setCurrentStep(data.step)
           break
           
@@ -265,7 +265,7 @@ export default function TrialRunPreview({
             <div className="flex-1 bg-black rounded-xl overflow-hidden relative">
               {screenshot ? (
                 <img 
-                  src={`data:image/jpeg;base64,${screenshot}`}
+                  src={screenshot}
                   alt="スクリーンショット"
                   className="w-full h-full object-contain"
                 />
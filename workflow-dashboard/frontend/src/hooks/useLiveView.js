@@ -21,12 +21,12 @@ export default function useLiveView(executionId) {
       setStatus(data.execution?.status || 'pending')
       setSteps(data.steps || [])
       setCurrentStepId(data.steps?.find(s => s.status === 'running')?.id || null)
-      setScreenshot(data.screenshot)
+      setScreenshot(data.screenshot_url)
       setLogs(data.logs || [])
       
       // WebSocket接続
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
-      const wsUrl = `${protocol}//${window.location.host}/ws/live/${executionId}`
+      const wsUrl = `${protocol}//${window.location.host}/ws/live/${executionId}?min_level=INFO`
       const ws = new WebSocket(wsUrl)
       wsRef.current = ws
       
@@ -57,13 +57,17 @@ export default function useLiveView(executionId) {
               break
               
             case 'screenshot_update':
-              setScreenshot(message.data.screenshot)
+              setScreenshot(message.data.screenshot_url)
               break
               
             case 'log':
               setLogs(prev => [...prev, message.data].slice(-100))
               break
               
+            case 'log_batch':
+              setLogs(prev => [...prev, ...(message.data.logs || [])].slice(-100))
+              break
+              
             case 'progress_update':
               // Progress updates handled by step updates
               break
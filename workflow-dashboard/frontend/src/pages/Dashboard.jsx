@@ -15,7 +15,6 @@ import {
 } from 'lucide-react'
 import { motion } from 'framer-motion'
 import { statsApi, executionsApi } from '../services/api'
-import { supabase, isSupabaseConfigured } from '../services/supabase'
 import { BentoGrid, BentoItem } from '../components/Bento/BentoGrid'
 import useLanguageStore from '../stores/languageStore'
 
@@ -30,7 +29,7 @@ export default function Dashboard() {
       try {
         const [statsRes, execRes] = await Promise.all([
           statsApi.get(),
-          executionsApi.getAll({ limit: 5 })
+          executionsApi.getAll({ limit: 5, summary: true })
         ])
         setStats(statsRes.data)
         setRecentExecutions(execRes.data)
@@ -43,25 +42,78 @@ export default function Dashboard() {
     
     fetchData()
     
-    // 30秒ポーリング
-    const interval = setInterval(fetchData, 30000)
+    // 実行イベントの差分をWebSocketで受信（ポーリング不要）
+    let ws = null
+    let version = 0
+    let snapshotPending = false
+    let reconnectTimer = null
+    let closed = false
     
-    // Supabaseリアルタイム（設定されている場合のみ）
-    let channel = null
-    if (isSupabaseConfigured() && supabase) {
-      channel = supabase
-        .channel('executions-recent-activity')
-        .on(
-          'postgres_changes',
-          { event: '*', schema: 'public', table: 'executions' },
-          () => fetchData()
-        )
-        .subscribe()
+    const applyExecution = (execution, event) => {
+      setRecentExecutions(prev => {
+        const existing = prev.find(e => e.id === execution.id)
+        if (event === 'deleted') {
+          return prev.filter(e => e.id !== execution.id)
+        }
+        if (existing) {
+          return prev.map(e => e.id === execution.id ? { ...e, ...execution } : e)
+        }
+        if (event !== 'created') return prev
+        const sameTask = prev.find(e => e.task_id === execution.task_id)
+        return [{ ...execution, task: sameTask?.task }, ...prev].slice(0, 5)
+      })
     }
     
+    const connect = () => {
+      const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+      ws = new WebSocket(`${protocol}//${window.location.host}/ws/dashboard`)
+      // 接続直後にサーバーがスナップショットを送る
+      snapshotPending = true
+      
+      ws.onmessage = (event) => {
+        let message
+        try {
+          message = JSON.parse(event.data)
+        } catch {
+          return
+        }
+        
+        if (message.type === 'snapshot') {
+          snapshotPending = false
+          version = message.version
+          setStats({ tasks: message.tasks, executions: message.executions })
+        } else if (message.type === 'delta') {
+          // スナップショットの到着待ち、またはスナップショットに含まれる古い差分は無視
+          if (snapshotPending || message.version <= version) return
+          if (message.version !== version + 1) {
+            // 差分の取りこぼし: スナップショットを1回だけ再取得
+            snapshotPending = true
+            ws.send('snapshot')
+            return
+          }
+          version = message.version
+          setStats({ tasks: message.tasks, executions: message.executions })
+          if (message.execution) {
+            applyExecution(message.execution, message.event)
+          } else if (message.event === 'executions_deleted' && message.task_ids) {
+            setRecentExecutions(prev => prev.filter(e => !message.task_ids.includes(e.task_id)))
+          }
+        }
+      }
+      
+      ws.onclose = () => {
+        if (!closed) {
+          reconnectTimer = setTimeout(connect, 3000)
+        }
+      }
+    }
+    
+    connect()
+    
     return () => {
-      clearInterval(interval)
-      if (channel) supabase.removeChannel(channel)
+      closed = true
+      clearTimeout(reconnectTimer)
+      if (ws) ws.close()
     }
   }, [])
   
@@ -218,7 +270,7 @@ export default function Dashboard() {
                                         execution.status === 'running' ? 'bg-yellow-500' : 'bg-gray-500'
                                     }`} />
                                     <div className="min-w-0">
-                                        <p className="font-bold text-sm truncate">{execution.task?.name || `Task #${execution.task_id}`}</p>
+                                        <p className="font-bold text-sm truncate">{execution.task_name || `Task #${execution.task_id}`}</p>
                                         <p className="text-xs text-muted-foreground font-mono">{execution.started_at ? new Date(execution.started_at).toLocaleTimeString() : '-'}</p>
                                     </div>
                                 </div>
@@ -15,6 +15,7 @@ import {
 import useLiveViewStore from '../stores/liveViewStore'
 import { liveViewApi, executionsApi, tasksApi } from '../services/api'
 import LiveScreencast from '../components/LiveScreencast'
+import SessionReplay from '../components/SessionReplay'
 import useLanguageStore from '../stores/languageStore'
 
 export default function Execution() {
@@ -268,6 +269,11 @@ export default function Execution() {
         </div>
       )}
 
+      {/* セッション録画 - 実行終了後に再生 */}
+      {!isRunning && !isPaused && !isApiTask && (
+        <SessionReplay executionId={parseInt(executionId)} />
+      )}
+
       {/* ステータスパネル（進行状況＋最新ステップ＋スクショサムネ） */}
       <div className="card">
         <div className="card-header flex items-center justify-between">
@@ -317,7 +323,7 @@ export default function Execution() {
                 {status === 'connected' && screenshot ? (
                   <div className="rounded-lg overflow-hidden border border-border bg-black/80">
                     <img
-                      src={`data:image/png;base64,${screenshot}`}
+                      src={screenshot}
                       alt="Latest screenshot"
                       className="w-full h-36 object-cover"
                     />
@@ -27,13 +27,15 @@ export default function History() {
   const [isLoading, setIsLoading] = useState(true)
   const [isLoadingMore, setIsLoadingMore] = useState(false)
   const [filter, setFilter] = useState('all')
-  const [page, setPage] = useState(0)
+  const [nextCursor, setNextCursor] = useState(null)
   const [total, setTotal] = useState(0)
   const [hasMore, setHasMore] = useState(false)
   const { t } = useLanguageStore()
   const { success: notifySuccess, error: notifyError } = useNotificationStore()
   
-  const fetchExecutions = useCallback(async (pageNum = 0, append = false) => {
+  // cursor を渡すと前のページの続きを取得（総件数は最初のページでのみ数える）
+  const fetchExecutions = useCallback(async (cursor = null) => {
+    const append = Boolean(cursor)
     if (append) {
       setIsLoadingMore(true)
     } else {
@@ -42,32 +44,22 @@ export default function History() {
     
     try {
       const params = {
-        skip: pageNum * PAGE_SIZE,
         limit: PAGE_SIZE,
+        summary: true,
+        ...(cursor ? { cursor } : { with_total: true }),
         ...(filter !== 'all' ? { status: filter } : {})
       }
-      const response = await executionsApi.getPaginated(params)
+      const response = await executionsApi.getAll(params)
       const data = response.data
       
-      if (data.items) {
-        // ページネーション対応レスポンス
-        if (append) {
-          setExecutions(prev => [...prev, ...data.items])
-        } else {
-          setExecutions(data.items)
-        }
-        setTotal(data.total)
-        setHasMore(data.has_more)
+      if (append) {
+        setExecutions(prev => [...prev, ...data.items])
       } else {
-        // 従来のレスポンス（配列直接）
-        if (append) {
-          setExecutions(prev => [...prev, ...data])
-        } else {
-          setExecutions(data)
-        }
-        setHasMore(data.length === PAGE_SIZE)
+        setExecutions(data.items)
+        setTotal(data.total)
       }
-      setPage(pageNum)
+      setNextCursor(data.next_cursor)
+      setHasMore(data.has_more)
     } catch (error) {
       console.error('Failed to fetch executions:', error)
       notifyError('エラー', '履歴の取得に失敗しました')
@@ -78,13 +70,12 @@ export default function History() {
   }, [filter, notifyError])
   
   useEffect(() => {
-    setPage(0)
-    fetchExecutions(0)
+    fetchExecutions()
   }, [filter])
   
   const loadMore = () => {
-    if (!isLoadingMore && hasMore) {
-      fetchExecutions(page + 1, true)
+    if (!isLoadingMore && hasMore && nextCursor) {
+      fetchExecutions(nextCursor)
     }
   }
   
@@ -226,7 +217,7 @@ export default function History() {
                           </div>
                           <div className="min-w-0">
                             <div className="font-bold text-foreground truncate">
-                              {execution.task?.name || `Task #${execution.task_id}`}
+                              {execution.task_name || `Task #${execution.task_id}`}
                             </div>
                             <div className="text-xs text-muted-foreground font-mono">
                               {getStatusLabel(execution.status)}
@@ -255,7 +246,7 @@ export default function History() {
                           >
                             <ExternalLink className="w-4 h-4" />
                           </Link>
-                          {execution.result && (
+                          {execution.has_result && (
                             <button
                               onClick={() => handleDownload(execution)}
                               className="p-2 rounded-sm text-muted-foreground hover:text-blue-500 hover:bg-blue-500/10 transition-colors"
@@ -297,7 +288,7 @@ export default function History() {
                  }
                >
                  <div className="space-y-2">
-                   <h3 className="font-bold text-lg">{execution.task?.name || `Task #${execution.task_id}`}</h3>
+                   <h3 className="font-bold text-lg">{execution.task_name || `Task #${execution.task_id}`}</h3>
                    <div className="flex justify-between text-sm text-muted-foreground border-t border-zinc-100 dark:border-zinc-800 pt-2">
                      <span>Duration: {formatDuration(execution.started_at, execution.completed_at)}</span>
                      <span>Steps: {execution.completed_steps || 0} / {execution.total_steps || '-'}</span>
@@ -48,6 +48,21 @@ const COLORS = [
 // アイコンオプション
 const ICONS = ['folder', 'users', 'zap', 'target', 'briefcase', 'star', 'heart', 'flag']
 
+// 最終実行のステータスごとの表示色
+const RUN_STATUS_STYLES = {
+  completed: 'bg-emerald-100 dark:bg-emerald-500/20 text-emerald-600 dark:text-emerald-400',
+  failed: 'bg-rose-100 dark:bg-rose-500/20 text-rose-600 dark:text-rose-400',
+  stopped: 'bg-zinc-100 dark:bg-zinc-800 text-zinc-500',
+}
+
+// 所要時間の表示（秒 → 1m 05s など）
+const formatDuration = (seconds) => {
+  if (seconds == null) return null
+  const total = Math.round(seconds)
+  if (total < 60) return `${total}s`
+  return `${Math.floor(total / 60)}m ${String(total % 60).padStart(2, '0')}s`
+}
+
 export default function TaskBoard() {
   const navigate = useNavigate()
   const { t } = useLanguageStore()
@@ -298,6 +313,20 @@ export default function TaskBoard() {
                 {t('taskBoard.inactive')}
               </span>
             )}
+            {task.last_run_status && (
+              <span
+                className={`inline-flex items-center gap-1 px-2 py-0.5 rounded-md text-xs ${RUN_STATUS_STYLES[task.last_run_status] || RUN_STATUS_STYLES.stopped}`}
+                title={[
+                  `${t('taskBoard.lastRun')}: ${new Date(task.last_run_at).toLocaleString()}`,
+                  task.success_rate != null && `${t('taskBoard.successRate')}: ${Math.round(task.success_rate * 100)}%`,
+                  task.p50_duration_seconds != null && `${t('taskBoard.medianDuration')}: ${formatDuration(task.p50_duration_seconds)}`
+                ].filter(Boolean).join('\n')}
+              >
+                <Timer className="w-3 h-3" />
+                {task.success_rate != null ? `${Math.round(task.success_rate * 100)}%` : task.last_run_status}
+                {task.p50_duration_seconds != null && ` · ${formatDuration(task.p50_duration_seconds)}`}
+              </span>
+            )}
           </div>
         </div>
       </motion.div>
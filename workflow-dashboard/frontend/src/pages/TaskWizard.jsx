@@ -29,6 +29,7 @@ import {
 } from 'lucide-react'
 import { wizardApi, tasksApi } from '../services/api'
 import { cn } from '../utils/cn'
+import { appendStreamingDelta } from '../utils/chatStream'
 
 // 新しいコンポーネントをインポート
 import Onboarding from '../components/Wizard/Onboarding'
@@ -472,9 +473,15 @@ export default function TaskWizard() {
         }])
       } else {
         // テキストのみの場合は通常のチャット
-        const response = await wizardApi.chat(sessionId, userMessage)
+        // 応答はストリーミングで受け取り、届いた分から表示する
+        const response = await wizardApi.chatStream(sessionId, userMessage, null, {
+          onDelta: (text) => setMessages(prev => appendStreamingDelta(prev, text))
+        })
         
-        setMessages(prev => [...prev, { role: 'assistant', content: response.data.response }])
+        setMessages(prev => [
+          ...prev.filter(msg => !msg.streaming),
+          { role: 'assistant', content: response.data.response }
+        ])
         
         if (response.data.is_ready_to_create) {
           const taskResponse = await wizardApi.generateTask(sessionId)
@@ -66,6 +66,56 @@ api.interceptors.response.use(
   }
 )
 
+// チャット応答を SSE でストリーミング受信する
+// onDelta に応答テキストの断片、onActions に ```json ブロックのアクションを渡し、
+// 完了すると通常のチャットAPIと同じ { data } 形式で返す
+const streamChat = async (url, body, { onDelta, onActions } = {}) => {
+  const authorization = api.defaults.headers.common['Authorization']
+  const response = await fetch(`${api.defaults.baseURL}${url}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(authorization ? { Authorization: authorization } : {})
+    },
+    body: JSON.stringify(body)
+  })
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}))
+    const error = new Error(data.detail || `HTTP ${response.status}`)
+    error.response = { status: response.status, data }
+    throw error
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let result = null
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (!data) continue
+      const payload = JSON.parse(data)
+      if (event === 'delta') onDelta?.(payload.text)
+      else if (event === 'actions') onActions?.(payload)
+      else if (event === 'done') result = payload
+      else if (event === 'error') throw new Error(payload.error)
+    }
+  }
+  if (!result) throw new Error('応答の受信が途中で終了しました')
+  return { data: result }
+}
+
 // Projects API
 export const projectsApi = {
   getAll: (params) => api.get('/projects', { params }),
@@ -75,6 +125,7 @@ export const projectsApi = {
   delete: (id) => api.delete(`/projects/${id}`),
   // カンバンボード用
   getBoardData: () => api.get('/projects/board/data'),
+  getBoardChanges: (since) => api.get('/projects/board/changes', { params: { since } }),
   getWithTasks: (id) => api.get(`/projects/${id}/with-tasks`),
   // 役割グループ
   createRoleGroup: (projectId, data) => api.post(`/projects/${projectId}/role-groups`, data),
@@ -83,6 +134,8 @@ export const projectsApi = {
   deleteRoleGroup: (groupId) => api.delete(`/projects/role-groups/${groupId}`),
   // プロジェクトチャット（model選択対応）
   chat: (projectId, message, chatHistory, model = null) => api.post(`/projects/${projectId}/chat`, { message, chat_history: chatHistory, model }),
+  chatStream: (projectId, message, chatHistory, model = null, handlers = {}) =>
+    streamChat(`/projects/${projectId}/chat/stream`, { message, chat_history: chatHistory, model }, handlers),
   executeActions: (projectId, actions) => api.post(`/projects/${projectId}/chat/execute-actions`, { actions }),
   getWorkflowExplanation: (projectId) => api.get(`/projects/${projectId}/workflow-explanation`),
   // ウィザードチャット（空プロジェクト用、model選択対応）
@@ -94,6 +147,14 @@ export const projectsApi = {
       web_research: webResearch,
       model
     }),
+  wizardChatStream: (projectId, message, chatHistory, videoAnalysis, webResearch, model = null, handlers = {}) =>
+    streamChat(`/projects/${projectId}/wizard-chat/stream`, {
+      message,
+      chat_history: chatHistory,
+      video_analysis: videoAnalysis,
+      web_research: webResearch,
+      model
+    }, handlers),
   // Webリサーチ
   webSearch: (projectId, query, numResults = 5) => 
     api.post(`/projects/${projectId}/web-search`, { query, num_results: numResults }),
@@ -165,6 +226,8 @@ export const tasksApi = {
   testWebhookTrigger: (taskId, triggerId) => api.post(`/webhook/test/${taskId}/${triggerId}`),
   // タスク個別チャット
   taskChat: (taskId, message, chatHistory) => api.post(`/tasks/${taskId}/chat`, { message, chat_history: chatHistory }),
+  taskChatStream: (taskId, message, chatHistory, handlers = {}) =>
+    streamChat(`/tasks/${taskId}/chat/stream`, { message, chat_history: chatHistory }, handlers),
   executeTaskActions: (taskId, actions) => api.post(`/tasks/${taskId}/chat/execute-actions`, { actions })
 }
 
@@ -184,11 +247,9 @@ export const credentialsApi = {
 
 // Executions API
 export const executionsApi = {
+  // cursor / summary を指定すると一覧用の軽量な項目（task_name, has_result, error_summary）を返す
+  // cursor / with_total を指定すると { items, next_cursor, has_more, total } を返す
   getAll: (params) => api.get('/executions', { params }),
-  // ページネーション対応版
-  getPaginated: (params) => api.get('/executions', { 
-    params: { ...params, with_total: true } 
-  }),
   get: (id) => api.get(`/executions/${id}`),
   getLogs: (id) => api.get(`/executions/${id}/logs`),
   delete: (id) => api.delete(`/executions/${id}`),
@@ -201,6 +262,8 @@ export const liveViewApi = {
   getData: (id) => api.get(`/executions/${id}/live`),
   getSteps: (id) => api.get(`/executions/${id}/steps`),
   getScreenshot: (id) => api.get(`/executions/${id}/screenshot`),
+  getRecording: (id) => api.get(`/executions/${id}/recording`),
+  getRecordingFrameUrl: (id, positionMs) => `/api/executions/${id}/recording/frame?t=${Math.floor(positionMs)}`,
   pause: (id) => api.post(`/executions/${id}/pause`),
   resume: (id) => api.post(`/executions/${id}/resume`),
   stop: (id) => api.post(`/executions/${id}/stop`)
@@ -247,6 +310,8 @@ export const wizardApi = {
   // AIとチャット（model選択対応）
   chat: (sessionId, message, model = null) => 
     api.post(`/wizard/sessions/${sessionId}/chat`, { message, model }),
+  chatStream: (sessionId, message, model = null, handlers = {}) =>
+    streamChat(`/wizard/sessions/${sessionId}/chat/stream`, { message, model }, handlers),
   
   // タスクを生成
   generateTask: (sessionId) => 
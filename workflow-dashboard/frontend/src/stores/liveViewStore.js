@@ -27,7 +27,8 @@ const useLiveViewStore = create((set, get) => ({
     // WebSocket URLを構築（バックエンドのポート8000に直接接続）
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
     const host = window.location.hostname
-    const wsUrl = `${protocol}//${host}:8000/ws/live/${executionId}`
+    // DEBUGログはサーバー側で除外
+    const wsUrl = `${protocol}//${host}:8000/ws/live/${executionId}?min_level=INFO`
     console.log('ライブビューWebSocket接続:', wsUrl)
     const ws = new WebSocket(wsUrl)
     
@@ -59,7 +60,7 @@ const useLiveViewStore = create((set, get) => ({
           break
           
         case 'screenshot_update':
-          set({ screenshot: data.screenshot })
+          set({ screenshot: data.screenshot_url })
           break
           
         case 'log':
@@ -68,6 +69,12 @@ const useLiveViewStore = create((set, get) => ({
           }))
           break
           
+        case 'log_batch':
+          set((state) => ({
+            logs: [...state.logs, ...(data.logs || [])].slice(-100)
+          }))
+          break
+          
         case 'initial_logs':
           set({ logs: data.logs || [] })
           break
@@ -136,7 +143,7 @@ const useLiveViewStore = create((set, get) => ({
       execution: data.execution,
       steps: data.steps || [],
       controlStatus: data.execution?.status || 'running',
-      screenshot: data.screenshot,
+      screenshot: data.screenshot_url,
       totalSteps: data.execution?.total_steps || 0,
       currentStep: data.execution?.completed_steps || 0,
       logs: data.logs || [],
@@ -1,6 +1,69 @@
 import { create } from 'zustand'
 import { tasksApi, projectsApi } from '../services/api'
 
+const byOrder = (a, b) => (a.order_index - b.order_index) || (a.id - b.id)
+
+/**
+ * ボードデータに差分を適用した新しいボードデータを返す
+ * - 変更されたタスク・役割グループは一度取り除き、project_id に従って配置し直す
+ */
+function mergeBoardDelta(boardData, delta) {
+  const deletedProjects = new Set(delta.deleted.projects)
+  const deletedTasks = new Set(delta.deleted.tasks)
+  const deletedGroups = new Set(delta.deleted.role_groups)
+  const changedTasks = new Map(delta.tasks.map(task => [task.id, task]))
+  const changedGroups = new Map(delta.role_groups.map(group => [group.id, group]))
+
+  const keepTask = (task) => !deletedTasks.has(task.id) && !changedTasks.has(task.id)
+  const keepGroup = (group) => !deletedGroups.has(group.id) && !changedGroups.has(group.id)
+
+  const projects = new Map()
+  for (const project of boardData.projects) {
+    if (deletedProjects.has(project.id)) continue
+    projects.set(project.id, {
+      ...project,
+      tasks: project.tasks.filter(keepTask),
+      role_groups: (project.role_groups || []).filter(keepGroup),
+    })
+  }
+  for (const project of delta.projects) {
+    const existing = projects.get(project.id)
+    projects.set(project.id, {
+      ...project,
+      tasks: existing ? existing.tasks : [],
+      role_groups: existing ? existing.role_groups : [],
+    })
+  }
+
+  let unassigned = boardData.unassigned_tasks.filter(keepTask)
+  for (const task of changedTasks.values()) {
+    const project = task.project_id ? projects.get(task.project_id) : null
+    if (project) {
+      project.tasks.push(task)
+    } else {
+      unassigned.push(task)
+    }
+  }
+  for (const group of changedGroups.values()) {
+    const project = projects.get(group.project_id)
+    if (project) project.role_groups.push(group)
+  }
+
+  for (const project of projects.values()) {
+    project.tasks.sort(byOrder)
+    project.role_groups.sort(byOrder)
+  }
+  unassigned = unassigned.sort(byOrder)
+
+  return {
+    projects: [...projects.values()].sort(
+      (a, b) => new Date(b.created_at) - new Date(a.created_at)
+    ),
+    unassigned_tasks: unassigned,
+    version: delta.version,
+  }
+}
+
 const useTaskStore = create((set, get) => ({
   // 状態
   tasks: [],
@@ -136,15 +199,36 @@ const useTaskStore = create((set, get) => ({
   
   // ==================== ボード機能 ====================
   
-  // ボードデータを取得
-  fetchBoardData: async () => {
-    set({ isLoading: true, error: null })
+  // ボードデータを取得（取得済みなら前回のバージョン以降の差分だけを反映）
+  fetchBoardData: async ({ full = false } = {}) => {
+    const current = get().boardData
+    if (full || !current) {
+      set({ isLoading: true, error: null })
+      try {
+        const response = await projectsApi.getBoardData()
+        set({ boardData: response.data, isLoading: false })
+        return response.data
+      } catch (error) {
+        set({ error: error.message, isLoading: false })
+        return null
+      }
+    }
+
     try {
-      const response = await projectsApi.getBoardData()
-      set({ boardData: response.data, isLoading: false })
-      return response.data
+      const response = await projectsApi.getBoardChanges(current.version || 0)
+      const delta = response.data
+      if (delta.full_reload) {
+        return get().fetchBoardData({ full: true })
+      }
+      // 差分取得中に別の取得で置き換わっていた場合はそちらを優先
+      if (get().boardData !== current) {
+        return get().boardData
+      }
+      const boardData = mergeBoardDelta(current, delta)
+      set({ boardData, error: null })
+      return boardData
     } catch (error) {
-      set({ error: error.message, isLoading: false })
+      set({ error: error.message })
       return null
     }
   },
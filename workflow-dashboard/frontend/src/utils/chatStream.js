@@ -0,0 +1,14 @@
+// ストリーミング中のアシスタント応答を履歴の末尾に反映する
+// （```json ブロック以降はアクションとして別に表示するため、本文には出さない）
+export function appendStreamingDelta(messages, text) {
+  const last = messages[messages.length - 1]
+  const raw = (last?.streaming ? last.raw : '') + text
+  const jsonStart = raw.indexOf('```json')
+  const reply = {
+    role: 'assistant',
+    content: jsonStart === -1 ? raw : raw.slice(0, jsonStart).trimEnd(),
+    raw,
+    streaming: true
+  }
+  return last?.streaming ? [...messages.slice(0, -1), reply] : [...messages, reply]
+}
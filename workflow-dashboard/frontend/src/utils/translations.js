@@ -99,6 +99,9 @@ export const translations = {
       run: "Run",
       hasDependency: "Has dependency",
       inactive: "Inactive",
+      lastRun: "Last run",
+      successRate: "Success rate",
+      medianDuration: "Median duration",
       unassignedTasks: "Unassigned Tasks",
       empty: "No Projects Yet",
       emptyDesc: "Create your first project to organize your automation tasks.",
@@ -650,6 +653,9 @@ export const translations = {
       run: "実行",
       hasDependency: "依存関係あり",
       inactive: "無効",
+      lastRun: "最終実行",
+      successRate: "成功率",
+      medianDuration: "所要時間（中央値）",
       unassignedTasks: "未割り当てタスク",
       empty: "プロジェクトがありません",
       emptyDesc: "最初のプロジェクトを作成して、タスクを整理しましょう。",
@@ -1201,6 +1207,9 @@ export const translations = {
       run: "运行",
       hasDependency: "有依赖关系",
       inactive: "已禁用",
+      lastRun: "最近运行",
+      successRate: "成功率",
+      medianDuration: "耗时中位数",
       unassignedTasks: "未分配任务",
       empty: "没有项目",
       emptyDesc: "创建您的第一个项目来组织任务。",